@@ -1,5 +1,6 @@
 from __future__ import print_function
 
+from . import granulename
 from . import downmodis
 from . import parsemodis
 from . import convertmodis
@@ -12,6 +13,10 @@ except ImportError:
           "maybe Python GDAL is missing")
     pass
 from . import productmodis
+try:
+    from . import downmodis_async
+except (ImportError, SyntaxError):
+    pass
 try:
     from . import optparse_gui
 except:
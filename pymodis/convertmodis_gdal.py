@@ -35,6 +35,7 @@ Classes:
 Functions:
 
 * :func:`getResampling`
+* :func:`gdalName`
 * :func:`raster_copy`
 * :func:`raster_copy_with_nodata`
 
@@ -94,10 +95,20 @@ def getResampling(res):
         return gdal.GRA_CubicSpline
 
 
+def gdalName(name):
+    """Return the name of a file to open with GDAL
+
+       :param name: the name of the file or an object with the 'path'
+                    attribute, like :class:`pymodis.downmodis.MemoryGranule`
+    """
+    return getattr(name, 'path', name)
+
+
 class convertModisGDAL:
     """A class to convert modis data from hdf to GDAL formats using GDAL
 
-       :param str hdfname: name of input data
+       :param str hdfname: name of input data, or the MemoryGranule
+                           downloaded in memory
        :param str prefix: prefix for output data
        :param str subset: the subset to consider
        :param int res: output resolution
@@ -113,7 +124,7 @@ class convertModisGDAL:
                  epsg=None, wkt=None, resampl='NEAREST_NEIGHBOR', vrt=False):
         """Function for the initialize the object"""
         # Open source dataset
-        self.in_name = hdfname
+        self.in_name = gdalName(hdfname)
         self.src_ds = gdal.Open(self.in_name)
         self.layers = self.src_ds.GetSubDatasets()
         self.output_pref = prefix
@@ -467,7 +478,8 @@ class file_info:
 class createMosaicGDAL:
     """A class to mosaic modis data from hdf to GDAL formats using GDAL
 
-       :param list hdfnames: a list containing the name of tile to mosaic
+       :param list hdfnames: a list containing the name of tile to mosaic,
+                             or the MemoryGranule downloaded in memory
        :param str subset: the subset of layer to consider
        :param str outformat: the output format to use, this parameter is
                              not used for the VRT output, supported values
@@ -477,7 +489,10 @@ class createMosaicGDAL:
     def __init__(self, hdfnames, subset, outformat="HDF4Image"):
         """Function for the initialize the object"""
         # Open source dataset
-        self.in_names = hdfnames
+        if isinstance(hdfnames, list):
+            self.in_names = [gdalName(name) for name in hdfnames]
+        else:
+            self.in_names = hdfnames
         # #TODO use resolution into mosaic.
         # self.resolution = res
         if not subset:
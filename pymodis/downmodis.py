@@ -26,14 +26,42 @@ It supports both FTP and HTTP repositories
 
 Classes:
 
+* :class:`ModisSession`
 * :class:`modisHtmlParser`
+* :class:`ModisListing`
+* :class:`ListingCache`
+* :class:`RetryPolicy`
+* :class:`FTPPool`
+* :class:`MirrorPool`
+* :class:`BandwidthLimiter`
+* :class:`ConnectionLimiter`
+* :class:`DownloadMetrics`
+* :class:`DownloadScheduler`
+* :class:`DownloadPlan`
+* :class:`LocalIndex`
+* :class:`DownloadManifest`
+* :class:`GranuleChecksum`
+* :class:`FileLock`
+* :class:`GranuleCache`
+* :class:`MemoryGranule`
 * :class:`downModis`
 
+Exceptions:
+
+* :class:`DownloadError`
+* :class:`RetryError`
+
 Functions:
 
 * :func:`urljoin`
 * :func:`getNewerVersion`
 * :func:`str2date`
+* :func:`getChecksums`
+* :func:`checkHdf4`
+* :func:`preallocate`
+
+The objects :data:`BANDWIDTH` and :data:`CONNECTIONS` limit the bandwidth
+and the connections to each server of all the downloads of the process
 
 """
 
@@ -43,26 +71,49 @@ from builtins import dict
 
 from datetime import date
 from datetime import timedelta
+from datetime import datetime
+import codecs
+import errno
 import os
 import sys
-import glob
 import logging
 import socket
+import threading
+import time
+import random
+import json
+import hashlib
+import tempfile
+import sqlite3
+import shutil
+import zlib
+import struct
+import heapq
+from collections import namedtuple
+from xml.etree import ElementTree
+import posixpath
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 from ftplib import FTP
 import ftplib
+# locks between processes are not available on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 import requests
-# urllib in python 2 and 3
+from requests.adapters import HTTPAdapter
+from .granulename import parseGranule
+# html.parser in python 2 and 3
 try:
     from future.standard_library import install_aliases
     install_aliases()
 except ImportError:
     raise ImportError("Future library not found, please install it")
-from urllib.request import urlopen
-import urllib.request
-import urllib.error
-from base64 import b64encode
 from html.parser import HTMLParser
+from queue import Queue
+from queue import Empty
 import re
 import netrc
 # urlparse in python 2 and 3
@@ -119,7 +170,12 @@ def getNewerVersion(oldFile, newFile):
        :return: the name of newer file
     """
     # get the processing date (YYYYDDDHHMMSS) from the file strings
-    if oldFile.split('.')[4] > newFile.split('.')[4]:
+    oldGranule = parseGranule(oldFile)
+    newGranule = parseGranule(newFile)
+    if oldGranule is None or newGranule is None:
+        return newFile
+    # the names without production date are the older ones
+    if (oldGranule.production or '') > (newGranule.production or ''):
         return oldFile
     else:
         return newFile
@@ -140,24 +196,171 @@ def str2date(datestring):
     return date(int(stringSplit[0]), int(stringSplit[1]), int(stringSplit[2]))
 
 
-class ModisHTTPRedirectHandler(urllib.request.HTTPRedirectHandler):
-    """Class to return 302 error"""
-    def http_error_302(self, req, fp, code, msg, headers):
-        return urllib.request.HTTPRedirectHandler.http_error_302(self, req, fp,
-                                                                 code, msg,
-                                                                 headers)
+def getChecksums(xmlfile):
+    """Read the checksums of the data files from the XML metadata file of a
+       granule (the DataFileContainer elements)
+
+       :param str xmlfile: the path of the XML file
+
+       :return: a dictionary with the name of the data file as key and a
+                tuple with the checksum type and value
+    """
+    checksums = dict()
+    tree = ElementTree.parse(xmlfile)
+    for container in tree.iter('DataFileContainer'):
+        name = container.findtext('DistributedFileName')
+        kind = container.findtext('ChecksumType')
+        value = container.findtext('Checksum')
+        if name and kind and value:
+            checksums[name.strip()] = (kind.strip().upper(), value.strip())
+    return checksums
+
+
+# the first bytes of a HDF4 file
+HDF4_MAGIC = b'\x0e\x03\x13\x01'
+# tag of the empty data descriptors
+HDF4_NULL = 1
+
+
+def checkHdf4(filename):
+    """Check the structure of a HDF4 file without reading its data: the
+       magic number and the chain of the blocks of data descriptors, each
+       data element has to be inside the file. It is enough to find
+       truncated or damaged downloads and it does not require GDAL
+
+       :param str filename: the path of the HDF4 file
+
+       :raise ValueError: if the file is not a valid HDF4 file
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as fil:
+        if fil.read(4) != HDF4_MAGIC:
+            raise ValueError("{name} is not a HDF4 file".format(name=filename))
+        offset = 4
+        visited = set()
+        while offset:
+            if offset in visited or offset + 6 > size:
+                raise ValueError("Wrong data descriptor block at {off} in "
+                                 "{name}".format(off=offset, name=filename))
+            visited.add(offset)
+            fil.seek(offset)
+            ndds, offset = struct.unpack('>HI', fil.read(6))
+            block = fil.read(12 * ndds)
+            if len(block) != 12 * ndds:
+                raise ValueError("{name} is truncated".format(name=filename))
+            for n in range(ndds):
+                tag, ref, start, length = struct.unpack_from('>HHII', block,
+                                                             12 * n)
+                if tag == HDF4_NULL or 0xFFFFFFFF in (start, length):
+                    continue
+                if start + length > size:
+                    raise ValueError("{name} is truncated, size {size} "
+                                     "instead of at least {end}".format(
+                                         name=filename, size=size,
+                                         end=start + length))
+
+
+def preallocate(fileobj, size):
+    """Reserve the disk space of a file with posix_fallocate, so that the
+       file system can allocate it in contiguous blocks. The file size
+       becomes at least 'size'; nothing is done if posix_fallocate is not
+       available or not supported by the file system
+
+       :param fileobj: the open file object
+       :param int size: the final size of the file in bytes
+
+       :return: True if the space was reserved
+    """
+    fallocate = getattr(os, 'posix_fallocate', None)
+    if fallocate is None or not size:
+        return False
+    try:
+        fallocate(fileobj.fileno(), 0, size)
+    except OSError as e:
+        logging.debug("Cannot preallocate {name}: {err}".format(
+            name=getattr(fileobj, 'name', fileobj), err=e))
+        return False
+    return True
+
+
+def dataLength(filename, blocksize=65536):
+    """Return the size of a file without the zero bytes at its end, that is
+       the data written in a preallocated file by an interrupted download.
+       Some data really ending with zeros can be excluded, so the size can
+       only be smaller than the data written
+
+       :param str filename: the path of the file
+       :param int blocksize: the size of the blocks read from the end
+
+       :return: the size in bytes
+    """
+    end = os.path.getsize(filename)
+    with open(filename, 'rb') as fil:
+        while end > 0:
+            start = max(0, end - blocksize)
+            fil.seek(start)
+            block = fil.read(end - start).rstrip(b'\0')
+            if block:
+                return start + len(block)
+            end = start
+    return 0
+
+
+class ModisSession(requests.Session):
+    """A persistent HTTP session with a pool of keep-alive connections.
+       The credentials are kept through the redirects to and from the NASA
+       Earthdata login server, the authentication cookies are stored by the
+       session and reused by all the following requests
+
+       :param str user: the user name required by NASA authentication system
+       :param str password: the password required by NASA authentication
+                            system
+       :param int poolsize: the maximum number of connections kept open for
+                            each host
+    """
+    AUTH_HOST = 'urs.earthdata.nasa.gov'
+
+    def __init__(self, user, password, poolsize=10):
+        """Function to initialize the object"""
+        requests.Session.__init__(self)
+        self.auth = (user, password)
+        adapter = HTTPAdapter(pool_connections=poolsize,
+                              pool_maxsize=poolsize)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def rebuild_auth(self, prepared_request, response):
+        """Keep the Authorization header when the request is redirected
+           between the data server and the NASA Earthdata login server,
+           requests drops it by default when the host changes
+        """
+        headers = prepared_request.headers
+        if 'Authorization' in headers:
+            original = urlparse(response.request.url).hostname
+            redirect = urlparse(prepared_request.url).hostname
+            if original != redirect and redirect != self.AUTH_HOST and \
+               original != self.AUTH_HOST:
+                del headers['Authorization']
 
 
 class modisHtmlParser(HTMLParser):
     """A class to parse HTML
 
        :param fh: content of http request
+       :param list fileids: the list of links already parsed, for example
+                            from the listing cache; if it is set fh is not
+                            parsed
     """
-    def __init__(self, fh):
+    def __init__(self, fh, fileids=None):
         """Function to initialize the object"""
         HTMLParser.__init__(self)
-        self.fileids = []
-        self.feed(str(fh))
+        if fileids is not None:
+            self.fileids = list(fileids)
+        else:
+            self.fileids = []
+            if isinstance(fh, bytes):
+                fh = fh.decode('utf-8', 'replace')
+            self.feed(fh)
 
     def handle_starttag(self, tag, attrs):
         if tag == 'a':
@@ -184,295 +387,2974 @@ class modisHtmlParser(HTMLParser):
         """
         finalList = []
         for i in self.fileids:
-            # distinguish jpg from hdf by where the tileID is within the string
-            # jpgs have the tileID at index 3, hdf have tileID at index 2
-            name = i.split('.')
+            granule = parseGranule(i)
             # if product is not in the filename, move to next filename in list
-            if not name.count(prod):
+            if granule is None or granule.product != prod:
                 continue
+            isjpeg = granule.browse or granule.kind == 'jpg'
             # if tiles are not specified and the file is not a jpg, add to list
-            if not tiles and not (name.count('jpg') or name.count('BROWSE')):
+            if not tiles and not isjpeg:
+                finalList.append(i)
+            # if tiles are specified, the jpgs only if requested
+            if tiles and tiles.count(granule.tile) == 1 and (jpeg or
+                                                             not isjpeg):
                 finalList.append(i)
-            # if tiles are specified
-            if tiles:
-                # if a tileID is at index 3 and jpgs are to be downloaded
-                if tiles.count(name[3]) == 1 and jpeg:
-                    finalList.append(i)
-                # if a tileID is at in index 2, it is known to be HDF
-                elif tiles.count(name[2]) == 1:
-                    finalList.append(i)
         return finalList
 
 
-class downModis:
-    """A class to download MODIS data from NASA FTP or HTTP repositories
+class ModisListing:
+    """A fast extractor of the links of a listing of the server. The data
+       are decoded and parsed incrementally with :meth:`feed`, each link is
+       filtered as soon as it is read against the sets of products and
+       tiles, so only the useful names are kept. When the listing contains
+       them (as the Apache listings of the NASA servers), the modification
+       time and the size of each file are read too; sizes with a unit (as
+       '1.2M') are approximated.
 
-       :param str destinationFolder: where the files will be stored
-       :param str password: the password required by NASA authentication system
-       :param str user: the user namerequired by NASA authentication system
-       :param str url: the base url from where to download the MODIS data,
-                       it can be FTP or HTTP but it has to start with
-                       'ftp://' or 'http://' or 'https://'
-       :param str path: the directory where the data that you want to
-                        download are stored on the FTP server. For HTTP
-                        requests, this is the part of the url between the 'url'
-                        parameter and the 'product' parameter.
-       :param str product: the code of the product to download, the code
-                           should be idential to the one of the url
-       :param str tiles: a set of tiles to be downloaded, None == all tiles.
-                         This can be passed as a string of tileIDs separated
-                         by commas, or as a list of individual tileIDs
-       :param str today: the day to start downloading; in order to pass a
-                         date different from today use the format YYYY-MM-DD
-       :param str enddate: the day to end downloading; in order to pass a
-                           date use the format YYYY-MM-DD. This day must be
-                           before the 'today' parameter. Downloading happens
-                           in reverse order (currently)
+       It offers the same methods of :class:`modisHtmlParser`
 
-       :param int delta: timelag i.e. the number of days starting from
-                         today backwards. Will be overwritten if
-                         'enddate' is specifed during instantiation
-       :param bool jpeg: set to True if you want to download the JPG overview
-                         file in addition to the HDF
-       :param bool debug: set to True if you want to obtain debug information
-       :param int timeout: Timeout value for HTTP server (seconds)
-       :param bool checkgdal: variable to set the GDAL check
+       :param products: the products to keep, None to keep all the files
+       :param tiles: the tiles to keep, None to keep all the tiles
+       :param bool jpeg: True to keep also the jpeg files
+       :param str encoding: the encoding of the listing
     """
+    HREF = re.compile(r'<a\s[^>]*?href\s*=\s*["\']?([^"\'\s>]+)[^>]*>',
+                      re.IGNORECASE)
+    TAG = re.compile(r'<[^>]*>')
+    DATE = re.compile(r'(\d{4}-\d{2}-\d{2}|\d{2}-[A-Za-z]{3}-\d{4})[ T]+'
+                      r'(\d{2}:\d{2}(?::\d{2})?)')
+    SIZE = re.compile(r'(?:^|\s)(\d+(?:\.\d+)?)([KMGT]?)(?:\s|$)')
+    DATEDIR = re.compile(r'(\d{4})[/.-](\d{2})[/.-](\d{2})$')
+    TIMEFORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%d-%b-%Y %H:%M',
+                   '%d-%b-%Y %H:%M:%S')
+    UNITS = dict(K=1024, M=1024 ** 2, G=1024 ** 3, T=1024 ** 4)
+    # the maximum size of the text kept waiting for the end of a line
+    MAXBUFFER = 65536
 
-    def __init__(self, destinationFolder, password=None, user=None,
-                 url="https://e4ftl01.cr.usgs.gov", tiles=None, path="MOLT",
-                 product="MOD11A1.006", today=None, enddate=None, delta=10,
-                 jpg=False, debug=False, timeout=30, checkgdal=True):
+    def __init__(self, products=None, tiles=None, jpeg=False,
+                 encoding='utf-8'):
         """Function to initialize the object"""
-
-        # prepare the base url and set the url type (ftp/http)
-        if 'ftp://' in url:
-            self.url = url.replace('ftp://', '').rstrip('/')
-            self.urltype = 'ftp'
-        elif 'http://' in url:
-            self.url = url
-            self.urltype = 'http'
-        elif 'https://' in url:
-            self.url = url
-            self.urltype = 'http'
-        else:
-            raise IOError("The url should contain 'ftp://' or 'http://'")
-        if not user and not password and not URLPARSE:
-            raise IOError("Please use 'user' and 'password' parameters")
-        elif not user and not password and URLPARSE:
-            self.domain = urlparse(self.url).hostname
-            try:
-                nt = netrc.netrc()
-            except:
-                raise IOError("Please set 'user' and 'password' parameters"
-                              ", netrc file does not exist")
-            try:
-                account = nt.hosts[self.domain]
-            except:
-                try:
-                    account = nt.hosts['urs.earthdata.nasa.gov']
-                except:
-                    raise IOError("Please set 'user' and 'password' parameters"
-                                  ", netrc file does not contain parameter "
-                                  "for NASA url")
-            # user for download
-            self.user = account[0]
-            # password for download
-            self.password = account[2]
-        else:
-            # user for download
-            self.user = user
-            # password for download
-            self.password = password
-        self.userpwd = "{us}:{pw}".format(us=self.user,
-                                          pw=self.password)
-        userAndPass = b64encode(str.encode(self.userpwd)).decode("ascii")
-        self.http_header = {'Authorization': 'Basic %s' %  userAndPass}
-        cookieprocessor = urllib.request.HTTPCookieProcessor()
-        opener = urllib.request.build_opener(ModisHTTPRedirectHandler,
-                                             cookieprocessor)
-        urllib.request.install_opener(opener)
-        # the product (product_code.004 or product_cod.005)
-        self.product = product
-        self.product_code = product.split('.')[0]
-        # url directory where data are located
-        self.path = urljoin(path, self.product)
-        # tiles to downloads
+        if isinstance(products, str):
+            products = [products]
         if isinstance(tiles, str):
-            self.tiles = tiles.split(',')
-        else:  # tiles are list, tuple, or None
-            self.tiles = tiles
-        # set destination folder
-        if not os.path.isdir(destinationFolder):
-            os.makedirs(destinationFolder)
-            self.writeFilePath = destinationFolder
-        elif os.access(destinationFolder, os.W_OK):
-            self.writeFilePath = destinationFolder
-        else:
-            try:
-                os.mkdir(destinationFolder)
-                self.writeFilePath = destinationFolder
-            except:
-                raise Exception("Folder to store downloaded files does not "
-                                "exist or is not writeable")
-        # return the name of product
-        if len(self.path.split('/')) == 2:
-            self.product = self.path.split('/')[1]
-        elif len(self.path.split('/')) == 3:
-            self.product = self.path.split('/')[2]
-        # write a file with the name of file to be downloaded
-        self.filelist = open(os.path.join(self.writeFilePath,
-                                          'listfile{pro}.txt'.format(pro=self.product)),
-                             'w')
-        # set if to download jpgs
-        self.jpeg = jpg
-        # today, or the last day in the download series chronologically
-        self.today = today
-        # chronologically the first day in the download series
-        self.enday = enddate
-        # default number of days to consider if enddate not specified
-        self.delta = delta
-        # status of tile download
-        self.status = True
-        # for debug, you can download only xml files
-        self.debug = debug
-        # for logging
-        log_filename = os.path.join(self.writeFilePath,
-                                    'modis{pro}.log'.format(pro=self.product))
-        log_format = '%(asctime)s - %(levelname)s - %(message)s'
-        logging.basicConfig(filename=log_filename, level=logging.DEBUG,
-                            format=log_format)
-        logging.captureWarnings(True)
-        # global connection attempt counter
-        self.nconnection = 0
-        # timeout for HTTP connection before failing (seconds)
-        self.timeout = timeout
-        # files within the directory where data will be saved
-        self.fileInPath = []
-        for f in os.listdir(self.writeFilePath):
-            if os.path.isfile(os.path.join(self.writeFilePath, f)):
-                self.fileInPath.append(f)
-        global GDAL
-        if not GDAL and checkgdal:
-            logging.warning("WARNING: Python GDAL library not found")
-        elif GDAL and not checkgdal:
-            GDAL = False
-        self.dirData = []
+            tiles = tiles.split(',')
+        self.products = frozenset(products) if products else None
+        self.tiles = frozenset(tiles) if tiles else None
+        self.jpeg = jpeg
+        self.decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(
+            errors='replace')
+        self.buffer = ''
+        self.fileids = []
+        self.dates = []
+        self.sizes = dict()
+        self.times = dict()
 
-    def removeEmptyFiles(self):
-        """Function to remove files in the download directory that have
-           filesize equal to 0
+    @classmethod
+    def fromCache(cls, cached):
+        """Return a listing from the values stored by :class:`ListingCache`
+
+           :param dict cached: the cached values
         """
-        year = str(date.today().year)
-        prefix = self.product.split('.')[0]
-        files = glob.glob1(self.writeFilePath, '%s.A%s*' % (prefix, year))
-        for f in files:
-            fil = os.path.join(self.writeFilePath, f)
-            if os.path.getsize(fil) == 0:
-                os.remove(fil)
+        listing = cls()
+        for name in cached['fileids']:
+            if cls.DATEDIR.match(name):
+                listing.dates.append(name)
+            elif parseGranule(name) is not None:
+                listing.fileids.append(name)
+        listing.sizes.update(cached.get('sizes') or {})
+        listing.times.update(cached.get('times') or {})
+        return listing
 
-    def connect(self, ncon=20):
-        """Connect to the server and fill the dirData variable
+    def feed(self, data):
+        """Parse a chunk of the listing, the complete lines are parsed at
+           once and the last one is kept until the next chunk
 
-           :param int ncon: maximum number of attempts to connect to the HTTP
-                            server before failing
+           :param data: a chunk of the listing, bytes or string
         """
-        if self.urltype == 'ftp':
-            self._connectFTP(ncon)
-        elif self.urltype == 'http':
-            self._connectHTTP(ncon)
-        if len(self.dirData) == 0:
-            raise Exception("There are some troubles with the server. "
-                            "The directory seems to be empty")
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data)
+        self.buffer += data
+        end = self.buffer.rfind('\n')
+        if end == -1 and len(self.buffer) > self.MAXBUFFER:
+            # a listing without new lines, parse until the last link
+            end = self.buffer.rfind('<a')
+        if end > 0:
+            self._parse(self.buffer[:end])
+            self.buffer = self.buffer[end:]
 
-    def _connectHTTP(self, ncon=20):
-        """Connect to HTTP server, create a list of directories for all days
+    def close(self):
+        """Parse the remaining data, to call at the end of the listing"""
+        self.buffer += self.decoder.decode(b'', final=True)
+        self._parse(self.buffer)
+        self.buffer = ''
+        return self
 
-           :param int ncon: maximum number of attempts to connect to the HTTP
-                            server before failing. If ncon < 0, connection
-                            attempts are unlimited in number
+    def _parse(self, text):
+        """Parse the links of a part of the listing"""
+        links = list(self.HREF.finditer(text))
+        for n, link in enumerate(links):
+            href = link.group(1)
+            if '?' in href or href.startswith('#'):
+                continue
+            name = href.rstrip('/').split('/')[-1]
+            if not name:
+                continue
+            if self.DATEDIR.match(name):
+                self.dates.append(name)
+                continue
+            if not self.accept(parseGranule(name), self.products,
+                               self.tiles, self.jpeg):
+                continue
+            self.fileids.append(name)
+            # the text after the link, until the next one
+            if n + 1 < len(links):
+                stop = links[n + 1].start()
+            else:
+                stop = len(text)
+            self._parseInfo(name, text[link.end():stop])
+
+    def _parseInfo(self, name, text):
+        """Read the modification time and the size of a file from the text
+           after its link
         """
-        self.nconnection += 1
-        try:
-            url = urljoin(self.url, self.path)
-            try:
-                req = urllib.request.Request(url, headers=self.http_header)
-                http = urllib.request.urlopen(req)
-                self.dirData = modisHtmlParser(http.read()).get_dates()
-            except Exception as e:
-                logging.error('Error in connection. Code {code}, '
-                              'reason {re}'.format(code=e.code, re=e.reason))
-                http = urlopen(url, timeout=self.timeout)
-                self.dirData = modisHtmlParser(http.read()).get_dates()
-            self.dirData.reverse()
-        except Exception as e:
+        text = self.TAG.sub(' ', text.split('\n')[0]).replace('&nbsp;', ' ')
+        date = self.DATE.search(text)
+        if not date:
+            return
+        stamp = ' '.join(date.groups())
+        for fmt in self.TIMEFORMATS:
             try:
-                logging.error('Error in connection. Code {code}, '
-                              'reason {re}'.format(code=e.code, re=e.reason))
-            except:
-                logging.error('Error {er}'.format(er=e))
-            if self.nconnection <= ncon or ncon < 0:
-                self._connectHTTP()
-
-    def _connectFTP(self, ncon=20):
-        """Set connection to ftp server, move to path where data are stored,
-           and create a list of directories for all days
+                self.times[name] = datetime.strptime(
+                    stamp, fmt).strftime('%Y-%m-%d %H:%M:%S')
+                break
+            except ValueError:
+                continue
+        size = self.SIZE.search(text[date.end():])
+        if size:
+            self.sizes[name] = int(float(size.group(1)) *
+                                   self.UNITS.get(size.group(2), 1))
 
-           :param int ncon: maximum number of attempts to connect to the FTP
-                            server before failing.
+    @staticmethod
+    def accept(granule, products=None, tiles=None, jpeg=False):
+        """Return True if a file has to be kept
 
+           :param granule: the GranuleName of the file, None if it is not
+                           a MODIS file
+           :param products: a set of products, None for all the products
+           :param tiles: a set of tiles, None for all the tiles
+           :param bool jpeg: True to keep also the jpeg files
         """
-        self.nconnection += 1
-        try:
-            # connect to ftp server
-            self.ftp = FTP(self.url)
-            self.ftp.login(self.user, self.password)
-            # enter in directory
-            self.ftp.cwd(self.path)
-            self.dirData = []
-            # return data inside directory
-            self.ftp.dir(self.dirData.append)
-            # reverse order of data for have first the nearest to today
-            self.dirData.reverse()
-            # ensure dirData contains only directories, remove all references to files
-            self.dirData = [elem.split()[-1] for elem in self.dirData if elem.startswith("d")]
-            if self.debug:
-                logging.debug("Open connection {url}".format(url=self.url))
-        except (EOFError, ftplib.error_perm) as e:
-            logging.error('Error in connection: {err}'.format(err=e))
-            if self.nconnection <= ncon:
-                self._connectFTP()
+        if granule is None:
+            return False
+        if products is not None and granule.product not in products:
+            return False
+        if (granule.browse or granule.kind == 'jpg') and not jpeg:
+            return False
+        return tiles is None or granule.tile in tiles
 
-    def closeFTP(self):
-        """Close ftp connection and close the file list document"""
-        self.ftp.quit()
-        self.closeFilelist()
-        if self.debug:
-            logging.debug("Close connection {url}".format(url=self.url))
+    def get_all(self):
+        """Return everything"""
+        return self.fileids
 
-    def closeFilelist(self):
-        """Function to close the file list of where the files are downloaded"""
-        self.filelist.close()
+    def get_dates(self):
+        """Return a list of directories with date"""
+        return sorted(set(self.dates))
 
-    def setDirectoryIn(self, day):
-        """Enter into the file directory of a specified day
+    def get_tiles(self, prod, tiles, jpeg=False):
+        """Return a list of files to download
 
-           :param str day: a string representing a day in format YYYY.MM.DD
+           :param str prod: the code of MODIS product that we are going to
+                            analyze
+           :param list tiles: the list of tiles to consider
+           :param bool jpeg: True to also check for jpeg data
         """
-        try:
-            self.ftp.cwd(day)
-        except (ftplib.error_reply, socket.error) as e:
-            logging.error("Error {err} entering in directory "
-                          "{name}".format(err=e, name=day))
-            self.setDirectoryIn(day)
+        products = frozenset([prod])
+        tiles = frozenset(tiles) if tiles else None
+        return [name for name in self.fileids
+                if self.accept(parseGranule(name), products, tiles, jpeg)]
+
+
+class ListingCache:
+    """A cache on disk of the listings of the server directories. Each
+       listing is stored as a JSON file named with the hash of its url.
+       The listings of the days older than the reprocessing window never
+       change on the server so they are kept forever, the others (and the
+       listing of the product directory) expire after ttl seconds
+
+       :param str folder: the directory where the listings are stored
+       :param int ttl: the time in seconds after that a listing that can
+                       change is downloaded again
+       :param int window: the number of days before today when the data
+                          could be reprocessed on the server
+    """
+    def __init__(self, folder, ttl=3600, window=60):
+        """Function to initialize the object"""
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.folder = folder
+        self.ttl = ttl
+        self.window = window
+
+    def _path(self, url):
+        """Return the path of the cache file for a url"""
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, "{na}.json".format(na=name))
+
+    def isPermanent(self, day):
+        """Return True if the listing of the day can not change anymore
+
+           :param str day: the day in format YYYY.MM.DD, None for the
+                           product directory
+        """
+        if not day:
+            return False
+        try:
+            return str2date(day) < date.today() - timedelta(days=self.window)
+        except (ValueError, IndexError, UnboundLocalError):
+            return False
+
+    def get(self, url, day=None):
+        """Return the cached list of links for a url, None if it is missing
+           or expired
+
+           :param str url: the url of the listing
+           :param str day: the day of the listing in format YYYY.MM.DD,
+                           None for the product directory
+        """
+        cached = self.getCached(url, day)
+        if cached is None:
+            return None
+        return cached['fileids']
+
+    def getCached(self, url, day=None):
+        """Return the cached values for a url, a dictionary with the list of
+           links and, if known, the sizes and the times of the files; None if
+           it is missing or expired
+
+           :param str url: the url of the listing
+           :param str day: the day of the listing in format YYYY.MM.DD,
+                           None for the product directory
+        """
+        try:
+            with open(self._path(url)) as fil:
+                cached = json.load(fil)
+        except (IOError, OSError, ValueError):
+            return None
+        if cached['url'] != url:
+            return None
+        if not cached['permanent'] and time.time() - cached['time'] > self.ttl:
+            return None
+        return cached
+
+    def set(self, url, fileids, day=None, sizes=None, times=None):
+        """Store the list of links of a url
+
+           :param str url: the url of the listing
+           :param list fileids: the links contained in the listing
+           :param str day: the day of the listing in format YYYY.MM.DD,
+                           None for the product directory
+           :param dict sizes: the sizes of the files
+           :param dict times: the modification times of the files
+        """
+        # an empty listing is probably a problem of the server
+        if not fileids:
+            return
+        cached = {'url': url, 'time': time.time(), 'fileids': list(fileids),
+                  'permanent': self.isPermanent(day), 'sizes': sizes or {},
+                  'times': times or {}}
+        # write to a temporary file and rename it, to never leave an
+        # incomplete listing in the cache
+        fd, tmp = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fil:
+            json.dump(cached, fil)
+        getattr(os, 'replace', os.rename)(tmp, self._path(url))
+
+
+# the network errors; on python 3 socket.error is OSError, that includes
+# also the errors of the local files like a full disk
+try:
+    NETWORK_ERRORS = (ConnectionError, socket.timeout, socket.gaierror,
+                      socket.herror)
+except NameError:
+    NETWORK_ERRORS = (socket.error,)
+# the error numbers of the network errors raised as plain OSError
+NETWORK_ERRNOS = set(getattr(errno, name) for name in (
+    'ECONNRESET', 'ECONNREFUSED', 'ECONNABORTED', 'EPIPE', 'ETIMEDOUT',
+    'ENETUNREACH', 'ENETDOWN', 'ENETRESET', 'EHOSTUNREACH', 'EHOSTDOWN')
+    if hasattr(errno, name))
+
+
+def isNetworkError(error):
+    """Return True if an exception is a network error and not an error of
+       the local files
+
+       :param error: the exception
+    """
+    if isinstance(error, NETWORK_ERRORS):
+        return True
+    return getattr(error, 'errno', None) in NETWORK_ERRNOS
+
+
+class DownloadError(Exception):
+    """Error raised when a downloaded file is not complete or corrupted"""
+    pass
+
+
+class RetryError(Exception):
+    """Error raised when an operation failed after all the attempts allowed
+       by the retry policy
+
+       :param error: the last error raised by the operation
+    """
+    def __init__(self, message, error=None):
+        """Function to initialize the object"""
+        Exception.__init__(self, message)
+        self.error = error
+
+
+class RetryPolicy:
+    """The policy used to retry the network operations. The delay between
+       two attempts grows exponentially, from 'backoff' to 'maxdelay'
+       seconds, with a random jitter to avoid that several clients retry at
+       the same time. Only the transient errors are retried: network
+       errors, FTP temporary errors, incomplete downloads and the HTTP
+       status codes in 'statuses'; the errors of the local files, like a
+       full disk, are not retried
+
+       :param int attempts: the maximum number of attempts, a negative value
+                            means unlimited attempts
+       :param float backoff: the delay in seconds after the first failure
+       :param float factor: the multiplier of the delay after each failure
+       :param float maxdelay: the maximum delay in seconds between two
+                              attempts
+       :param float jitter: the fraction of the delay randomly added or
+                            removed, between 0 and 1
+       :param float deadline: the maximum time in seconds spent retrying an
+                              operation, None for no limit
+       :param tuple transient: the exception classes to retry
+       :param tuple statuses: the HTTP status codes to retry
+       :param metrics: a DownloadMetrics object counting the retries by
+                       cause
+    """
+    TRANSIENT = NETWORK_ERRORS + (EOFError, ftplib.error_temp,
+                                  ftplib.error_reply,
+                                  requests.exceptions.RequestException,
+                                  DownloadError)
+    STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+    def __init__(self, attempts=10, backoff=1, factor=2, maxdelay=300,
+                 jitter=0.5, deadline=None, transient=None, statuses=None,
+                 metrics=None):
+        """Function to initialize the object"""
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.maxdelay = maxdelay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.transient = transient or self.TRANSIENT
+        self.statuses = statuses or self.STATUSES
+        self.metrics = metrics
+
+    def copy(self, **kwargs):
+        """Return a copy of the policy, changing the given parameters"""
+        params = dict(attempts=self.attempts, backoff=self.backoff,
+                      factor=self.factor, maxdelay=self.maxdelay,
+                      jitter=self.jitter, deadline=self.deadline,
+                      transient=self.transient, statuses=self.statuses,
+                      metrics=self.metrics)
+        params.update(kwargs)
+        return RetryPolicy(**params)
+
+    @staticmethod
+    def cause(error):
+        """Return a short description of the cause of an error, the HTTP
+           status or the name of the exception
+
+           :param error: the exception raised by the operation
+        """
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', getattr(error, 'status',
+                                                          None))
+        if isinstance(status, int):
+            return 'http_{st}'.format(st=status)
+        return type(error).__name__
+
+    def isTransient(self, error):
+        """Return True if the error should be retried
+
+           :param error: the exception raised by the operation
+        """
+        # requests errors contain the response, aiohttp ones the status
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', getattr(error, 'status',
+                                                          None))
+        if isinstance(status, int):
+            return status in self.statuses
+        if isinstance(error, self.transient):
+            return True
+        # the network errors raised as plain OSError, like EHOSTUNREACH
+        return getattr(error, 'errno', None) in NETWORK_ERRNOS
+
+    def delay(self, attempt):
+        """Return the seconds to wait after the failure of an attempt
+
+           :param int attempt: the number of the failed attempt, from 1
+        """
+        wait = min(self.maxdelay, self.backoff * self.factor ** (attempt - 1))
+        return wait * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def wait(self, error, attempt, start):
+        """Return the seconds to wait before the next attempt, or raise an
+           exception if the operation should not be retried
+
+           :param error: the exception raised by the operation
+           :param int attempt: the number of the failed attempt, from 1
+           :param float start: the time of the first attempt
+
+           :return: the seconds to wait
+        """
+        if not self.isTransient(error):
+            raise error
+        if 0 <= self.attempts <= attempt:
+            raise RetryError("Failed after {n} attempts, the last error "
+                             "was: {er}".format(n=attempt, er=error), error)
+        wait = self.delay(attempt)
+        if self.deadline is not None and \
+           time.time() + wait - start > self.deadline:
+            raise RetryError("Failed after {s} seconds, the last error "
+                             "was: {er}".format(s=int(time.time() - start),
+                                                er=error), error)
+        if self.metrics:
+            self.metrics.inc('retries_total', cause=self.cause(error))
+        return wait
+
+    def call(self, func, *args):
+        """Call a function until it succeeds or the policy gives up
+
+           :param func: the function to call
+           :param args: the arguments of the function
+
+           :return: the value returned by func
+        """
+        start = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args)
+            except Exception as e:
+                wait = self.wait(e, attempt, start)
+                logging.warning("Attempt {n} failed with error '{er}', "
+                                "retrying in {s:.1f} "
+                                "seconds".format(n=attempt, er=e, s=wait))
+                time.sleep(wait)
+
+
+class FTPPool:
+    """A pool of logged-in FTP sessions, to download several files at the
+       same time. The sessions are opened when they are needed, up to
+       'size', and checked with a NOOP command before being reused; a
+       session that fails is closed and replaced by a new one. The files
+       must be requested with their absolute path
+
+       :param str host: the FTP server
+       :param str user: the user name to login
+       :param str password: the password to login
+       :param int size: the maximum number of sessions
+       :param int timeout: the timeout in seconds of the connections
+    """
+    BROKEN = NETWORK_ERRORS + (EOFError, ftplib.error_temp, ftplib.error_reply)
+
+    def __init__(self, host, user, password, size=4, timeout=None):
+        """Function to initialize the object"""
+        self.host = host
+        self.user = user
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.idle = Queue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def _open(self):
+        """Open and login a new session"""
+        ftp = FTP(self.host, timeout=self.timeout)
+        ftp.login(self.user, self.password)
+        return ftp
+
+    def _close(self, ftp):
+        """Close a session ignoring the errors"""
+        try:
+            ftp.quit()
+        except ftplib.all_errors:
+            ftp.close()
+
+    def acquire(self):
+        """Return a working session, waiting for a free one if all the
+           sessions are used
+        """
+        ftp = None
+        try:
+            ftp = self.idle.get_nowait()
+        except Empty:
+            with self.lock:
+                create = self.opened < self.size
+                if create:
+                    self.opened += 1
+            if create:
+                try:
+                    return self._open()
+                except Exception:
+                    with self.lock:
+                        self.opened -= 1
+                    raise
+            ftp = self.idle.get()
+        # health check of an idle session
+        try:
+            ftp.voidcmd('NOOP')
+        except ftplib.all_errors:
+            logging.warning("FTP session not working, opening a new one")
+            self._close(ftp)
+            try:
+                ftp = self._open()
+            except Exception:
+                with self.lock:
+                    self.opened -= 1
+                raise
+        return ftp
+
+    def release(self, ftp, broken=False):
+        """Give back a session to the pool
+
+           :param ftp: the session returned by acquire
+           :param bool broken: True if the session had an error and it
+                               should be closed
+        """
+        if broken:
+            self._close(ftp)
+            with self.lock:
+                self.opened -= 1
+        else:
+            self.idle.put(ftp)
+
+    @contextmanager
+    def session(self):
+        """Context manager to use a session of the pool"""
+        ftp = self.acquire()
+        try:
+            yield ftp
+        except self.BROKEN:
+            self.release(ftp, broken=True)
+            raise
+        except Exception:
+            self.release(ftp)
+            raise
+        else:
+            self.release(ftp)
+
+    def close(self):
+        """Close all the idle sessions"""
+        while True:
+            try:
+                ftp = self.idle.get_nowait()
+            except Empty:
+                break
+            self._close(ftp)
+            with self.lock:
+                self.opened -= 1
+
+
+class MirrorPool:
+    """A list of mirrors of the same HTTP server tree. Each request is sent
+       to the best mirror and, if it fails, to the following ones. The
+       latency and the error rate of each mirror are measured: with the
+       'failover' policy the mirrors are used in the given order, the next
+       one only while the previous ones are failing; with the 'balance'
+       policy the requests are distributed among the working mirrors
+       proportionally to their weight divided by their latency. A mirror
+       that fails with a network error or a transient HTTP status is not
+       used for 'cooldown' seconds, doubled at each consecutive failure,
+       unless all the mirrors are failing; a file missing on a mirror is
+       requested to the following one, see :meth:`failed`
+
+       :param list urls: the base urls of the mirrors, each one a string or
+                         a tuple with the url and its weight; the first one
+                         is the primary server and the urls requested to the
+                         pool are relative to it
+       :param str policy: 'failover' or 'balance'
+       :param float cooldown: the seconds a failing mirror is not used
+       :param retry: the RetryPolicy deciding which error is raised when all
+                     the mirrors fail, the transient ones are preferred
+       :param metrics: a DownloadMetrics object counting the requests of
+                       each mirror
+    """
+    POLICIES = ('failover', 'balance')
+    # the weight of the last measure in the moving averages
+    ALPHA = 0.3
+
+    def __init__(self, urls, policy='failover', cooldown=60, retry=None,
+                 metrics=None):
+        """Function to initialize the object"""
+        if isinstance(urls, str):
+            urls = [urls]
+        if policy not in self.POLICIES:
+            raise ValueError("The mirror policy should be one of "
+                             "{po}".format(po=', '.join(self.POLICIES)))
+        self.policy = policy
+        self.cooldown = cooldown
+        self.retry = retry
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.mirrors = []
+        for url in urls:
+            weight = 1
+            if isinstance(url, (tuple, list)):
+                url, weight = url
+            url = url.rstrip('/')
+            if URLPARSE:
+                host = urlparse(url).hostname
+            else:
+                host = url.split('/')[2].split(':')[0]
+            self.mirrors.append(dict(url=url, host=host, weight=float(weight),
+                                     latency=None, errors=0.0, failures=0,
+                                     down=0))
+        if not self.mirrors:
+            raise ValueError("At least one url is required")
+        self.primary = self.mirrors[0]['url']
+
+    def __len__(self):
+        return len(self.mirrors)
+
+    @property
+    def hosts(self):
+        """Return the names of the servers of the mirrors"""
+        return tuple(mirror['host'] for mirror in self.mirrors)
+
+    def _find(self, url):
+        """Return the mirror of an url, None if it is not of a mirror"""
+        for mirror in self.mirrors:
+            if url == mirror['url'] or url.startswith(mirror['url'] + '/'):
+                return mirror
+        return None
+
+    def host(self, url):
+        """Return the name of the server of an url
+
+           :param str url: the url of a mirror
+        """
+        mirror = self._find(url)
+        if mirror:
+            return mirror['host']
+        return urlparse(url).hostname if URLPARSE else \
+            url.split('/')[2].split(':')[0]
+
+    def rebase(self, url, base):
+        """Return the url of another mirror
+
+           :param str url: the url of the primary server
+           :param str base: the base url of the mirror
+        """
+        if url.startswith(self.primary):
+            return base + url[len(self.primary):]
+        return url
+
+    def _score(self, mirror, latency):
+        """Return how much a mirror should be used, higher is better"""
+        latency = mirror['latency'] or latency
+        return mirror['weight'] * (1 - 0.9 * mirror['errors']) / \
+            max(latency, 0.001)
+
+    def ordered(self):
+        """Return the base urls of the mirrors in the order they have to be
+           tried
+        """
+        now = time.time()
+        with self.lock:
+            working = [mir for mir in self.mirrors if mir['down'] <= now]
+            failing = sorted([mir for mir in self.mirrors
+                              if mir['down'] > now],
+                             key=lambda mir: mir['down'])
+            if self.policy == 'balance' and len(working) > 1:
+                # the mirrors not measured yet get the average latency
+                known = [mir['latency'] for mir in working if mir['latency']]
+                latency = sum(known) / len(known) if known else 1.0
+                scores = [self._score(mir, latency) for mir in working]
+                # the first mirror is random, the others by score
+                pick = random.uniform(0, sum(scores))
+                first = len(working) - 1
+                for n, score in enumerate(scores):
+                    pick -= score
+                    if pick <= 0:
+                        first = n
+                        break
+                rest = sorted(range(len(working)), key=lambda n: -scores[n])
+                working = [working[first]] + [working[n] for n in rest
+                                              if n != first]
+        return [mir['url'] for mir in working + failing]
+
+    def measure(self, url, seconds):
+        """Record the latency of a request, the time until the response
+           was received
+
+           :param str url: the requested url
+           :param float seconds: the latency
+        """
+        mirror = self._find(url)
+        if not mirror:
+            return
+        with self.lock:
+            if mirror['latency'] is None:
+                mirror['latency'] = seconds
+            else:
+                mirror['latency'] += self.ALPHA * (seconds -
+                                                   mirror['latency'])
+
+    def report(self, url, error=False):
+        """Record the result of a request
+
+           :param str url: the requested url
+           :param bool error: True if the request failed
+        """
+        mirror = self._find(url)
+        if not mirror:
+            return
+        with self.lock:
+            mirror['errors'] += self.ALPHA * (int(error) - mirror['errors'])
+            if error:
+                mirror['failures'] += 1
+                mirror['down'] = time.time() + self.cooldown * \
+                    2 ** min(mirror['failures'] - 1, 5)
+            else:
+                mirror['failures'] = 0
+                mirror['down'] = 0
+        if self.metrics:
+            self.metrics.inc('mirror_requests_total', mirror=mirror['host'],
+                             status='failed' if error else 'ok')
+
+    def failed(self, url, error):
+        """Record a failed request and return True if the following mirror
+           has to be tried. Only the network errors and the transient HTTP
+           statuses count as failures of the mirror; a file missing on a
+           mirror (like a 404) is tried on the following one without
+           marking the mirror as failing, the errors of the downloaded data
+           and of the local files are raised at once
+
+           :param str url: the requested url
+           :param error: the exception raised by the request
+
+           :return: True to try the following mirror, False to raise the
+                    error
+        """
+        retry = self.retry or RetryPolicy()
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', getattr(error, 'status',
+                                                          None))
+        if isinstance(status, int):
+            if status in retry.statuses:
+                self.report(url, error=True)
+            return True
+        if isinstance(error, DownloadError):
+            # wrong size or checksum, retried by the RetryPolicy
+            return False
+        if isNetworkError(error) or retry.isTransient(error):
+            self.report(url, error=True)
+            return True
+        return False
+
+    def error(self, errors):
+        """Return the error to raise when all the mirrors failed
+
+           :param list errors: the errors of the mirrors
+        """
+        if self.retry:
+            for error in errors:
+                if self.retry.isTransient(error):
+                    return error
+        return errors[-1]
+
+    def call(self, func, url, *args):
+        """Call a function with the url of the best mirror, holding a
+           connection to its server (see :data:`CONNECTIONS`), and with the
+           urls of the following mirrors if it fails
+
+           :param func: the function to call, the url of the mirror is its
+                        first argument
+           :param str url: the url of the primary server
+           :param args: the other arguments of the function
+
+           :return: the value returned by func
+        """
+        errors = []
+        for base in self.ordered():
+            mirrorurl = self.rebase(url, base)
+            try:
+                with CONNECTIONS.slot(self.host(mirrorurl)):
+                    result = func(mirrorurl, *args)
+            except Exception as e:
+                if not self.failed(mirrorurl, e):
+                    raise
+                errors.append(e)
+                if len(errors) < len(self.mirrors):
+                    logging.warning("Mirror {mi} failed with error '{er}', "
+                                    "trying the next one".format(mi=base,
+                                                                 er=e))
+                continue
+            self.report(mirrorurl)
+            return result
+        raise self.error(errors)
+
+
+class BandwidthLimiter:
+    """A token bucket limiting the bandwidth used by the downloads, it can
+       be shared by several threads. The tokens are reserved in advance, so
+       a download waits for the time needed to transfer the previous data
+       at the configured rate
+
+       :param int rate: the maximum bandwidth in bytes per second, None to
+                        disable the limit
+       :param int burst: the maximum number of bytes that can be
+                         transferred at once after a pause, by default the
+                         bytes of one second
+    """
+
+    def __init__(self, rate=None, burst=None):
+        """Function to initialize the object"""
+        self.lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate=None, burst=None):
+        """Set the bandwidth limit
+
+           :param int rate: the maximum bandwidth in bytes per second, None
+                            to disable the limit
+           :param int burst: the maximum number of bytes that can be
+                             transferred at once after a pause
+        """
+        with self.lock:
+            self.rate = float(rate) if rate else None
+            self.burst = float(burst or rate or 0)
+            self.tokens = self.burst
+            self.last = time.time()
+
+    def reserve(self, nbytes):
+        """Take the tokens for some bytes
+
+           :param int nbytes: the number of bytes transferred
+
+           :return: the seconds to wait before to transfer other data
+        """
+        if not self.rate:
+            return 0
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens +
+                              (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= nbytes
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def consume(self, nbytes):
+        """Take the tokens for some bytes, waiting if they are not available
+
+           :param int nbytes: the number of bytes transferred
+        """
+        delay = self.reserve(nbytes)
+        if delay:
+            time.sleep(delay)
+
+
+class ConnectionLimiter:
+    """Limit the number of simultaneous requests to each server, it can be
+       shared by several threads
+
+       :param int maxconn: the maximum number of requests for each server,
+                           None to disable the limit
+    """
+
+    def __init__(self, maxconn=None):
+        """Function to initialize the object"""
+        self.condition = threading.Condition()
+        self.active = dict()
+        self.maxconn = maxconn
+
+    def configure(self, maxconn=None):
+        """Set the maximum number of requests for each server
+
+           :param int maxconn: the maximum number of requests, None to
+                               disable the limit
+        """
+        with self.condition:
+            self.maxconn = maxconn
+            self.condition.notify_all()
+
+    def acquire(self, host, blocking=True):
+        """Take a connection to a server
+
+           :param str host: the name of the server
+           :param bool blocking: True to wait for a free connection
+
+           :return: True if the connection was taken
+        """
+        with self.condition:
+            while self.maxconn and self.active.get(host, 0) >= self.maxconn:
+                if not blocking:
+                    return False
+                self.condition.wait()
+            self.active[host] = self.active.get(host, 0) + 1
+            return True
+
+    def release(self, host):
+        """Release a connection to a server
+
+           :param str host: the name of the server
+        """
+        with self.condition:
+            self.active[host] -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, host):
+        """Context manager holding a connection to a server
+
+           :param str host: the name of the server
+        """
+        self.acquire(host)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+
+# the limits shared by all the downloads of the process
+BANDWIDTH = BandwidthLimiter()
+CONNECTIONS = ConnectionLimiter()
+
+
+class DownloadMetrics:
+    """Counters, gauges and histograms describing the downloads, they can
+       be shared by several threads. The values can be read with
+       :meth:`get`, :meth:`histogram` and :meth:`snapshot` or written to a
+       JSON or Prometheus textfile, also periodically by a background
+       thread (see :meth:`startDump`).
+
+       The metrics collected by :class:`downModis` are:
+
+       * bytes_total: the bytes downloaded
+       * files_total: the files downloaded, with label status 'ok' or
+         'failed'
+       * retries_total: the retried attempts, with label cause
+       * active_downloads: the files downloading now
+       * file_seconds: the time to download a file, retries included
+       * listing_seconds: the time to download a listing of the server
+       * validation_seconds: the time to check a file, with label tier
+
+       :param dict labels: the labels added to all the metrics, as the
+                           product
+       :param tuple buckets: the upper bounds of the buckets of the
+                             histograms, in seconds
+    """
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, labels=None, buckets=None):
+        """Function to initialize the object"""
+        self.labels = labels or dict()
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self.lock = threading.Lock()
+        self.counters = dict()
+        self.gauges = dict()
+        self.histograms = dict()
+        self.dumpThread = None
+        self.dumpStop = None
+
+    @staticmethod
+    def _key(name, labels):
+        """Return the key of a metric with its labels"""
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name, value=1, **labels):
+        """Increase a counter
+
+           :param str name: the name of the counter
+           :param value: the value to add
+           :param labels: the labels of the counter
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add(self, name, value=1, **labels):
+        """Change the value of a gauge
+
+           :param str name: the name of the gauge
+           :param value: the value to add, negative to decrease it
+           :param labels: the labels of the gauge
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Add a value to a histogram
+
+           :param str name: the name of the histogram
+           :param float value: the observed value
+           :param labels: the labels of the histogram
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = dict(
+                    count=0, sum=0.0, buckets=[0] * len(self.buckets))
+            hist['count'] += 1
+            hist['sum'] += value
+            for n, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist['buckets'][n] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Context manager adding its duration to a histogram
+
+           :param str name: the name of the histogram
+           :param labels: the labels of the histogram
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def get(self, name, **labels):
+        """Return the value of a counter or of a gauge, 0 if it does not
+           exist
+
+           :param str name: the name of the metric
+           :param labels: the labels of the metric, without the labels
+                          common to all the metrics
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            return self.counters.get(key, self.gauges.get(key, 0))
+
+    def histogram(self, name, **labels):
+        """Return a dictionary with count, sum and the cumulative counts of
+           the buckets of a histogram, None if it does not exist
+
+           :param str name: the name of the histogram
+           :param labels: the labels of the histogram
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                return None
+            return dict(count=hist['count'], sum=hist['sum'],
+                        buckets=list(zip(self.buckets, hist['buckets'])))
+
+    def snapshot(self):
+        """Return all the metrics as a dictionary"""
+        def item(key, **values):
+            labels = dict(self.labels)
+            labels.update(key[1])
+            values.update(name=key[0], labels=labels)
+            return values
+
+        with self.lock:
+            return dict(
+                time=time.time(),
+                counters=[item(key, value=value) for key, value in
+                          sorted(self.counters.items())],
+                gauges=[item(key, value=value) for key, value in
+                        sorted(self.gauges.items())],
+                histograms=[item(key, count=hist['count'], sum=hist['sum'],
+                                 buckets=list(zip(self.buckets,
+                                                  hist['buckets'])))
+                            for key, hist in sorted(self.histograms.items())])
+
+    def toJSON(self):
+        """Return all the metrics as a JSON string"""
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def toPrometheus(self, prefix='pymodis_'):
+        """Return all the metrics in the Prometheus text format
+
+           :param str prefix: the prefix of the names of the metrics
+        """
+        def labels(values, **extra):
+            values = dict(values)
+            values.update(extra)
+            if not values:
+                return ''
+            return '{' + ','.join('{k}="{v}"'.format(
+                k=k, v=str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                for k, v in sorted(values.items())) + '}'
+
+        snap = self.snapshot()
+        lines = []
+        for kind, metrics in (('counter', snap['counters']),
+                              ('gauge', snap['gauges'])):
+            names = set()
+            for metric in metrics:
+                name = prefix + metric['name']
+                if name not in names:
+                    lines.append('# TYPE {n} {k}'.format(n=name, k=kind))
+                    names.add(name)
+                lines.append('{n}{l} {v}'.format(n=name,
+                                                 l=labels(metric['labels']),
+                                                 v=metric['value']))
+        names = set()
+        for metric in snap['histograms']:
+            name = prefix + metric['name']
+            if name not in names:
+                lines.append('# TYPE {n} histogram'.format(n=name))
+                names.add(name)
+            for bound, count in metric['buckets']:
+                lines.append('{n}_bucket{l} {c}'.format(
+                    n=name, l=labels(metric['labels'], le=bound), c=count))
+            lines.append('{n}_bucket{l} {c}'.format(
+                n=name, l=labels(metric['labels'], le='+Inf'),
+                c=metric['count']))
+            lines.append('{n}_sum{l} {v}'.format(n=name,
+                                                 l=labels(metric['labels']),
+                                                 v=metric['sum']))
+            lines.append('{n}_count{l} {v}'.format(n=name,
+                                                   l=labels(metric['labels']),
+                                                   v=metric['count']))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, fmt='json'):
+        """Write all the metrics to a file, replaced atomically
+
+           :param str path: the path of the file
+           :param str fmt: the format, 'json' or 'prometheus'
+        """
+        if fmt == 'prometheus':
+            text = self.toPrometheus()
+        else:
+            text = self.toJSON()
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix='.metrics')
+        with os.fdopen(fd, 'w') as fil:
+            fil.write(text)
+        getattr(os, 'replace', os.rename)(tmp, path)
+
+    def startDump(self, path, interval=60, fmt='json'):
+        """Write the metrics to a file every 'interval' seconds in a
+           background thread, until :meth:`stopDump` is called
+
+           :param str path: the path of the file
+           :param float interval: the seconds between two writes
+           :param str fmt: the format, 'json' or 'prometheus'
+        """
+        self.stopDump()
+        self.dumpStop = threading.Event()
+        self.dumpPath = path
+        self.dumpFormat = fmt
+
+        def run(stop):
+            """Write the metrics until the event is set"""
+            while not stop.wait(interval):
+                try:
+                    self.dump(path, fmt)
+                except (IOError, OSError) as e:
+                    logging.warning("Cannot write the metrics to {name}: "
+                                    "{err}".format(name=path, err=e))
+
+        self.dumpThread = threading.Thread(target=run, args=(self.dumpStop,))
+        self.dumpThread.daemon = True
+        self.dumpThread.start()
+
+    def stopDump(self):
+        """Stop the background thread and write the metrics a last time"""
+        if not self.dumpThread:
+            return
+        self.dumpStop.set()
+        self.dumpThread.join()
+        self.dumpThread = None
+        self.dump(self.dumpPath, self.dumpFormat)
+
+
+# a file queued in a DownloadScheduler
+ScheduledFile = namedtuple('ScheduledFile', ['day', 'name', 'product', 'tile',
+                                             'kind', 'size', 'turn', 'owner'])
+
+
+class DownloadScheduler:
+    """A priority queue of the files to download, shared by one or more
+       :class:`downModis` objects (see :meth:`downModis.scheduleDays`). The
+       order is set by a policy:
+
+       * 'newest': the most recent days first
+       * 'tiles': the tiles in 'priority' first, most recent days first,
+         then the other tiles
+       * 'smallest': the smallest files first, the files without a known
+         size at the end
+       * 'roundrobin': one file of each product in turn, useful when the
+         scheduler is shared by the objects of several products
+
+       Inside a granule the XML file comes before the HDF file, and the HDF
+       file is started only when its XML file is finished, because the
+       checksum of the HDF file is read from it. A custom
+       policy is a function receiving the scheduler and a
+       :data:`ScheduledFile` and returning a sortable key, lower keys are
+       downloaded first
+
+       :param policy: the name of a policy or a function
+       :param list priority: the tiles to download first with the 'tiles'
+                             policy
+    """
+    def __init__(self, policy='newest', priority=None):
+        """Function to initialize the object"""
+        policies = dict(newest=self.newestFirst, tiles=self.tilesFirst,
+                        smallest=self.smallestFirst,
+                        roundrobin=self.roundRobin)
+        if callable(policy):
+            self.policy = lambda entry: policy(self, entry)
+        elif policy in policies:
+            self.policy = policies[policy]
+        else:
+            raise ValueError("The policy should be one of: {pol}".format(
+                pol=", ".join(sorted(policies.keys()))))
+        if isinstance(priority, str):
+            priority = priority.split(',')
+        self.priority = list(priority or [])
+        self.lock = threading.Lock()
+        self.queue = []
+        self.count = 0
+        self.turns = dict()
+        # the XML files queued or downloading and the data files waiting
+        # for them, by owner and name of the XML file
+        self.xmls = dict()
+        self.waiting = dict()
+
+    @staticmethod
+    def dayNumber(day):
+        """Return the day in format YYYY.MM.DD as a number"""
+        return int(day.replace('.', ''))
+
+    @staticmethod
+    def kindRank(entry):
+        """Return the order of the type of file inside a granule"""
+        return dict(xml=0, hdf=1).get(entry.kind, 2)
+
+    def newestFirst(self, entry):
+        """The key of the 'newest' policy"""
+        return (-self.dayNumber(entry.day), entry.tile, self.kindRank(entry))
+
+    def tilesFirst(self, entry):
+        """The key of the 'tiles' policy"""
+        if entry.tile in self.priority:
+            rank = self.priority.index(entry.tile)
+        else:
+            rank = len(self.priority)
+        return (rank == len(self.priority), -self.dayNumber(entry.day),
+                rank, entry.tile, self.kindRank(entry))
+
+    def smallestFirst(self, entry):
+        """The key of the 'smallest' policy"""
+        return (entry.size is None, entry.size or 0,
+                -self.dayNumber(entry.day), self.kindRank(entry))
+
+    def roundRobin(self, entry):
+        """The key of the 'roundrobin' policy"""
+        return (entry.turn, )
+
+    def push(self, day, name, size=None, owner=None):
+        """Add a file to the queue
+
+           :param str day: the day in format YYYY.MM.DD
+           :param str name: the name of the file
+           :param int size: the size of the file, None if unknown
+           :param owner: the downModis object downloading the file
+        """
+        granule = parseGranule(name)
+        if owner:
+            product = owner.product
+        else:
+            product = granule.product if granule else name.split('.')[0]
+        with self.lock:
+            turn = self.turns.get(product, 0)
+            self.turns[product] = turn + 1
+            entry = ScheduledFile(day, name, product,
+                                  granule.tile if granule else None,
+                                  name.split('.')[-1], size, turn, owner)
+            self.count += 1
+            if entry.kind == 'xml':
+                key = (owner, name)
+                self.xmls[key] = self.xmls.get(key, 0) + 1
+            heapq.heappush(self.queue, (self.policy(entry), self.count,
+                                        entry))
+
+    def pop(self):
+        """Remove and return the next file to download, None if the queue
+           is empty. A data file whose XML file is not finished is held
+           until :meth:`done` is called for the XML file
+        """
+        with self.lock:
+            while self.queue:
+                item = heapq.heappop(self.queue)
+                entry = item[2]
+                key = (entry.owner, entry.name + '.xml')
+                if entry.kind != 'xml' and key in self.xmls:
+                    self.waiting.setdefault(key, []).append(item)
+                    continue
+                return entry
+            return None
+
+    def done(self, entry):
+        """Mark a file returned by :meth:`pop` as finished, the data file
+           waiting for it, if it is an XML file, is queued again
+
+           :param entry: the ScheduledFile object
+        """
+        if entry.kind != 'xml':
+            return
+        key = (entry.owner, entry.name)
+        with self.lock:
+            self.xmls[key] -= 1
+            if self.xmls[key] > 0:
+                return
+            del self.xmls[key]
+            for item in self.waiting.pop(key, []):
+                heapq.heappush(self.queue, item)
+
+    def __len__(self):
+        """Return the number of files in the queue"""
+        return len(self.queue) + sum(len(items) for items in
+                                     self.waiting.values())
+
+    def run(self, workers=1):
+        """Download the files in the queue, in the order of the policy, the
+           files added while running are downloaded too
+
+           :param int workers: the number of parallel downloads
+
+           :return: a dictionary with (owner, day) as keys and the number of
+                    files not downloaded as values
+        """
+        failed = dict()
+        failedLock = threading.Lock()
+
+        def worker(n):
+            """Download files until the queue is empty"""
+            while True:
+                entry = self.pop()
+                if entry is None:
+                    if not self.waiting:
+                        return
+                    # a data file waits for its XML file
+                    time.sleep(0.1)
+                    continue
+                owner = entry.owner
+                try:
+                    res = owner.downloadFile(entry.name,
+                                             os.path.join(
+                                                 owner.writeFilePath,
+                                                 entry.name),
+                                             entry.day)
+                finally:
+                    # the data file of the granule can start
+                    self.done(entry)
+                with failedLock:
+                    key = (owner, entry.day)
+                    failed[key] = failed.get(key, 0) + res
+
+        if workers > 1:
+            pool = ThreadPool(workers)
+            try:
+                pool.map(worker, range(workers))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            worker(0)
+        return failed
+
+
+# a file that would be downloaded, in a DownloadPlan
+PlannedFile = namedtuple('PlannedFile', ['day', 'name', 'size', 'transfer'])
+
+
+class DownloadPlan:
+    """The files that would be downloaded, returned by
+       :meth:`downModis.plan`. Each file is a :data:`PlannedFile` with the
+       size of the remote file and the bytes to transfer, less than the
+       size when a partial download is resumed and 0 when the file is in the
+       granule cache; both are None when the size is not known
+
+       :param list files: the PlannedFile objects
+       :param float rate: the expected download rate in bytes per second,
+                          None if not known
+    """
+
+    def __init__(self, files, rate=None):
+        """Function to initialize the object"""
+        self.files = list(files)
+        self.rate = rate
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self):
+        return iter(self.files)
+
+    @property
+    def totalBytes(self):
+        """Return the bytes to transfer of the files with a known size"""
+        return sum(fil.transfer for fil in self.files
+                   if fil.transfer is not None)
+
+    @property
+    def unknown(self):
+        """Return the number of files with an unknown size"""
+        return len([fil for fil in self.files if fil.transfer is None])
+
+    def _meanSize(self):
+        """Return the mean size of the files with a known size"""
+        known = [fil.transfer for fil in self.files
+                 if fil.transfer is not None]
+        return float(sum(known)) / len(known) if known else 0
+
+    def estimate(self, rate=None):
+        """Return the estimated seconds to download the files, the files
+           with an unknown size count as the mean size; None if the rate is
+           not known
+
+           :param float rate: the download rate in bytes per second, None
+                              to use the rate of the plan
+        """
+        rate = rate or self.rate
+        if not rate:
+            return None
+        return (self.totalBytes + self.unknown * self._meanSize()) / \
+            float(rate)
+
+    def split(self, parts):
+        """Split the files in groups with about the same bytes to
+           transfer, for example to download them with several processes.
+           The files with an unknown size count as the mean size
+
+           :param int parts: the number of groups
+
+           :return: a list of 'parts' lists of PlannedFile
+        """
+        mean = self._meanSize()
+        groups = [[] for i in range(parts)]
+        # the biggest files first, each one to the smallest group
+        heap = [(0, n) for n in range(parts)]
+        for fil in sorted(self.files, key=lambda fil: -(
+                mean if fil.transfer is None else fil.transfer)):
+            size, n = heapq.heappop(heap)
+            groups[n].append(fil)
+            heapq.heappush(heap, (size + (mean if fil.transfer is None
+                                          else fil.transfer), n))
+        return groups
+
+
+class LocalIndex:
+    """An index in memory of the files in the download directory. It is
+       created reading the directory only once and it is updated when files
+       are downloaded or removed. The MODIS files are grouped by product,
+       date, tile, collection and extension, so the local versions of a
+       remote file are found without reading the directory again. The
+       temporary files of the downloads, like the lock and the '.part'
+       files, are not indexed
+
+       :param str folder: the download directory
+    """
+    # the suffixes of the temporary files
+    TEMPORARY = ('.lock', '.part', '.alloc', '.tmp')
+
+    def __init__(self, folder):
+        """Function to initialize the object"""
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.names = set()
+        self.groups = {}
+        for f in os.listdir(folder):
+            if os.path.isfile(os.path.join(folder, f)):
+                self.add(f)
+
+    @staticmethod
+    def key(name):
+        """Return the key of a file, a tuple with product, date, tile,
+           collection and extension, None if it is not a MODIS file
+
+           :param str name: the name of the file
+        """
+        granule = parseGranule(name)
+        return granule.key if granule else None
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def add(self, name):
+        """Add a file to the index
+
+           :param str name: the name of the file
+        """
+        if name.endswith(self.TEMPORARY):
+            return
+        key = self.key(name)
+        with self.lock:
+            self.names.add(name)
+            if key:
+                self.groups.setdefault(key, set()).add(name)
+
+    def remove(self, name):
+        """Remove a file from the index
+
+           :param str name: the name of the file
+        """
+        key = self.key(name)
+        with self.lock:
+            self.names.discard(name)
+            if key in self.groups:
+                self.groups[key].discard(name)
+                if not self.groups[key]:
+                    del self.groups[key]
+
+    def find(self, name):
+        """Return the local files with the same product, date, tile,
+           collection and extension of a file
+
+           :param str name: the name of the file
+        """
+        key = self.key(name)
+        with self.lock:
+            return sorted(self.groups.get(key, ()))
+
+    def select(self, product, year):
+        """Return the local files of a product for a year
+
+           :param str product: the code of the product, eg. MOD11A1
+           :param str year: the year
+        """
+        prefix = "A{ye}".format(ye=year)
+        with self.lock:
+            return sorted([name for key in self.groups
+                           if key[0] == product and key[1].startswith(prefix)
+                           for name in self.groups[key]])
+
+    def list(self):
+        """Return the names of all the files"""
+        with self.lock:
+            return sorted(self.names)
+
+
+class GranuleChecksum:
+    """Incremental computation of the checksum of a file, while it is
+       downloaded. It supports the types used by the ECS metadata: CKSUM,
+       the POSIX cksum CRC, and MD5 or the SHA family from hashlib
+
+       :param str kind: the type of checksum
+    """
+    # table to reverse the order of the bits of each byte, POSIX cksum is
+    # the not reflected version of the CRC-32 computed by zlib
+    REVERSE = bytes(bytearray(int('{0:08b}'.format(i)[::-1], 2)
+                              for i in range(256)))
+
+    def __init__(self, kind='CKSUM'):
+        """Function to initialize the object"""
+        self.kind = kind.upper()
+        self.length = 0
+        if self.kind == 'CKSUM':
+            self.crc = 0xFFFFFFFF
+            self.hash = None
+        else:
+            self.hash = hashlib.new(self.kind.replace('-', '').lower())
+
+    @classmethod
+    def supported(cls, kind):
+        """Return True if the type of checksum is supported
+
+           :param str kind: the type of checksum
+        """
+        kind = kind.upper()
+        if kind == 'CKSUM':
+            return True
+        try:
+            hashlib.new(kind.replace('-', '').lower())
+            return True
+        except ValueError:
+            return False
+
+    def update(self, data):
+        """Add a chunk of data to the checksum
+
+           :param bytes data: the data
+        """
+        self.length += len(data)
+        if self.hash:
+            self.hash.update(data)
+        else:
+            self.crc = zlib.crc32(data.translate(self.REVERSE), self.crc)
+
+    def updateFile(self, filename):
+        """Add the content of a file to the checksum
+
+           :param str filename: the path of the file
+        """
+        with open(filename, 'rb') as fil:
+            while True:
+                data = fil.read(1048576)
+                if not data:
+                    break
+                self.update(data)
+
+    def value(self):
+        """Return the checksum as string, decimal for CKSUM and hexadecimal
+           for the others
+        """
+        if self.hash:
+            return self.hash.hexdigest()
+        # cksum adds the length of the data to the CRC
+        length = self.length
+        tail = bytearray()
+        while length:
+            tail.append(length & 0xFF)
+            length >>= 8
+        crc = zlib.crc32(bytes(tail).translate(self.REVERSE), self.crc)
+        register = int('{0:032b}'.format(~crc & 0xFFFFFFFF)[::-1], 2)
+        return str(~register & 0xFFFFFFFF)
+
+    def matches(self, expected):
+        """Return True if the checksum is equal to the expected value
+
+           :param str expected: the expected value
+        """
+        return self.value().lower() == expected.strip().lower()
+
+
+class DownloadManifest:
+    """A SQLite database recording the state of the downloads of a
+       destination folder. For each file it stores the day, the remote and
+       local size, the checksum, the status and the time of creation and
+       last update; it also records the days already downloaded completely.
+       It can be shared by several threads. The changes of status can be
+       written in batches: they are kept in memory and written in a single
+       short transaction every 'batch' changes, before every read and when
+       the database is closed
+
+       :param str path: the path of the database file
+       :param int batch: the number of changes of status written together
+    """
+    PENDING = 'pending'
+    IN_PROGRESS = 'in progress'
+    VERIFIED = 'verified'
+    FAILED = 'failed'
+
+    def __init__(self, path, batch=1):
+        """Function to initialize the object"""
+        self.path = path
+        self.batch = max(1, int(batch))
+        # the changes of status not yet written
+        self.pending = []
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60,
+                                    check_same_thread=False)
+        with self.lock:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS granules ("
+                              "name TEXT PRIMARY KEY, product TEXT, "
+                              "day TEXT, remote_size INTEGER, "
+                              "local_size INTEGER, checksum TEXT, "
+                              "status TEXT, created REAL, updated REAL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS granules_status "
+                              "ON granules (product, status)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS days ("
+                              "key TEXT PRIMARY KEY, updated REAL)")
+            # the older manifests stored the product without collection
+            cur = self.conn.execute("SELECT name FROM granules WHERE "
+                                    "product NOT LIKE '%.%'")
+            self.conn.executemany("UPDATE granules SET product = ? "
+                                  "WHERE name = ?",
+                                  [(self.productOf(row[0]), row[0])
+                                   for row in cur.fetchall()])
+            self.conn.commit()
+
+    @staticmethod
+    def productOf(name):
+        """Return the product of a file with its collection, eg.
+           MOD11A1.006, also for the browse files; the first part of the
+           name for the files not following the MODIS convention
+
+           :param str name: the name of the file
+        """
+        granule = parseGranule(name)
+        if granule is None:
+            return name.split('.')[0]
+        return '{pr}.{co}'.format(pr=granule.product, co=granule.collection)
+
+    def setStatus(self, names, status, day=None, remote_size=None,
+                  local_size=None, checksum=None):
+        """Set the status of one or more files, the values not given are
+           left unchanged
+
+           :param names: the name of a file or a list of names
+           :param str status: the new status
+           :param str day: the day of the files in format YYYY.MM.DD
+           :param int remote_size: the size of the file on the server
+           :param int local_size: the size of the downloaded file
+           :param str checksum: the checksum of the file
+        """
+        if isinstance(names, str):
+            names = [names]
+        now = time.time()
+        with self.lock:
+            self.pending.extend((name, status, now, day, remote_size,
+                                 local_size, checksum) for name in names)
+            if len(self.pending) >= self.batch:
+                self._flush()
+
+    def _flush(self):
+        """Write the pending changes of status, the lock must be held"""
+        if not self.pending:
+            return
+        self.conn.executemany("INSERT OR IGNORE INTO granules (name, "
+                              "product, created) VALUES (?, ?, ?)",
+                              [(row[0], self.productOf(row[0]), row[2])
+                               for row in self.pending])
+        self.conn.executemany("UPDATE granules SET status = ?, "
+                              "updated = ?, day = COALESCE(?, day), "
+                              "remote_size = COALESCE(?, remote_size), "
+                              "local_size = COALESCE(?, local_size), "
+                              "checksum = COALESCE(?, checksum) "
+                              "WHERE name = ?",
+                              [row[1:] + row[:1] for row in self.pending])
+        self.conn.commit()
+        self.pending = []
+
+    def flush(self):
+        """Write the pending changes of status"""
+        with self.lock:
+            self._flush()
+
+    def get(self, name):
+        """Return a dictionary with the values of a file, None if the file
+           is not in the manifest
+
+           :param str name: the name of the file
+        """
+        with self.lock:
+            self._flush()
+            cur = self.conn.execute("SELECT name, product, day, remote_size, "
+                                    "local_size, checksum, status, created, "
+                                    "updated FROM granules WHERE name = ?",
+                                    (name,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip(('name', 'product', 'day', 'remote_size',
+                         'local_size', 'checksum', 'status', 'created',
+                         'updated'), row))
+
+    def select(self, product, status):
+        """Return the list of (name, day) of the files of a product with one
+           of the given status
+
+           :param str product: the product with its collection, eg.
+                               MOD11A1.006
+           :param list status: the status to select
+        """
+        query = "SELECT name, day FROM granules WHERE product = ? AND " \
+                "status IN ({qm}) ORDER BY day DESC, name".format(
+                    qm=", ".join("?" * len(status)))
+        with self.lock:
+            self._flush()
+            return self.conn.execute(query, [product] + list(status)).fetchall()
+
+    def setDayComplete(self, key):
+        """Record that all the files of a day were downloaded
+
+           :param str key: the key of the day, see :meth:`downModis._dayKey`
+        """
+        with self.lock:
+            self._flush()
+            self.conn.execute("INSERT OR REPLACE INTO days (key, updated) "
+                              "VALUES (?, ?)", (key, time.time()))
+            self.conn.commit()
+
+    def isDayComplete(self, key):
+        """Return True if all the files of a day were downloaded
+
+           :param str key: the key of the day, see :meth:`downModis._dayKey`
+        """
+        with self.lock:
+            cur = self.conn.execute("SELECT key FROM days WHERE key = ?",
+                                    (key,))
+            return cur.fetchone() is not None
+
+    def close(self):
+        """Write the pending changes and close the database"""
+        with self.lock:
+            self._flush()
+            self.conn.close()
+
+
+class FileLock:
+    """An exclusive lock on a file, shared by the threads and by the
+       processes, also of different hosts on NFS. With fcntl the system
+       releases the lock when the process ends; without it (Windows) the
+       lock file is created exclusively and a lock file older than 'stale'
+       seconds is considered left by a crashed process. The lock file is
+       removed when the lock is released
+
+       :param str path: the path of the lock file
+       :param float stale: the seconds after that a lock file without fcntl
+                           is considered stale
+       :param int mode: the permissions of the lock file, None to use the
+                        umask of the process
+    """
+    # the locks of the threads of this process and the number of threads
+    # using them, by path; they are removed when no thread uses them
+    THREADLOCKS = dict()
+    GUARD = threading.Lock()
+
+    def __init__(self, path, stale=3600, mode=None):
+        """Function to initialize the object"""
+        self.path = path
+        self.stale = stale
+        self.mode = mode
+        self.fd = None
+        self.thread = None
+
+    def _useThreadLock(self):
+        """Return the lock of the threads for the path, creating it"""
+        with self.GUARD:
+            entry = self.THREADLOCKS.setdefault(self.path,
+                                                [threading.Lock(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def _leaveThreadLock(self, held=True):
+        """Release the lock of the threads and remove it if no other thread
+           is using it
+
+           :param bool held: True if the lock is held by this thread
+        """
+        if held:
+            self.thread.release()
+        with self.GUARD:
+            entry = self.THREADLOCKS[self.path]
+            entry[1] -= 1
+            if not entry[1]:
+                del self.THREADLOCKS[self.path]
+        self.thread = None
+
+    def _setMode(self, fd):
+        """Set the permissions of the lock file, if it belongs to the user"""
+        if self.mode is None:
+            return
+        try:
+            os.chmod(self.path, self.mode)
+        except OSError:
+            pass
+
+    def _lockFile(self):
+        """Make a single attempt to lock the file
+
+           :return: True if the file is locked
+        """
+        if fcntl is None:
+            try:
+                self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL |
+                                  os.O_WRONLY)
+                self._setMode(self.fd)
+                return True
+            except OSError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > \
+                       self.stale:
+                        os.remove(self.path)
+                except OSError:
+                    pass
+                return False
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o666)
+        self._setMode(fd)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # the file could be removed by the previous owner of the lock
+            if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                self.fd = fd
+                return True
+        except (IOError, OSError):
+            pass
+        os.close(fd)
+        return False
+
+    def acquire(self, blocking=True):
+        """Take the lock
+
+           :param bool blocking: True to wait until the lock is free
+
+           :return: True if the lock was taken
+        """
+        self.thread = self._useThreadLock()
+        if not self.thread.acquire(blocking):
+            self._leaveThreadLock(held=False)
+            return False
+        try:
+            while not self._lockFile():
+                if not blocking:
+                    self._leaveThreadLock()
+                    return False
+                time.sleep(0.2)
+        except BaseException:
+            # for example the lock file can not be created
+            self._leaveThreadLock()
+            raise
+        return True
+
+    def release(self):
+        """Release the lock"""
+        # with fcntl the file is removed while it is still locked
+        if fcntl is None:
+            os.close(self.fd)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        if fcntl is not None:
+            os.close(self.fd)
+        self.fd = None
+        self._leaveThreadLock()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class GranuleCache:
+    """A directory shared by several downModis objects, also of different
+       processes, users and hosts, where each file is stored only once. The
+       files are stored in a directory for each product, with the checksum
+       verified at the download in a '.cksum' file, and they are exposed in
+       the destination folders with a hard link, or with a symbolic link
+       when the hard link is not possible (for example on another file
+       system), or with a copy. A lock file for each file lets only one
+       process at a time download it, the others wait and then take it from
+       the cache. The directories and the lock files are created writable
+       by all the users, unless a different 'mode' is given
+
+       :param str folder: the directory of the cache
+       :param str link: 'hard' to expose the files with hard links,
+                        'symbolic' with symbolic links or 'copy' with copies
+       :param int mode: the permissions of the directories of the cache,
+                        the lock files have the same without the execute
+                        bits; None to use the umask of the process
+    """
+    LINKS = ('hard', 'symbolic', 'copy')
+
+    def __init__(self, folder, link='hard', mode=0o777):
+        """Function to initialize the object"""
+        if link not in self.LINKS:
+            raise ValueError("The link should be one of "
+                             "{li}".format(li=', '.join(self.LINKS)))
+        self.folder = folder
+        self.link = link
+        self.mode = mode
+        self._makedirs(folder)
+
+    def _makedirs(self, folder):
+        """Create a directory of the cache with the permissions of the
+           cache, if it does not exist
+
+           :param str folder: the path of the directory
+        """
+        if os.path.isdir(folder):
+            return
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # created in the meantime by another process
+            if not os.path.isdir(folder):
+                raise
+            return
+        if self.mode is not None:
+            try:
+                os.chmod(folder, self.mode)
+            except OSError:
+                pass
+
+    def path(self, name):
+        """Return the path of a file in the cache
+
+           :param str name: the name of the file
+        """
+        granule = parseGranule(name)
+        product = granule.product if granule else 'other'
+        return os.path.join(self.folder, product, name)
+
+    def lock(self, name):
+        """Return the FileLock of a file
+
+           :param str name: the name of the file
+        """
+        path = self.path(name)
+        self._makedirs(os.path.dirname(path))
+        mode = None if self.mode is None else self.mode & 0o666
+        return FileLock(path + '.lock', mode=mode)
+
+    def checksum(self, name):
+        """Return the type and the value of the checksum of a cached file,
+           None if it is not known
+
+           :param str name: the name of the file
+        """
+        try:
+            with open(self.path(name) + '.cksum') as fil:
+                kind, value = fil.read().split()
+        except (IOError, OSError, ValueError):
+            return None
+        return kind, value
+
+    def _setChecksum(self, name, expected):
+        """Write the checksum of a cached file"""
+        path = self.path(name) + '.cksum'
+        tmp = '{pa}.{pid}'.format(pa=path, pid=os.getpid())
+        with open(tmp, 'w') as fil:
+            fil.write('{ty} {va}\n'.format(ty=expected[0], va=expected[1]))
+        getattr(os, 'replace', os.rename)(tmp, path)
+
+    def _link(self, src, dst):
+        """Replace dst with a link to src, or a copy of it"""
+        tmp = '{pa}.{pid}.link'.format(pa=dst, pid=os.getpid())
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        modes = self.LINKS[self.LINKS.index(self.link):]
+        for mode in modes:
+            try:
+                if mode == 'hard':
+                    os.link(src, tmp)
+                elif mode == 'symbolic':
+                    os.symlink(os.path.abspath(src), tmp)
+                else:
+                    shutil.copy2(src, tmp)
+                break
+            except (OSError, AttributeError, NotImplementedError):
+                # the links are not supported by the file system
+                if mode == modes[-1]:
+                    raise
+        getattr(os, 'replace', os.rename)(tmp, dst)
+
+    def fetch(self, name, dest, expected=None):
+        """Expose a cached file in a destination, if it is valid
+
+           :param str name: the name of the file
+           :param str dest: the path where to expose the file
+           :param tuple expected: the expected checksum type and value,
+                                  None if not known
+
+           :return: True if the file was found in the cache
+        """
+        path = self.path(name)
+        if not os.path.isfile(path):
+            return False
+        if expected:
+            cached = self.checksum(name)
+            if cached is None or cached[0].upper() != expected[0].upper():
+                # compute the checksum of the file stored without it
+                checksum = GranuleChecksum(expected[0])
+                checksum.updateFile(path)
+                cached = (expected[0], checksum.value())
+                if checksum.matches(expected[1]):
+                    self._setChecksum(name, cached)
+            if cached[1].lower() != expected[1].strip().lower():
+                logging.warning("The cached file {na} has a wrong checksum, "
+                                "it is downloaded again".format(na=path))
+                return False
+        self._link(path, dest)
+        return True
+
+    def store(self, src, name, expected=None):
+        """Add a downloaded file to the cache, if it is not already there,
+           and replace it with a link to the cached file
+
+           :param str src: the path of the downloaded file
+           :param str name: the name of the file
+           :param tuple expected: the verified checksum type and value, None
+                                  if not known
+        """
+        path = self.path(name)
+        if os.path.isfile(path):
+            return
+        self._makedirs(os.path.dirname(path))
+        tmp = '{pa}.{pid}.tmp'.format(pa=path, pid=os.getpid())
+        try:
+            os.link(src, tmp)
+        except (OSError, AttributeError):
+            shutil.copy2(src, tmp)
+        if expected:
+            self._setChecksum(name, expected)
+        getattr(os, 'replace', os.rename)(tmp, path)
+        if self.link != 'copy' and not os.path.samefile(src, path):
+            self._link(path, src)
+
+
+# the file system kept in memory on Linux, see downModis.iterGranules
+MEMORYDIR = '/dev/shm'
+
+
+class MemoryGranule:
+    """A file downloaded in memory by :meth:`downModis.iterGranules`, with
+       its XML metadata file. The HDF4 library reads only real files, so
+       the file is written in a directory kept in memory, like /dev/shm,
+       instead of a GDAL /vsimem/ buffer; its path can be opened by GDAL
+       and the object itself can be passed to
+       :class:`pymodis.convertmodis_gdal.convertModisGDAL`,
+       :class:`pymodis.convertmodis_gdal.createMosaicGDAL` and
+       :class:`pymodis.qualitymodis.QualityModis`. The memory is released
+       by :meth:`close`, also at the end of a 'with' block
+
+       :param str name: the name of the file
+       :param str day: the day in format YYYY.MM.DD
+       :param str path: the path of the file in memory
+       :param str rawpath: the path of the copy kept in the destination
+                           folder, None if it is not kept
+    """
+
+    def __init__(self, name, day, path, rawpath=None):
+        """Function to initialize the object"""
+        self.name = name
+        self.day = day
+        self.path = path
+        self.rawpath = rawpath
+
+    def __repr__(self):
+        return "MemoryGranule('{na}')".format(na=self.name)
+
+    def __str__(self):
+        return self.path
+
+    def __fspath__(self):
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def granule(self):
+        """Return the GranuleName of the file, None if it is not a MODIS
+           file name"""
+        return parseGranule(self.name)
+
+    @property
+    def closed(self):
+        """Return True if the memory was released"""
+        return not os.path.exists(self.path)
+
+    def read(self):
+        """Return the content of the file"""
+        with open(self.path, 'rb') as fil:
+            return fil.read()
+
+    def close(self):
+        """Remove the file and its XML metadata file from memory"""
+        for path in (self.path, self.path + '.xml'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class downModis:
+    """A class to download MODIS data from NASA FTP or HTTP repositories
+
+       :param str destinationFolder: where the files will be stored
+       :param str password: the password required by NASA authentication system
+       :param str user: the user namerequired by NASA authentication system
+       :param str url: the base url from where to download the MODIS data,
+                       it can be FTP or HTTP but it has to start with
+                       'ftp://' or 'http://' or 'https://'. For HTTP it can
+                       also be a list of mirrors hosting the same tree, each
+                       one an url or a tuple with the url and its weight,
+                       see :class:`MirrorPool`
+       :param str path: the directory where the data that you want to
+                        download are stored on the FTP server. For HTTP
+                        requests, this is the part of the url between the 'url'
+                        parameter and the 'product' parameter.
+       :param str product: the code of the product to download, the code
+                           should be idential to the one of the url
+       :param str tiles: a set of tiles to be downloaded, None == all tiles.
+                         This can be passed as a string of tileIDs separated
+                         by commas, or as a list of individual tileIDs
+       :param str today: the day to start downloading; in order to pass a
+                         date different from today use the format YYYY-MM-DD
+       :param str enddate: the day to end downloading; in order to pass a
+                           date use the format YYYY-MM-DD. This day must be
+                           before the 'today' parameter. Downloading happens
+                           in reverse order (currently)
+
+       :param int delta: timelag i.e. the number of days starting from
+                         today backwards. Will be overwritten if
+                         'enddate' is specifed during instantiation
+       :param bool jpeg: set to True if you want to download the JPG overview
+                         file in addition to the HDF
+       :param bool debug: set to True if you want to obtain debug information
+       :param int timeout: Timeout value for HTTP server (seconds)
+       :param bool checkgdal: variable to set the GDAL check
+       :param str validation: how to check the downloaded HDF files when
+                              their checksum is not available: 'gdal' to
+                              open them with GDAL, 'fast' to check only the
+                              structure of the HDF4 file, 'deep' to check
+                              the structure and then to open all the
+                              subdatasets with GDAL in background, the
+                              invalid files are downloaded again at the
+                              end; 'none' to disable the check
+       :param int validationworkers: the number of files checked in parallel
+                                     by the 'deep' validation
+       :param int bandwidth: the maximum bandwidth in bytes per second used
+                             by the downloads, None to leave it unchanged.
+                             The limit is shared by all the downModis
+                             objects of the process, see
+                             :class:`BandwidthLimiter`
+       :param int maxconnections: the maximum number of simultaneous
+                                  requests to each server, None to leave it
+                                  unchanged. The limit is shared by all the
+                                  downModis objects of the process
+       :param metrics: the DownloadMetrics object collecting the metrics of
+                       the downloads, None to create a new one; they are
+                       available as the 'metrics' attribute
+       :param str metricsfile: the path of a file where to write the
+                               metrics periodically, None to disable it
+       :param str metricsformat: the format of metricsfile, 'json' or
+                                 'prometheus'
+       :param float metricsinterval: the seconds between two writes of
+                                     metricsfile
+       :param scheduler: the DownloadScheduler object, or the name of its
+                         policy, used by :meth:`downloadsAllDay` to order
+                         the files of all the days; None to download the
+                         days one after the other
+       :param str mirrorpolicy: how the mirrors in 'url' are used,
+                                'failover' to use them in the given order or
+                                'balance' to distribute the requests by
+                                weight and latency
+       :param float mirrorcooldown: the seconds a failing mirror is not used
+       :param granulecache: the path of a directory shared with other
+                            destination folders, processes and users where
+                            each file is downloaded only once, or a
+                            GranuleCache object; None to disable it
+       :param str cachelink: how the files of the granule cache are exposed
+                             in destinationFolder, 'hard' with hard links,
+                             'symbolic' with symbolic links or 'copy'
+       :param bool preallocate: True to reserve the disk space of each file
+                                before writing it, from the size sent by the
+                                server, see :func:`preallocate`
+       :param int writebuffer: the size in bytes of the buffer of the
+                               downloaded files, None for the default of
+                               the system
+       :param int flushevery: the number of downloaded files after that the
+                              file list and the manifest are written to
+                              disk, 1 to write them after every file
+       :param str memoryfolder: the directory in memory where
+                                :meth:`iterGranules` downloads the files,
+                                None to use /dev/shm if it exists, otherwise
+                                the temporary directory of the system
+       :param int workers: number of files of the same day to download in
+                           parallel, 1 means serial download. With FTP
+                           server a pool of 'workers' sessions is used
+       :param int poolsize: the maximum number of HTTP connections kept
+                            open, by default it is the number of workers
+                            with a minimum of 10
+       :param int buffersize: the size in bytes of the chunks used to write
+                              the downloaded files to disk
+       :param int prefetch: number of listings of the following days to
+                            download in parallel while the files of the
+                            current day are downloaded, 0 to disable it.
+                            It is used only with HTTP server
+       :param listingcache: True to store the listings of the HTTP server
+                            in the '.listingcache' directory inside
+                            destinationFolder, or the path of the directory
+                            to use; False to disable the cache
+       :param int cachettl: the time in seconds after that a cached listing
+                            that can change is downloaded again
+       :param int cachewindow: the number of days before today when the
+                               data could be reprocessed on the server,
+                               listings of older days are cached forever
+       :param retry: a RetryPolicy object used by all the network
+                     operations, None to use the default policy
+       :param bool checksum: True to verify the downloaded files against the
+                             checksum contained in their XML metadata file
+       :param manifest: True to record the state of the downloads in the
+                        'manifest.sqlite' database inside
+                        destinationFolder, or the path of the database to
+                        use; False to disable it. The days older than
+                        'cachewindow' already downloaded completely are
+                        skipped and the downloads interrupted by a crash are
+                        resumed
+    """
+
+    def __init__(self, destinationFolder, password=None, user=None,
+                 url="https://e4ftl01.cr.usgs.gov", tiles=None, path="MOLT",
+                 product="MOD11A1.006", today=None, enddate=None, delta=10,
+                 jpg=False, debug=False, timeout=30, checkgdal=True,
+                 workers=1, poolsize=None, buffersize=1048576, prefetch=0,
+                 listingcache=False, cachettl=3600, cachewindow=60,
+                 retry=None, manifest=False, checksum=True,
+                 validation='gdal', validationworkers=2, bandwidth=None,
+                 maxconnections=None, metrics=None, metricsfile=None,
+                 metricsformat='json', metricsinterval=60, scheduler=None,
+                 mirrorpolicy='failover', mirrorcooldown=60,
+                 granulecache=None, cachelink='hard', preallocate=False,
+                 writebuffer=None, flushevery=1, memoryfolder=None):
+        """Function to initialize the object"""
+
+        # the first mirror is the primary server
+        if isinstance(url, (list, tuple)):
+            mirrors = list(url)
+            url = mirrors[0]
+            if isinstance(url, (list, tuple)):
+                url = url[0]
+        else:
+            mirrors = [url]
+        # prepare the base url and set the url type (ftp/http)
+        if 'ftp://' in url:
+            self.url = url.replace('ftp://', '').rstrip('/')
+            self.urltype = 'ftp'
+        elif 'http://' in url:
+            self.url = url
+            self.urltype = 'http'
+        elif 'https://' in url:
+            self.url = url
+            self.urltype = 'http'
+        else:
+            raise IOError("The url should contain 'ftp://' or 'http://'")
+        if len(mirrors) > 1 and self.urltype != 'http':
+            raise IOError("The mirrors are supported only by HTTP servers")
+        # the name of the server, used to limit the connections
+        if self.urltype == 'ftp':
+            self.host = self.url
+        elif URLPARSE:
+            self.host = urlparse(self.url).hostname
+        else:
+            self.host = self.url.split('/')[2].split(':')[0]
+        # the limits shared by all the downloads of the process
+        if bandwidth is not None:
+            BANDWIDTH.configure(bandwidth)
+        if maxconnections is not None:
+            CONNECTIONS.configure(maxconnections)
+        if not user and not password and not URLPARSE:
+            raise IOError("Please use 'user' and 'password' parameters")
+        elif not user and not password and URLPARSE:
+            self.domain = urlparse(self.url).hostname
+            try:
+                nt = netrc.netrc()
+            except:
+                raise IOError("Please set 'user' and 'password' parameters"
+                              ", netrc file does not exist")
+            try:
+                account = nt.hosts[self.domain]
+            except:
+                try:
+                    account = nt.hosts['urs.earthdata.nasa.gov']
+                except:
+                    raise IOError("Please set 'user' and 'password' parameters"
+                                  ", netrc file does not contain parameter "
+                                  "for NASA url")
+            # user for download
+            self.user = account[0]
+            # password for download
+            self.password = account[2]
+        else:
+            # user for download
+            self.user = user
+            # password for download
+            self.password = password
+        self.userpwd = "{us}:{pw}".format(us=self.user,
+                                          pw=self.password)
+        # the product (product_code.004 or product_cod.005)
+        self.product = product
+        self.product_code = product.split('.')[0]
+        # url directory where data are located
+        self.path = urljoin(path, self.product)
+        # tiles to downloads
+        if isinstance(tiles, str):
+            self.tiles = tiles.split(',')
+        else:  # tiles are list, tuple, or None
+            self.tiles = tiles
+        # set destination folder
+        if not os.path.isdir(destinationFolder):
+            os.makedirs(destinationFolder)
+            self.writeFilePath = destinationFolder
+        elif os.access(destinationFolder, os.W_OK):
+            self.writeFilePath = destinationFolder
+        else:
+            try:
+                os.mkdir(destinationFolder)
+                self.writeFilePath = destinationFolder
+            except:
+                raise Exception("Folder to store downloaded files does not "
+                                "exist or is not writeable")
+        # return the name of product
+        if len(self.path.split('/')) == 2:
+            self.product = self.path.split('/')[1]
+        elif len(self.path.split('/')) == 3:
+            self.product = self.path.split('/')[2]
+        # write a file with the name of file to be downloaded, each run
+        # writes a temporary file published by closeFilelist, so that
+        # several processes can use the same folder
+        self.runStart = time.time()
+        self.filelistPath = os.path.join(self.writeFilePath,
+                                         'listfile{pro}.txt'.format(pro=self.product))
+        self.filelistTemp = os.path.join(self.writeFilePath,
+                                         '.listfile{pro}.{pid}.{ob}.txt'.format(
+                                             pro=self.product, pid=os.getpid(),
+                                             ob=id(self)))
+        self.filelist = open(self.filelistTemp, 'w')
+        # lock to write into the file list from several threads
+        self.filelistLock = threading.Lock()
+        # number of parallel downloads
+        self.workers = max(1, int(workers))
+        # pool of FTP sessions for parallel downloads
+        self.ftpPool = None
+        # number of day listings downloaded in advance
+        self.prefetch = max(0, int(prefetch))
+        # shared HTTP session used by all the requests
+        if not poolsize:
+            poolsize = max(10, self.workers + self.prefetch)
+        self.session = ModisSession(self.user, self.password, poolsize)
+        # size of the chunks written to disk during the download
+        self.buffersize = int(buffersize)
+        # how the downloaded files are written to disk
+        self.preallocate = preallocate
+        self.writebuffer = int(writebuffer) if writebuffer else -1
+        self.flushEvery = max(1, int(flushevery))
+        self.filelistPending = 0
+        # the directory of the files downloaded in memory
+        if memoryfolder is None:
+            if os.path.isdir(MEMORYDIR) and os.access(MEMORYDIR, os.W_OK):
+                memoryfolder = MEMORYDIR
+            else:
+                memoryfolder = tempfile.gettempdir()
+        self.memoryFolder = memoryfolder
+        # set if to download jpgs
+        self.jpeg = jpg
+        # today, or the last day in the download series chronologically
+        self.today = today
+        # chronologically the first day in the download series
+        self.enday = enddate
+        # default number of days to consider if enddate not specified
+        self.delta = delta
+        # status of tile download
+        self.status = True
+        # for debug, you can download only xml files
+        self.debug = debug
+        # for logging
+        log_filename = os.path.join(self.writeFilePath,
+                                    'modis{pro}.log'.format(pro=self.product))
+        log_format = '%(asctime)s - %(process)s - %(levelname)s - ' \
+                     '%(message)s'
+        logging.basicConfig(filename=log_filename, level=logging.DEBUG,
+                            format=log_format)
+        logging.captureWarnings(True)
+        # global connection attempt counter
+        self.nconnection = 0
+        # timeout for HTTP connection before failing (seconds)
+        self.timeout = timeout
+        # files within the directory where data will be saved
+        self.localIndex = LocalIndex(self.writeFilePath)
+        self.fileInPath = self.localIndex.list()
+        global GDAL
+        if not GDAL and checkgdal:
+            logging.warning("WARNING: Python GDAL library not found")
+        elif GDAL and not checkgdal:
+            GDAL = False
+        self.dirData = []
+        # metrics of the downloads
+        if metrics is None:
+            metrics = DownloadMetrics(dict(product=self.product))
+        self.metrics = metrics
+        if metricsfile:
+            self.metrics.startDump(metricsfile, metricsinterval,
+                                   metricsformat)
+        # sizes and modification times of the remote files, when the
+        # listings of the server contain them
+        self.remoteSizes = dict()
+        self.remoteTimes = dict()
+        # order of the downloads
+        if isinstance(scheduler, str):
+            scheduler = DownloadScheduler(scheduler)
+        self.scheduler = scheduler
+        # days and listings queued in a scheduler
+        self.scheduledDays = []
+        # policy to retry the network operations
+        if retry is None:
+            retry = RetryPolicy()
+        self.retry = retry.copy(metrics=self.metrics)
+        # the mirrors of the http server
+        if self.urltype == 'http':
+            self.mirrors = MirrorPool(mirrors, mirrorpolicy, mirrorcooldown,
+                                      self.retry, self.metrics)
+        else:
+            self.mirrors = None
+        # verify the checksum of the files
+        self.checksum = checksum
+        # check of the downloaded HDF files
+        if validation not in ('gdal', 'fast', 'deep', 'none'):
+            raise ValueError("validation should be 'gdal', 'fast', 'deep' "
+                             "or 'none'")
+        self.validation = validation
+        self.validationWorkers = max(1, int(validationworkers))
+        # background validation, created at the first file to check
+        self.validationPool = None
+        self.validationJobs = []
+        self.validationLock = threading.Lock()
+        # files that failed the background validation
+        self.invalidFiles = []
+        # days to record as complete after the background validation
+        self.pendingDays = []
+        # days before today when the data could be reprocessed
+        self.cachewindow = cachewindow
+        # database with the state of the downloads
+        if manifest is True:
+            manifest = os.path.join(self.writeFilePath, 'manifest.sqlite')
+        if manifest:
+            self.manifest = DownloadManifest(manifest, self.flushEvery)
+        else:
+            self.manifest = None
+        # cache of the server listings
+        if listingcache is True:
+            listingcache = os.path.join(self.writeFilePath, '.listingcache')
+        if listingcache:
+            self.listingCache = ListingCache(listingcache, cachettl,
+                                             cachewindow)
+        else:
+            self.listingCache = None
+        # cache of the files shared with other destination folders
+        if granulecache and not isinstance(granulecache, GranuleCache):
+            granulecache = GranuleCache(granulecache, cachelink)
+        self.granuleCache = granulecache or None
+        # the files downloaded without the granule cache, it can not be
+        # locked
+        self.cacheSkipped = set()
+
+    def removeEmptyFiles(self):
+        """Function to remove files in the download directory that have
+           filesize equal to 0
+        """
+        year = str(date.today().year)
+        prefix = self.product.split('.')[0]
+        files = self.localIndex.select(prefix, year)
+        for f in files:
+            if f.endswith(LocalIndex.TEMPORARY):
+                # the empty lock files are held by the running downloads
+                continue
+            fil = os.path.join(self.writeFilePath, f)
+            try:
+                if os.path.getsize(fil) == 0:
+                    os.remove(fil)
+                    self.localIndex.remove(f)
+            except OSError:
+                # removed by another process using the same folder
+                self.localIndex.remove(f)
+
+    def connect(self, ncon=20):
+        """Connect to the server and fill the dirData variable
+
+           :param int ncon: maximum number of attempts to connect to the HTTP
+                            server before failing
+        """
+        if self.urltype == 'ftp':
+            self._connectFTP(ncon)
+        elif self.urltype == 'http':
+            self._connectHTTP(ncon)
+        if len(self.dirData) == 0:
+            raise Exception("There are some troubles with the server. "
+                            "The directory seems to be empty")
+
+    def _connectPolicy(self, ncon):
+        """Return the retry policy to connect to the server
+
+           :param int ncon: maximum number of attempts to connect to the
+                            server before failing. If ncon < 0, connection
+                            attempts are unlimited in number
+        """
+        if ncon < 0:
+            return self.retry.copy(attempts=-1)
+        return self.retry.copy(attempts=ncon + 1)
+
+    def _connectHTTP(self, ncon=20):
+        """Connect to HTTP server, create a list of directories for all days
+
+           :param int ncon: maximum number of attempts to connect to the HTTP
+                            server before failing. If ncon < 0, connection
+                            attempts are unlimited in number
+        """
+        def connect():
+            """A single attempt to connect"""
+            self.nconnection += 1
+            url = urljoin(self.url, self.path)
+            self.dirData = self._getListingHTTP(url).get_dates()
+            self.dirData.reverse()
+
+        try:
+            self._connectPolicy(ncon).call(connect)
+        except Exception as e:
+            logging.error('Error in connection: {er}'.format(er=e))
+
+    def _connectFTP(self, ncon=20):
+        """Set connection to ftp server, move to path where data are stored,
+           and create a list of directories for all days
+
+           :param int ncon: maximum number of attempts to connect to the FTP
+                            server before failing.
+
+        """
+        def connect():
+            """A single attempt to connect"""
+            self.nconnection += 1
+            # connect to ftp server
+            self.ftp = FTP(self.url)
+            self.ftp.login(self.user, self.password)
+            # enter in directory
+            self.ftp.cwd(self.path)
+            # absolute path of the product, used by the pool of sessions
+            self.ftpBase = self.ftp.pwd()
+            self.dirData = []
+            # return data inside directory
+            self.ftp.dir(self.dirData.append)
+            # reverse order of data for have first the nearest to today
+            self.dirData.reverse()
+            # ensure dirData contains only directories, remove all references to files
+            self.dirData = [elem.split()[-1] for elem in self.dirData if elem.startswith("d")]
+            if self.debug:
+                logging.debug("Open connection {url}".format(url=self.url))
+
+        # the server refuses the login when it has too many connections
+        policy = self._connectPolicy(ncon)
+        policy = policy.copy(transient=policy.transient + (ftplib.error_perm,))
+        try:
+            policy.call(connect)
+        except Exception as e:
+            logging.error('Error in connection: {err}'.format(err=e))
+
+    def closeFTP(self):
+        """Close ftp connection and close the file list document"""
+        self.ftp.quit()
+        if self.ftpPool:
+            self.ftpPool.close()
+            self.ftpPool = None
+        self.closeFilelist()
+        if self.debug:
+            logging.debug("Close connection {url}".format(url=self.url))
+
+    def closeFilelist(self, publish=True):
+        """Function to close the file list of where the files are downloaded
+
+           :param bool publish: False to discard the file list of this run,
+                                for example after :meth:`plan`
+        """
+        self.metrics.stopDump()
+        if not self.filelist.closed:
+            self.filelist.close()
+            if publish:
+                self._publishFilelist()
+            else:
+                os.remove(self.filelistTemp)
+        if self.manifest:
+            self.manifest.close()
+            self.manifest = None
+
+    def _publishFilelist(self):
+        """Replace the file list with the one written by this run. If
+           another run using the same folder finished after this one started
+           the two lists are merged
+        """
+        with FileLock(self.filelistPath + '.lock'):
+            merged = []
+            if os.path.exists(self.filelistPath) and \
+               os.path.getmtime(self.filelistPath) >= self.runStart:
+                with open(self.filelistPath) as fil:
+                    merged = fil.read().splitlines()
+            if merged:
+                with open(self.filelistTemp) as fil:
+                    names = [name for name in fil.read().splitlines()
+                             if name not in merged]
+                with open(self.filelistTemp, 'w') as fil:
+                    for name in merged + names:
+                        fil.write("{name}\n".format(name=name))
+            getattr(os, 'replace', os.rename)(self.filelistTemp,
+                                              self.filelistPath)
+
+    def closeSession(self):
+        """Close the HTTP session and all its open connections"""
+        self.session.close()
+
+    def _fileStarted(self, filDown, day, filHdf=None):
+        """Register in the manifest that the download of a file started
+
+           :param str filDown: name of the file to download
+           :param str day: the day in format YYYY.MM.DD
+           :param str filHdf: name of the file to write to, the files
+                              downloaded in memory are not registered
+        """
+        if self.manifest and (filHdf is None or self._inFolder(filHdf)):
+            self.manifest.setStatus(filDown, DownloadManifest.IN_PROGRESS,
+                                    day)
+
+    def _fileFailed(self, filDown, day, filHdf=None):
+        """Register in the manifest that the download of a file failed
+
+           :param str filDown: name of the file to download
+           :param str day: the day in format YYYY.MM.DD
+           :param str filHdf: name of the file to write to, the files
+                              downloaded in memory are not registered
+        """
+        if self.manifest and (filHdf is None or self._inFolder(filHdf)):
+            self.manifest.setStatus(filDown, DownloadManifest.FAILED, day)
+
+    def _fileDownloaded(self, filDown, filHdf, result=(None, None, None),
+                        day=None):
+        """Register a downloaded file in the file list, in the index of the
+           local files and in the manifest. With the 'deep' validation the
+           HDF files without checksum are registered only after they are
+           checked in background
+
+           :param str filDown: name of the downloaded file
+           :param str filHdf: name of the written file
+           :param tuple result: the remote size, the local size and the
+                                checksum of the file
+           :param str day: the day in format YYYY.MM.DD
+        """
+        if self.validation == 'deep' and GDAL and result[2] is None and \
+           filDown.endswith('.hdf') and self._inFolder(filHdf):
+            with self.validationLock:
+                if not self.validationPool:
+                    self.validationPool = ThreadPool(self.validationWorkers)
+                self.validationJobs.append(self.validationPool.apply_async(
+                    self._validateFile, (filDown, filHdf, result, day)))
+            return
+        self._registerFile(filDown, filHdf, result)
+
+    def _registerFile(self, filDown, filHdf, result):
+        """Register a valid file in the granule cache, in the file list, in
+           the index of the local files and in the manifest. The files
+           downloaded in memory are not registered, they are not kept
+
+           :param str filDown: name of the downloaded file
+           :param str filHdf: name of the written file
+           :param tuple result: the remote size, the local size and the
+                                checksum of the file
+        """
+        if not self._inFolder(filHdf):
+            return
+        if self._useCache(filDown):
+            expected = None
+            if result[2] is not None:
+                expected = self._expectedChecksum(filDown, filHdf)
+            try:
+                self.granuleCache.store(filHdf, filDown, expected)
+            except (IOError, OSError) as e:
+                logging.warning("Cannot store {name} in the granule cache: "
+                                "{err}".format(name=filDown, err=e))
+        self.localIndex.add(os.path.basename(filHdf))
+        self.writeFilelist(filDown)
+        if self.manifest:
+            self.manifest.setStatus(filDown, DownloadManifest.VERIFIED,
+                                    remote_size=result[0],
+                                    local_size=result[1],
+                                    checksum=result[2])
+
+    def _inFolder(self, filHdf):
+        """Return True if a file is in the destination folder, False for
+           the files downloaded in memory
+
+           :param str filHdf: the path of the file
+        """
+        return os.path.dirname(os.path.abspath(filHdf)) == \
+            os.path.abspath(self.writeFilePath)
+
+    def _dayKey(self, day):
+        """Return the key of a day in the manifest, it contains the product,
+           the day, the tiles and if the jpeg files are downloaded
+
+           :param str day: the day in format YYYY.MM.DD
+        """
+        tiles = ','.join(sorted(self.tiles)) if self.tiles else '*'
+        return '|'.join((self.product, day, tiles, str(bool(self.jpeg))))
+
+    def _skipDay(self, day):
+        """Return True if the day was already downloaded completely and it
+           can not change anymore on the server
+
+           :param str day: the day in format YYYY.MM.DD
+        """
+        if not self.manifest:
+            return False
+        try:
+            old = str2date(day) < date.today() - timedelta(
+                days=self.cachewindow)
+        except (ValueError, IndexError, UnboundLocalError):
+            return False
+        return old and self.manifest.isDayComplete(self._dayKey(day))
+
+    def _dayDownloaded(self, day, listAllFiles, failed):
+        """Record in the manifest the day as complete if all its files were
+           downloaded
+
+           :param str day: the day in format YYYY.MM.DD
+           :param list listAllFiles: the files of the day on the server
+           :param int failed: the number of files not downloaded
+        """
+        if self.validationPool:
+            # the files are still checked in background
+            with self.validationLock:
+                self.pendingDays.append((day, listAllFiles, failed))
+            return
+        if self.manifest and listAllFiles and not failed:
+            self.manifest.setDayComplete(self._dayKey(day))
+
+    def _validateFile(self, filDown, filHdf, result, day):
+        """Check a downloaded file with GDAL, it is run in background by the
+           'deep' validation. A valid file is registered, an invalid one is
+           removed to be downloaded again
+
+           :param str filDown: name of the downloaded file
+           :param str filHdf: name of the written file
+           :param tuple result: the remote size, the local size and the
+                                checksum of the file
+           :param str day: the day in format YYYY.MM.DD
+
+           :return: 0 if file is correct, 1 for error
+        """
+        with self.metrics.timer('validation_seconds', tier='deep'):
+            invalid = self.checkFileDeep(filHdf)
+        if invalid:
+            os.remove(filHdf)
+            self._fileFailed(filDown, day)
+            with self.validationLock:
+                self.invalidFiles.append((filDown, day))
+            return 1
+        self._registerFile(filDown, filHdf, result)
+        return 0
+
+    def waitValidation(self):
+        """Wait the end of the background validation
+
+           :return: the list of (name, day) of the files not valid, they
+                    were removed
+        """
+        with self.validationLock:
+            pool = self.validationPool
+            jobs = self.validationJobs
+            self.validationPool = None
+            self.validationJobs = []
+        if pool:
+            for job in jobs:
+                job.wait()
+            pool.close()
+            pool.join()
+        with self.validationLock:
+            invalid = self.invalidFiles
+            self.invalidFiles = []
+        return invalid
+
+    def _validationDone(self, failedDays):
+        """Record the days waiting for the background validation
+
+           :param list failedDays: the days of the files still not valid
+        """
+        with self.validationLock:
+            pending = self.pendingDays
+            self.pendingDays = []
+        for day, listAllFiles, failed in pending:
+            self._dayDownloaded(day, listAllFiles,
+                                failed + failedDays.count(day))
+
+    def finishValidation(self):
+        """Wait the end of the background validation and download again
+           the files not valid, only once. It has to be called before
+           :meth:`closeFilelist` when the 'deep' validation is used
+
+           :return: the number of files not downloaded
+        """
+        failedDays = []
+        for name, day in self.waitValidation():
+            logging.warning("Download again {name}, it is not "
+                            "valid".format(name=name))
+            if self.urltype == 'ftp':
+                self.setDirectoryIn(day)
+            if self.downloadFile(name, os.path.join(self.writeFilePath,
+                                                    name), day):
+                failedDays.append(day)
+            if self.urltype == 'ftp':
+                self.setDirectoryOver()
+        # wait the validation of the files downloaded again
+        failedDays.extend(day for name, day in self.waitValidation())
+        self._validationDone(failedDays)
+        return len(failedDays)
+
+    def resumeManifest(self):
+        """Download the files left pending or in progress in the manifest by
+           a previous run that was interrupted
+
+           :return: the number of files not downloaded
+        """
+        if not self.manifest:
+            return 0
+        failed = 0
+        unfinished = self.manifest.select(self.product,
+                                          (DownloadManifest.PENDING,
+                                           DownloadManifest.IN_PROGRESS))
+        for name, day in unfinished:
+            filHdf = os.path.join(self.writeFilePath, name)
+            if name in self.localIndex:
+                self.manifest.setStatus(name, DownloadManifest.VERIFIED,
+                                        local_size=os.path.getsize(filHdf))
+                continue
+            if day is None:
+                continue
+            logging.info("Resume the download of {name}".format(name=name))
+            if self.urltype == 'ftp':
+                self.setDirectoryIn(day)
+            failed += self.downloadFile(name, filHdf, day)
+            if self.urltype == 'ftp':
+                self.setDirectoryOver()
+        return failed
+
+    def writeFilelist(self, name):
+        """Add a downloaded file to the file list, it is safe to call it
+           from several threads. The list is published in the folder by
+           :meth:`closeFilelist`
+
+           :param str name: name of the downloaded file
+        """
+        with self.filelistLock:
+            self.filelist.write("{name}\n".format(name=name))
+            self.filelistPending += 1
+            if self.filelistPending >= self.flushEvery:
+                self.filelist.flush()
+                self.filelistPending = 0
+
+    def setDirectoryIn(self, day):
+        """Enter into the file directory of a specified day
+
+           :param str day: a string representing a day in format YYYY.MM.DD
+        """
+        try:
+            self.retry.call(self.ftp.cwd, day)
+        except Exception as e:
+            logging.error("Error {err} entering in directory "
+                          "{name}".format(err=e, name=day))
+            raise
 
     def setDirectoryOver(self):
         """Move up within the file directory"""
         try:
-            self.ftp.cwd('..')
-        except (ftplib.error_reply, socket.error) as e:
+            self.retry.call(self.ftp.cwd, '..')
+        except Exception as e:
             logging.error("Error {err} when trying to come back".format(err=e))
-            self.setDirectoryOver()
+            raise
 
     def _getToday(self):
         """Set the dates for the start and end of downloading"""
@@ -528,303 +3410,862 @@ class downModis:
         """Return a list of all days"""
         return self.dirData
 
-    def getFilesList(self, day=None):
+    def getFilesList(self, day=None, tiles=None):
         """Returns a list of files to download. HDF and XML files are
            downloaded by default. JPG files will be downloaded if
            self.jpeg == True.
 
            :param str day: the date of data in format YYYY.MM.DD
+           :param list tiles: the tiles to select, None to use the tiles of
+                              the object
 
            :return: a list of files to download for the day
         """
         if self.urltype == 'http':
-            return self._getFilesListHTTP(day)
+            return self._getFilesListHTTP(day, tiles)
         elif self.urltype == 'ftp':
-            return self._getFilesListFTP()
+            return self._getFilesListFTP(tiles)
 
-    def _getFilesListHTTP(self, day):
+    def _getFilesListHTTP(self, day, tiles=None):
         """Returns a list of files to download from http server, which will
            be HDF and XML files, and optionally JPG files if specified by
            self.jpeg
 
            :param str day: the date of data in format YYYY.MM.DD
+           :param list tiles: the tiles to select, None to use the tiles of
+                              the object
         """
         # return the files list inside the directory of each day
+        url = urljoin(self.url, self.path, day)
+        if self.debug:
+            logging.debug("The url is: {url}".format(url=url))
         try:
-            url = urljoin(self.url, self.path, day)
-            if self.debug:
-                logging.debug("The url is: {url}".format(url=url))
+            http = self.retry.call(self._getListingHTTP, url, day, tiles)
+        except Exception as e:
+            logging.error("Error {err} when try to receive list of "
+                          "files".format(err=e))
+            return []
+        return self._selectFiles(http, tiles)
+
+    def _getListingHTTP(self, url, day=None, tiles=None):
+        """Return the parsed listing of a directory of the http server,
+           using the listing cache if it is enabled. The sizes and the
+           times of the files are added to 'remoteSizes' and 'remoteTimes'
+
+           :param str url: the url of the directory on the primary server,
+                           it is requested to the mirrors
+           :param str day: the date of the directory in format YYYY.MM.DD,
+                           None for the product directory
+           :param list tiles: the tiles to keep, None to use the tiles of
+                              the object
+
+           :return: a ModisListing object
+        """
+        if self.listingCache:
+            cached = self.listingCache.getCached(url, day)
+            if cached is not None:
+                if self.debug:
+                    logging.debug("Listing {url} read from "
+                                  "cache".format(url=url))
+                return self._listingInfo(ModisListing.fromCache(cached))
+        listing = self.mirrors.call(self._fetchListingHTTP, url, tiles)
+        if self.listingCache:
+            self.listingCache.set(url, listing.get_dates() +
+                                  listing.get_all(), day, listing.sizes,
+                                  listing.times)
+        return self._listingInfo(listing)
+
+    def _fetchListingHTTP(self, url, tiles=None):
+        """Download and parse the listing of a directory from a mirror
+
+           :param str url: the url of the directory on the mirror
+           :param list tiles: the tiles to keep, None to use the tiles of
+                              the object
+
+           :return: a ModisListing object
+        """
+        with self.metrics.timer('listing_seconds'):
+            resp = self.session.get(url, timeout=self.timeout, stream=True)
             try:
-                http = modisHtmlParser(requests.get(url,
-                                                    timeout=self.timeout).content)
-            except:
-                http = modisHtmlParser(urlopen(url,
-                                               timeout=self.timeout).read())
-            # download JPG files also
+                self.mirrors.measure(url, resp.elapsed.total_seconds())
+                resp.raise_for_status()
+                listing = self._newListing(tiles, resp.encoding)
+                for chunk in resp.iter_content(chunk_size=65536):
+                    listing.feed(chunk)
+                listing.close()
+            finally:
+                resp.close()
+        return listing
+
+    def _newListing(self, tiles=None, encoding=None):
+        """Return an empty ModisListing filtering the files of the product.
+           With the listing cache all the tiles and the jpeg files are kept,
+           because the cached listing can be used with other tiles
+
+           :param list tiles: the tiles to keep, None to use the tiles of
+                              the object
+           :param str encoding: the encoding of the listing
+        """
+        if self.listingCache:
+            return ModisListing(self.product_code, None, True, encoding)
+        if tiles is None:
+            tiles = self.tiles
+        return ModisListing(self.product_code, tiles, self.jpeg, encoding)
+
+    def _listingInfo(self, listing):
+        """Store the sizes and the times of the files of a listing
+
+           :param listing: a ModisListing object
+
+           :return: the listing
+        """
+        self.remoteSizes.update(listing.sizes)
+        self.remoteTimes.update(listing.times)
+        return listing
+
+    def _selectFiles(self, http, tiles=None):
+        """Return the files to download from a parsed HTML listing, which
+           will be HDF and XML files, and optionally JPG files if specified
+           by self.jpeg
+
+           :param http: a ModisListing or modisHtmlParser object
+           :param list tiles: the tiles to select, None to use the tiles of
+                              the object
+        """
+        if tiles is None:
+            tiles = self.tiles
+        # download JPG files also
+        if self.jpeg:
+            # if tiles not specified, download all files
+            if not tiles:
+                finalList = http.get_all()
+            # if tiles specified, download all files with jpegs
+            else:
+                finalList = http.get_tiles(self.product_code, tiles,
+                                           jpeg=True)
+        # if JPG files should not be downloaded, get only HDF and XML
+        else:
+            finalList = http.get_tiles(self.product_code, tiles)
+        if self.debug:
+            logging.debug("The number of file to download is: "
+                          "{num}".format(num=len(finalList)))
+        return finalList
+
+    def _getFilesListFTP(self, tiles=None):
+        """Create a list of files to download from FTP server, it is possible
+           choose to download also the JPG overview files or only the HDF files
+
+           :param list tiles: the tiles to select, None to use the tiles of
+                              the object
+        """
+        if tiles is None:
+            tiles = self.tiles
+
+        def cicle_file(jpeg=False):
+            """Check the type of file"""
+            finalList = []
+            for i in self.listfiles:
+                granule = parseGranule(i)
+                if granule is None:
+                    continue
+                isjpeg = granule.browse or granule.kind == 'jpg'
+                if not tiles and not isjpeg:
+                    finalList.append(i)
+                # the jpeg files only if requested
+                if tiles and tiles.count(granule.tile) == 1 and (jpeg or
+                                                                 not isjpeg):
+                    finalList.append(i)
+            return finalList
+
+        # return the file's list inside the directory of each day
+        try:
+            with self.metrics.timer('listing_seconds'):
+                self.listfiles = self.retry.call(self.ftp.nlst)
+            # download also jpeg
             if self.jpeg:
-                # if tiles not specified, download all files
-                if not self.tiles:
-                    finalList = http.get_all()
-                # if tiles specified, download all files with jpegs
+                # finallist is ugual to all file with jpeg file
+                if not tiles:
+                    finalList = self.listfiles
+                # finallist is ugual to tiles file with jpeg file
                 else:
-                    finalList = http.get_tiles(self.product_code,
-                                               self.tiles, jpeg=True)
-            # if JPG files should not be downloaded, get only HDF and XML
+                    finalList = cicle_file(jpeg=True)
+            # not download jpeg
             else:
-                finalList = http.get_tiles(self.product_code, self.tiles)
+                finalList = cicle_file()
             if self.debug:
                 logging.debug("The number of file to download is: "
                               "{num}".format(num=len(finalList)))
+            return finalList
+        except Exception as e:
+            logging.error("Error {err} when trying to receive list of "
+                          "files".format(err=e))
+            return []
+
+    def checkDataExist(self, listNewFile, move=False):
+        """Check if a file already exists in the local download directory
+
+           :param list listNewFile: list of all files, returned by getFilesList
+                                    function
+           :param bool move: it is useful to know if a function is called from
+                             download or move function
+           :return: list of files to download
+        """
+        # different return if this method is used from downloadsAllDay() or
+        # moveFile()
+        fileInPath = self.localIndex.names
+        if not listNewFile and not fileInPath:
+            logging.error("checkDataExist both lists are empty")
+        elif not listNewFile:
+            listNewFile = list()
+        if not move:
+            listOfDifferent = [name for name in set(listNewFile)
+                               if name not in self.localIndex]
+        elif move:
+            listOfDifferent = list(set(self.localIndex.list()) -
+                                   set(listNewFile))
+        return listOfDifferent
+
+    def checkFile(self, filHdf):
+        """Check by using GDAL to be sure that the download went ok
+
+           :param str filHdf: name of the HDF file to check
+
+           :return: 0 if file is correct, 1 for error
+        """
+        try:
+            gdal.Open(filHdf)
+            return 0
+        except (RuntimeError) as e:
+            logging.error(e)
+            return 1
+
+    def checkFileFast(self, filHdf):
+        """Check the structure of a HDF4 file, see :func:`checkHdf4`
+
+           :param str filHdf: name of the HDF file to check
+
+           :return: 0 if file is correct, 1 for error
+        """
+        try:
+            checkHdf4(filHdf)
+            return 0
+        except (ValueError, IOError, OSError, struct.error) as e:
+            logging.error(e)
+            return 1
+
+    def checkFileDeep(self, filHdf):
+        """Check by using GDAL that the HDF file and all its subdatasets
+           can be opened
+
+           :param str filHdf: name of the HDF file to check
+
+           :return: 0 if file is correct, 1 for error
+        """
+        try:
+            dataset = gdal.Open(filHdf)
+            for name, description in dataset.GetSubDatasets():
+                gdal.Open(name)
+            return 0
+        except (RuntimeError, AttributeError) as e:
+            logging.error("{name}: {err}".format(name=filHdf, err=e))
+            return 1
+
+    def _checkPart(self, filDown, filPart):
+        """Check a downloaded file before to rename it, according to the
+           validation mode; the 'deep' check with GDAL is done later
+
+           :param str filDown: name of the downloaded file
+           :param str filPart: name of the written '.part' file
+
+           :return: 0 if file is correct, 1 for error
+        """
+        if self.validation in ('fast', 'deep'):
+            if filDown.endswith('.hdf'):
+                with self.metrics.timer('validation_seconds', tier='fast'):
+                    return self.checkFileFast(filPart)
+            return 0
+        elif self.validation == 'gdal' and GDAL:
+            with self.metrics.timer('validation_seconds', tier='gdal'):
+                return self.checkFile(filPart)
+        return 0
+
+    def downloadFile(self, filDown, filHdf, day):
+        """Download a single file. The file is claimed with a lock file in
+           the destination folder, if another process downloaded it in the
+           meantime it is not downloaded again
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+           :param str day: the day in format YYYY.MM.DD
+
+           :return: 0 if the file is downloaded, 1 for error
+        """
+        start = time.time()
+        self.metrics.add('active_downloads', 1)
+        taken = []
+        failed = 1
+        try:
+            for n, lock in enumerate(self._fileLocks(filDown, filHdf)):
+                if self._acquireLock(lock, filDown, cache=n > 0):
+                    taken.append(lock)
+            if self._claimedDone(filDown, filHdf):
+                failed = 0
+            elif self._useCache(filDown) and self._fromCache(filDown, filHdf,
+                                                             day):
+                failed = 0
+            elif self.urltype == 'http':
+                failed = self._downloadFileHTTP(filDown, filHdf, day)
+            elif self.urltype == 'ftp':
+                failed = self._downloadFileFTP(filDown, filHdf, day)
+        except (IOError, OSError) as e:
+            logging.error("Cannot claim {name}, the error was "
+                          "'{err}'".format(name=filDown, err=e))
+        finally:
+            for lock in reversed(taken):
+                lock.release()
+            self.cacheSkipped.discard(filDown)
+            self.metrics.add('active_downloads', -1)
+        self._fileMetrics(start, failed)
+        return failed
+
+    def _acquireLock(self, lock, filDown, cache=False, blocking=True):
+        """Take one of the locks returned by :meth:`_fileLocks`. If the lock
+           of the granule cache can not be created, for example because of
+           the permissions of the cache, the file is downloaded without the
+           cache
+
+           :param lock: the FileLock object
+           :param str filDown: name of the file to download
+           :param bool cache: True for the lock of the granule cache
+           :param bool blocking: True to wait until the lock is free
+
+           :return: True if the lock was taken, False if it is not free and
+                    None if the cache is not used for the file
+        """
+        try:
+            return lock.acquire(blocking)
+        except (IOError, OSError) as e:
+            if not cache:
+                raise
+            logging.warning("Cannot lock {name} in the granule cache, it is "
+                            "downloaded without the cache: "
+                            "{err}".format(name=filDown, err=e))
+            self.cacheSkipped.add(filDown)
+            return None
+
+    def _useCache(self, filDown):
+        """Return True if the granule cache is used for a file
+
+           :param str filDown: name of the file to download
+        """
+        return bool(self.granuleCache) and filDown not in self.cacheSkipped
+
+    def _fileLocks(self, filDown, filHdf):
+        """Return the locks to take before downloading a file: the claim of
+           the file in the destination folder and, with the granule cache,
+           its lock in the cache. They let only one process at a time
+           download the file
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+        """
+        locks = [FileLock(filHdf + '.lock')]
+        if self.granuleCache:
+            locks.append(self.granuleCache.lock(filDown))
+        return locks
+
+    def _claimedDone(self, filDown, filHdf):
+        """Return True if the file was downloaded by another process using
+           the same folder while waiting for its claim. A file older than
+           this run or with a size different from the remote one is
+           downloaded again
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+        """
+        try:
+            stat = os.stat(filHdf)
+        except OSError:
+            return False
+        # the hard links keep the time of modification of the cache
+        if max(stat.st_mtime, stat.st_ctime) < self.runStart:
+            return False
+        size = self.remoteSizes.get(filDown)
+        if size is not None and stat.st_size != size:
+            return False
+        if self.debug:
+            logging.debug("File {name} downloaded by another "
+                          "process".format(name=filDown))
+        self.localIndex.add(os.path.basename(filHdf))
+        return True
+
+    def _fromCache(self, filDown, filHdf, day):
+        """Take a file from the granule cache and register it, the caller
+           holds the lock of the file
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+           :param str day: the day in format YYYY.MM.DD
+
+           :return: True if the file was in the cache
+        """
+        expected = self._expectedChecksum(filDown, filHdf)
+        try:
+            if not self.granuleCache.fetch(filDown, filHdf, expected):
+                return False
+        except (IOError, OSError) as e:
+            logging.warning("Cannot take {name} from the granule cache: "
+                            "{err}".format(name=filDown, err=e))
+            return False
+        if self.debug:
+            logging.debug("File {name} taken from the granule "
+                          "cache".format(name=filDown))
+        self.metrics.inc('cache_hits_total')
+        size = os.path.getsize(filHdf)
+        self._fileStarted(filDown, day, filHdf)
+        self._registerFile(filDown, filHdf, (size, size, expected[1]
+                                             if expected else None))
+        return True
+
+    def _fileMetrics(self, start, failed):
+        """Update the metrics after the download of a file
+
+           :param float start: the time when the download started
+           :param int failed: 0 if the file is downloaded, 1 for error
+        """
+        self.metrics.observe('file_seconds', time.time() - start)
+        self.metrics.inc('files_total', status='failed' if failed else 'ok')
+
+    def _downloadFileHTTP(self, filDown, filHdf, day):
+        """Download a single file from the http server, the failed attempts
+           are retried according to the retry policy
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+           :param str day: the day in format YYYY.MM.DD
+
+           :return: 0 if the file is downloaded, 1 for error
+        """
+        self._fileStarted(filDown, day, filHdf)
+        url = urljoin(self.url, self.path, day, filDown)
+        try:
+            result = self.retry.call(self.mirrors.call,
+                                     self._transferFileHTTP, url, filDown,
+                                     filHdf)
+        except Exception as e:
+            logging.error("Cannot download {name}, the error was "
+                          "'{err}'".format(name=filDown, err=e))
+            self._fileFailed(filDown, day, filHdf)
+            return 1
+        self._fileDownloaded(filDown, filHdf, result, day)
+        return 0
 
-            return finalList
-        except (socket.error) as e:
-            logging.error("Error {err} when try to receive list of "
-                          "files".format(err=e))
-            self._getFilesListHTTP(day)
+    def _limited(self, func, *args):
+        """Call a function holding a connection to the server, see
+           :data:`CONNECTIONS`
 
-    def _getFilesListFTP(self):
-        """Create a list of files to download from FTP server, it is possible
-           choose to download also the JPG overview files or only the HDF files
+           :param func: the function to call
+           :param args: the arguments of the function
         """
-        def cicle_file(jpeg=False):
-            """Check the type of file"""
-            finalList = []
-            for i in self.listfiles:
-                name = i.split('.')
-                # distinguish jpeg files from hdf files by the number of index
-                # where find the tile index
-                if not self.tiles and not (name.count('jpg') or
-                                           name.count('BROWSE')):
-                    finalList.append(i)
-                # is a jpeg of tiles number
-                if self.tiles:
-                    if self.tiles.count(name[3]) == 1 and jpeg:
-                        finalList.append(i)
-                # is a hdf of tiles number
-                    elif self.tiles.count(name[2]) == 1:
-                        finalList.append(i)
-            return finalList
+        with CONNECTIONS.slot(self.host):
+            return func(*args)
 
-        # return the file's list inside the directory of each day
+    def _transferFileHTTP(self, url, filDown, filHdf):
+        """Make a single attempt to download a file from the http server.
+           The data are written to a '.part' file, renamed to filHdf only
+           when the download is complete; if a '.part' file already exists
+           the download resumes from its size using a Range request
+
+           :param str url: the url of the file on the mirror
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+
+           :return: the remote size, None if unknown, the local size and
+                    the verified checksum, None if not available
+        """
+        filPart = filHdf + '.part'
+        # resume from the data downloaded by a previous attempt
+        offset = self._partOffset(filPart)
+        expected = self._expectedChecksum(filDown, filHdf)
+        checksum = None
+        orig_size = None
+        transf_size = offset
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes={st}-'.format(st=offset)
+        http = self.session.get(url, timeout=self.timeout, stream=True,
+                                headers=headers)
+        self.mirrors.measure(url, http.elapsed.total_seconds())
+        if offset and http.status_code == 416:
+            # the partial file is not valid for the remote file
+            http.close()
+            os.remove(filPart)
+            raise DownloadError("Not valid partial file for {name}, restart "
+                                "the download".format(name=filDown))
         try:
-            self.listfiles = self.ftp.nlst()
-            # download also jpeg
-            if self.jpeg:
-                # finallist is ugual to all file with jpeg file
-                if not self.tiles:
-                    finalList = self.listfiles
-                # finallist is ugual to tiles file with jpeg file
-                else:
-                    finalList = cicle_file(jpeg=True)
-            # not download jpeg
+            http.raise_for_status()
+            if offset and http.status_code == 206:
+                mode = "ab"
             else:
-                finalList = cicle_file()
-            if self.debug:
-                logging.debug("The number of file to download is: "
-                              "{num}".format(num=len(finalList)))
-            return finalList
-        except (ftplib.error_reply, socket.error) as e:
-            logging.error("Error {err} when trying to receive list of "
-                          "files".format(err=e))
-            self._getFilesListFTP()
+                # the server sends the whole file
+                mode = "wb"
+                transf_size = 0
+            length = http.headers.get('Content-Length')
+            if length is not None:
+                orig_size = transf_size + int(length)
+            if expected:
+                checksum = GranuleChecksum(expected[0])
+                # the data already downloaded are part of the checksum
+                if mode == "ab":
+                    checksum.updateFile(filPart)
+            # download and write the file chunk by chunk
+            filSave = self._openPart(filPart, transf_size, orig_size)
+            try:
+                for chunk in http.iter_content(chunk_size=self.buffersize):
+                    filSave.write(chunk)
+                    transf_size += len(chunk)
+                    if checksum:
+                        checksum.update(chunk)
+                    self.metrics.inc('bytes_total', len(chunk))
+                    BANDWIDTH.consume(len(chunk))
+            finally:
+                self._closePart(filSave)
+        finally:
+            http.close()
+        return self._finishTransfer(filDown, filHdf, orig_size, transf_size,
+                                    checksum, expected)
 
-    def checkDataExist(self, listNewFile, move=False):
-        """Check if a file already exists in the local download directory
+    def _openPart(self, filPart, offset=0, size=None):
+        """Open a '.part' file to write the downloaded data, with the write
+           buffer of the object and, if enabled, reserving its disk space
 
-           :param list listNewFile: list of all files, returned by getFilesList
-                                    function
-           :param bool move: it is useful to know if a function is called from
-                             download or move function
-           :return: list of files to download
-        """
-        # different return if this method is used from downloadsAllDay() or
-        # moveFile()
-        if not listNewFile and not self.fileInPath:
-            logging.error("checkDataExist both lists are empty")
-        elif not listNewFile:
-            listNewFile = list()
-        elif not self.fileInPath:
-            self.fileInPath = list()
-        if not move:
-            listOfDifferent = list(set(listNewFile) - set(self.fileInPath))
-        elif move:
-            listOfDifferent = list(set(self.fileInPath) - set(listNewFile))
-        return listOfDifferent
+           :param str filPart: name of the '.part' file
+           :param int offset: the size of the data already downloaded, the
+                              file is written from it
+           :param int size: the size of the complete file, None if unknown
 
-    def checkFile(self, filHdf):
-        """Check by using GDAL to be sure that the download went ok
+           :return: the open file object
+        """
+        if offset:
+            filSave = open(filPart, 'r+b', self.writebuffer)
+            filSave.seek(offset)
+        else:
+            filSave = open(filPart, 'wb', self.writebuffer)
+        if self.preallocate and size and size > offset:
+            # the marker tells that the file size is not the data written,
+            # if the process is killed before _closePart
+            open(filPart + '.alloc', 'wb').close()
+            preallocate(filSave, size)
+        return filSave
 
-           :param str filHdf: name of the HDF file to check
+    def _closePart(self, filSave):
+        """Close a '.part' file opened by :meth:`_openPart`. A preallocated
+           file is truncated to the data written, so that an interrupted
+           download can be resumed from its size
 
-           :return: 0 if file is correct, 1 for error
+           :param filSave: the open file object
         """
         try:
-            gdal.Open(filHdf)
+            if self.preallocate:
+                filSave.truncate(filSave.tell())
+        finally:
+            filSave.close()
+        try:
+            os.remove(filSave.name + '.alloc')
+        except OSError:
+            pass
+
+    def _partOffset(self, filPart, truncate=True):
+        """Return the size of the data already downloaded in a '.part'
+           file. A file preallocated by a process killed during the download
+           has the size of the complete file, the data end where its zero
+           bytes begin and the file is truncated there
+
+           :param str filPart: name of the '.part' file
+           :param bool truncate: False to not change the file
+
+           :return: the size in bytes, 0 if the file does not exist
+        """
+        if not os.path.exists(filPart):
             return 0
-        except (RuntimeError) as e:
-            logging.error(e)
-            return 1
+        if not os.path.exists(filPart + '.alloc'):
+            return os.path.getsize(filPart)
+        size = dataLength(filPart)
+        if truncate:
+            with open(filPart, 'r+b') as fil:
+                fil.truncate(size)
+            os.remove(filPart + '.alloc')
+        return size
 
-    def downloadFile(self, filDown, filHdf, day):
-        """Download a single file
+    def _expectedChecksum(self, filDown, filHdf):
+        """Return the checksum of a file read from its XML metadata file, if
+           it was already downloaded
 
            :param str filDown: name of the file to download
            :param str filHdf: name of the file to write to
-           :param str day: the day in format YYYY.MM.DD
+
+           :return: a tuple with the checksum type and value, None if it is
+                    not available
         """
-        if self.urltype == 'http':
-            self._downloadFileHTTP(filDown, filHdf, day)
-        elif self.urltype == 'ftp':
-            self._downloadFileFTP(filDown, filHdf)
+        xmlfile = filHdf + '.xml'
+        if not self.checksum or not os.path.exists(xmlfile):
+            return None
+        try:
+            expected = getChecksums(xmlfile).get(os.path.basename(filDown))
+        except (ElementTree.ParseError, IOError, OSError) as e:
+            logging.warning("Cannot read the checksum from {name}: "
+                            "{err}".format(name=xmlfile, err=e))
+            return None
+        if expected and GranuleChecksum.supported(expected[0]):
+            return expected
+        return None
 
-    def _downloadFileHTTP(self, filDown, filHdf, day):
-        """Download a single file from the http server
+    def _finishTransfer(self, filDown, filHdf, orig_size, transf_size,
+                        checksum=None, expected=None):
+        """Check a downloaded '.part' file and rename it to filHdf, raise
+           DownloadError if it is not complete or corrupted. The checksum is
+           verified if available, otherwise the file is checked according to
+           the validation mode
 
-           :param str filDown: name of the file to download
+           :param str filDown: name of the downloaded file
            :param str filHdf: name of the file to write to
-           :param str day: the day in format YYYY.MM.DD
+           :param int orig_size: the size of the remote file, None if unknown
+           :param int transf_size: the size of the downloaded file
+           :param checksum: the GranuleChecksum of the downloaded data
+           :param tuple expected: the expected checksum type and value
+
+           :return: the remote size, the local size and the verified
+                    checksum
         """
-        filSave = open(filHdf, "wb")
-        url = urljoin(self.url, self.path, day, filDown)
-        orig_size = None
-        try:  # download and write the file
-            req = urllib.request.Request(url, headers=self.http_header)
-            http = urllib.request.urlopen(req)
-            orig_size = http.headers['Content-Length']
-            filSave.write(http.read())
-        # if local file has an error, try to download the file again
-        except Exception as e:
-            logging.warning("Tried to downlaod with urllib but got this "
-                            "error {co}, reason {re}".format(co=e.code,
-                                                             re=e.reason))
-            try:
-                http = requests.get(url, timeout=self.timeout)
-                orig_size = http.headers['Content-Length']
-                filSave.write(http.content)
-            except Exception as e:
-                logging.warning("Tried to downlaod with requests but got this "
-                                "error {co}, reason {re}".format(co=e.code,
-                                                                 re=e.reason))
-                logging.error("Cannot download {name}. "
-                              "Retrying...".format(name=filDown))
-                filSave.close()
-                os.remove(filSave.name)
-                import time
-                time.sleep(5)
-                self._downloadFileHTTP(filDown, filHdf, day)
-        filSave.close()
-        transf_size = os.path.getsize(filSave.name)
-        if not orig_size:
-            self.filelist.write("{name}\n".format(name=filDown))
-            self.filelist.flush()
-            if self.debug:
+        filPart = filHdf + '.part'
+        # if filesizes are different, try again
+        if orig_size is not None and int(orig_size) != int(transf_size):
+            # a bigger file can not be resumed
+            if int(transf_size) > int(orig_size):
+                os.remove(filPart)
+            raise DownloadError("Different size for file {name} - original "
+                                "data: {orig}, downloaded: "
+                                "{down}".format(name=filDown, orig=orig_size,
+                                                down=transf_size))
+        value = None
+        if checksum:
+            if not checksum.matches(expected[1]):
+                os.remove(filPart)
+                raise DownloadError("Wrong checksum for file {name} - "
+                                    "expected: {exp}, downloaded: "
+                                    "{down}".format(name=filDown,
+                                                    exp=expected[1],
+                                                    down=checksum.value()))
+            value = checksum.value()
+        # if no xml file, delete the HDF and redownload
+        elif filDown.find('.xml') == -1 and self._checkPart(filDown, filPart):
+            os.remove(filPart)
+            raise DownloadError("File {name} is corrupted".format(name=filDown))
+        getattr(os, 'replace', os.rename)(filPart, filHdf)
+        if self.debug:
+            if orig_size is None:
                 logging.debug("File {name} downloaded but not "
                               "check the size".format(name=filDown))
-            return 0
-        if int(orig_size) == int(transf_size):
-            # if no xml file, delete the HDF and redownload
-            if filHdf.find('.xml') == -1:
-                test = False
-                if GDAL:
-                    test = self.checkFile(filHdf)
-                if test:
-                    os.remove(filSave.name)
-                    self._downloadFileHTTP(filDown, filHdf, day)
-                else:
-                    self.filelist.write("{name}\n".format(name=filDown))
-                    self.filelist.flush()
-                    if self.debug:
-                        logging.debug("File {name} downloaded "
-                                      "correctly".format(name=filDown))
-                    return 0
-            else:  # xml exists
-                self.filelist.write("{name}\n".format(name=filDown))
-                self.filelist.flush()
-                if self.debug:
-                    logging.debug("File {name} downloaded "
-                                  "correctly".format(name=filDown))
-                return 0
-        # if filesizes are different, delete and try again
-        else:
-            logging.warning("Different size for file {name} - original data: "
-                            "{orig}, downloaded: {down}".format(name=filDown,
-                                                                orig=orig_size,
-                                                                down=transf_size))
-            os.remove(filSave.name)
-            self._downloadFileHTTP(filDown, filHdf, day)
+            else:
+                logging.debug("File {name} downloaded "
+                              "correctly".format(name=filDown))
+        return orig_size, transf_size, value
 
-    def _downloadFileFTP(self, filDown, filHdf):
-        """Download a single file from ftp server
+    def _downloadFileFTP(self, filDown, filHdf, day=None):
+        """Download a single file from ftp server, the failed attempts are
+           retried according to the retry policy
 
            :param str filDown: name of the file to download
            :param str filHdf: name of the file to write to
+           :param str day: the day in format YYYY.MM.DD, used to come back
+                           in the directory of the day after a reconnection
+
+           :return: 0 if the file is downloaded, 1 for error
         """
-        filSave = open(filHdf, "wb")
-        try:  # transfer file from ftp
-            self.ftp.retrbinary("RETR " + filDown, filSave.write)
-            self.filelist.write("{name}\n".format(name=filDown))
-            self.filelist.flush()
-            if self.debug:
-                logging.debug("File {name} downloaded".format(name=filDown))
-        # if error during download process, try to redownload the file
-        except (ftplib.error_reply, socket.error, ftplib.error_temp,
-                EOFError) as e:
-            logging.error("Cannot download {name}, the error was '{err}'. "
-                          "Retrying...".format(name=filDown, err=e))
-            filSave.close()
-            os.remove(filSave.name)
+        def transfer():
+            """A single attempt, the connection is checked after errors"""
             try:
-                self.ftp.pwd()
-            except (ftplib.error_temp, EOFError) as e:
-                self._connectFTP()
-            self._downloadFileFTP(filDown, filHdf)
-        filSave.close()
-        orig_size = self.ftp.size(filDown)
-        transf_size = os.path.getsize(filSave.name)
-        if orig_size == transf_size:
-            return 0
-        else:
-            logging.warning("Different size for file {name} - original data: "
-                            "{orig}, downloaded: {down}".format(name=filDown,
-                                                                orig=orig_size,
-                                                                down=transf_size))
-            os.remove(filSave.name)
-            self._downloadFileFTP(filDown, filHdf)
-
-    def dayDownload(self, day, listFilesDown):
-        """Downloads tiles for the selected day
+                return self._limited(self._transferFileFTP, filDown, filHdf)
+            except FTPPool.BROKEN:
+                self._checkFTP(day)
+                raise
+
+        def transferPool():
+            """A single attempt using a session of the pool"""
+            remote = posixpath.join(self.ftpBase, day, filDown)
+            with self.ftpPool.session() as ftp:
+                return self._limited(self._transferFileFTP, remote, filHdf,
+                                     ftp)
+
+        if self.ftpPool and day:
+            transfer = transferPool
+
+        self._fileStarted(filDown, day, filHdf)
+        try:
+            result = self.retry.call(transfer)
+        except Exception as e:
+            logging.error("Cannot download {name}, the error was "
+                          "'{err}'".format(name=filDown, err=e))
+            self._fileFailed(filDown, day, filHdf)
+            return 1
+        self._fileDownloaded(filDown, filHdf, result, day)
+        return 0
+
+    def _checkFTP(self, day=None):
+        """Check if the ftp connection is still alive, otherwise open a new
+           connection and enter in the directory of the day
 
            :param str day: the day in format YYYY.MM.DD
+        """
+        try:
+            self.ftp.pwd()
+        except (socket.error, ftplib.error_temp, ftplib.error_reply,
+                EOFError):
+            self._connectFTP()
+            if day:
+                self.ftp.cwd(day)
+
+    def _transferFileFTP(self, filDown, filHdf, ftp=None):
+        """Make a single attempt to download a file from ftp server. The
+           data are written to a '.part' file, renamed to filHdf only when
+           the download is complete; if a '.part' file already exists the
+           download resumes from its size using the REST command
+
+           :param str filDown: name or path of the file to download
+           :param str filHdf: name of the file to write to
+           :param ftp: the FTP session to use, by default the main one
+
+           :return: the remote size, the local size and the verified
+                    checksum, None if not available
+        """
+        if ftp is None:
+            ftp = self.ftp
+        filPart = filHdf + '.part'
+        # resume from the data downloaded by a previous attempt
+        offset = self._partOffset(filPart)
+        expected = self._expectedChecksum(filDown, filHdf)
+        checksum = None
+        if expected:
+            checksum = GranuleChecksum(expected[0])
+            # the data already downloaded are part of the checksum
+            if offset:
+                checksum.updateFile(filPart)
+        size = None
+        if self.preallocate:
+            # the servers send the size only in binary mode
+            ftp.voidcmd('TYPE I')
+            size = ftp.size(filDown)
+        filSave = self._openPart(filPart, offset, size)
+
+        def write(data):
+            """Write a block of data and add it to the checksum"""
+            filSave.write(data)
+            if checksum:
+                checksum.update(data)
+            self.metrics.inc('bytes_total', len(data))
+            BANDWIDTH.consume(len(data))
+
+        try:  # transfer file from ftp
+            if offset:
+                ftp.retrbinary("RETR " + filDown, write, rest=offset)
+            else:
+                ftp.retrbinary("RETR " + filDown, write)
+        finally:
+            self._closePart(filSave)
+        orig_size = ftp.size(filDown)
+        transf_size = os.path.getsize(filPart)
+        return self._finishTransfer(filDown, filHdf, orig_size, transf_size,
+                                    checksum, expected)
+
+    def _planDayFiles(self, listFilesDown, remove=True):
+        """Select the files to download comparing them with the local files,
+           only the newer version of each file is kept and the older local
+           files are removed
+
            :param list listFilesDown: list of the files to download, returned
                                       by checkDataExist function
+           :param bool remove: False to keep the older local files
+
+           :return: the sorted list of files to download
         """
+        # the files selected for download, the key is the prefix of the file
+        # plus the extension, to keep only the newer version of each file
+        planned = {}
         # for each file in files' list
         for i in listFilesDown:
-            fileSplit = i.split('.')
-            filePrefix = "{a}.{b}.{c}.{d}".format(a=fileSplit[0],
-                                                  b=fileSplit[1],
-                                                  c=fileSplit[2],
-                                                  d=fileSplit[3])
-
+            granule = parseGranule(i)
+            if granule is None:
+                continue
+            key = (granule.prefix, granule.kind)
+            # the server could contain more versions of the same file
+            if key in planned:
+                planned[key] = getNewerVersion(planned[key], i)
+                continue
             # check if this file already exists in the save directory
-            oldFile = glob.glob1(self.writeFilePath, filePrefix + "*"
-                                 + fileSplit[-1])
+            oldFile = self.localIndex.find(i)
             numFiles = len(oldFile)
             # if it doesn't exist
             if numFiles == 0:
-                file_hdf = os.path.join(self.writeFilePath, i)
+                planned[key] = i
             # if one does exist
             elif numFiles == 1:
                 # check the version of file, delete local file if it is older
                 fileDown = getNewerVersion(oldFile[0], i)
                 if fileDown != oldFile[0]:
-                    os.remove(os.path.join(self.writeFilePath, oldFile[0]))
-                    file_hdf = os.path.join(self.writeFilePath, fileDown)
+                    if remove:
+                        os.remove(os.path.join(self.writeFilePath,
+                                               oldFile[0]))
+                        self.localIndex.remove(oldFile[0])
+                    planned[key] = fileDown
             elif numFiles > 1:
                 logging.error("There are to many files for "
                               "{name}".format(name=i))
-            if numFiles == 0 or (numFiles == 1 and fileDown != oldFile[0]):
-                self.downloadFile(i, file_hdf, day)
+        return [planned[key] for key in sorted(planned.keys())]
+
+    def dayDownload(self, day, listFilesDown, workers=None):
+        """Downloads tiles for the selected day
+
+           :param str day: the day in format YYYY.MM.DD
+           :param list listFilesDown: list of the files to download, returned
+                                      by checkDataExist function
+           :param int workers: the number of parallel downloads, None to use
+                               the workers of the object
+
+           :return: the number of files not downloaded
+        """
+        def download(fileDown):
+            """Download one of the selected files"""
+            return self.downloadFile(fileDown,
+                                     os.path.join(self.writeFilePath,
+                                                  fileDown), day)
+
+        filesDown = self._planDayFiles(listFilesDown)
+        if self.manifest and filesDown:
+            self.manifest.setStatus(filesDown, DownloadManifest.PENDING, day)
+        # the XML files are downloaded first, they contain the checksums
+        # of the other files
+        xmlDown = [fil for fil in filesDown if fil.endswith('.xml')]
+        dataDown = [fil for fil in filesDown if not fil.endswith('.xml')]
+        if workers is None:
+            workers = self.workers
+        if workers > 1 and len(filesDown) > 1:
+            # FTP needs a session for each parallel download
+            if self.urltype == 'ftp' and not self.ftpPool:
+                self.ftpPool = FTPPool(self.url, self.user, self.password,
+                                       workers, self.timeout)
+            elif self.urltype == 'ftp' and self.ftpPool.size < workers:
+                with self.ftpPool.lock:
+                    self.ftpPool.size = workers
+            pool = ThreadPool(min(workers, len(filesDown)))
+            try:
+                results = pool.map(download, xmlDown)
+                results += pool.map(download, dataDown)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [download(fileDown) for fileDown in xmlDown + dataDown]
+        return sum(results)
 
     def downloadsAllDay(self, clean=False, allDays=False):
         """Download all requested days
@@ -840,30 +4281,540 @@ class downModis:
             days = self.getAllDays()
         else:
             days = self.getListDays()
+        # complete the downloads interrupted in a previous run and skip
+        # the days already downloaded
+        if self.manifest:
+            self.resumeManifest()
+            days = [day for day in days if not self._skipDay(day)]
         # log the days to download
         if self.debug:
             logging.debug("The number of days to download is: "
                           "{num}".format(num=len(days)))
         # download the data
-        if self.urltype == 'http':
+        if self.scheduler is not None:
+            self._downloadAllDaysScheduled(days)
+        elif self.urltype == 'http':
             self._downloadAllDaysHTTP(days)
         elif self.urltype == 'ftp':
             self._downloadAllDaysFTP(days)
 
-    def _downloadAllDaysHTTP(self, days):
-        """Downloads all the tiles considered from HTTP server
+    def plan(self, allDays=False, rate=None, workers=None):
+        """Return the files that :meth:`downloadsAllDay` would download,
+           without downloading them and without changing the local files.
+           The listings of the days are downloaded in parallel; the sizes
+           of the files are read from the listings or, when they are not
+           available, requested in parallel with HEAD requests or with the
+           FTP SIZE command. It has to be called after :meth:`connect`
+
+           :param bool allDays: plan all the days available on the server
+           :param float rate: the expected download rate in bytes per
+                              second to estimate the time, None to use the
+                              bandwidth limit
+           :param int workers: the number of parallel requests, None to use
+                               the workers of the object, at least 4
+
+           :return: a DownloadPlan object
+        """
+        workers = workers or max(4, self.workers)
+        files = self._planFiles(allDays, workers)
+        sizes = self._planSizes(files, workers)
+        planned = [PlannedFile(day, name, size, self._toTransfer(name, size))
+                   for (day, name), size in zip(files, sizes)]
+        return DownloadPlan(planned, rate or BANDWIDTH.rate)
+
+    def _planFiles(self, allDays, workers):
+        """Return the (day, name) pairs of the files that
+           :meth:`downloadsAllDay` would download, without changing the
+           local files
+
+           :param bool allDays: plan all the days available on the server
+           :param int workers: the number of parallel requests
+        """
+        if allDays:
+            days = self.getAllDays()
+        else:
+            days = self.getListDays()
+        if self.manifest:
+            days = [day for day in days if not self._skipDay(day)]
+        files = []
+        # the downloads left unfinished by a previous run
+        if self.manifest:
+            unfinished = self.manifest.select(self.product,
+                                              (DownloadManifest.PENDING,
+                                               DownloadManifest.IN_PROGRESS))
+            files.extend((day, name) for name, day in unfinished
+                         if name not in self.localIndex and day is not None)
+        seen = set(name for day, name in files)
+        for day, listAllFiles in zip(days, self._planListings(days,
+                                                               workers)):
+            listFilesDown = self.checkDataExist(listAllFiles)
+            for name in self._planDayFiles(listFilesDown, remove=False):
+                if name not in seen:
+                    files.append((day, name))
+                    seen.add(name)
+        return files
+
+    def _planListings(self, days, workers):
+        """Return the files of the days on the server, the listings of the
+           HTTP server are downloaded in parallel
+
+           :param list days: the days in format YYYY.MM.DD
+           :param int workers: the number of parallel requests
+        """
+        if self.urltype != 'http' or workers < 2 or len(days) < 2:
+            return [self._listDay(day) for day in days]
+        pool = ThreadPool(min(workers, len(days)))
+        try:
+            return pool.map(self._listDay, days)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _planSizes(self, files, workers):
+        """Return the sizes of the remote files, from the listings or
+           requested in parallel to the server
+
+           :param list files: the (day, name) pairs of the files
+           :param int workers: the number of parallel requests
+        """
+        def size(item):
+            """Return the size of one file, None if not known"""
+            day, name = item
+            if name in self.remoteSizes:
+                return self.remoteSizes[name]
+            try:
+                value = self.retry.call(self._remoteSize, day, name)
+            except Exception as e:
+                logging.warning("Cannot get the size of {name}: "
+                                "{err}".format(name=name, err=e))
+                return None
+            if value is not None:
+                self.remoteSizes[name] = value
+            return value
+
+        missing = [item for item in files if item[1] not in self.remoteSizes]
+        if not missing or workers < 2:
+            return [size(item) for item in files]
+        # FTP needs a session for each parallel request
+        if self.urltype == 'ftp' and not self.ftpPool:
+            self.ftpPool = FTPPool(self.url, self.user, self.password,
+                                   workers, self.timeout)
+        pool = ThreadPool(min(workers, len(missing)))
+        try:
+            return pool.map(size, files)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _remoteSize(self, day, name):
+        """Make a single request of the size of a remote file
+
+           :param str day: the day in format YYYY.MM.DD
+           :param str name: the name of the file
+
+           :return: the size in bytes, None if the server does not send it
+        """
+        if self.urltype == 'ftp':
+            remote = posixpath.join(self.ftpBase, day, name)
+            with self.ftpPool.session() as ftp:
+                ftp.voidcmd('TYPE I')
+                return ftp.size(remote)
+        url = urljoin(self.url, self.path, day, name)
+        return self.mirrors.call(self._headSizeHTTP, url)
+
+    def _headSizeHTTP(self, url):
+        """Request the size of a file with a HEAD request to a mirror
+
+           :param str url: the url of the file on the mirror
+        """
+        resp = self.session.head(url, timeout=self.timeout,
+                                 allow_redirects=True)
+        try:
+            self.mirrors.measure(url, resp.elapsed.total_seconds())
+            resp.raise_for_status()
+            length = resp.headers.get('Content-Length')
+            return int(length) if length is not None else None
+        finally:
+            resp.close()
+
+    def _toTransfer(self, name, size):
+        """Return the bytes to transfer to download a file, considering
+           the partial download and the granule cache
+
+           :param str name: the name of the file
+           :param int size: the size of the remote file, None if unknown
+        """
+        if size is None:
+            return None
+        if self.granuleCache and os.path.isfile(self.granuleCache.path(name)):
+            return 0
+        filPart = os.path.join(self.writeFilePath, name) + '.part'
+        return max(0, size - self._partOffset(filPart, truncate=False))
+
+    def iterGranules(self, allDays=False, keepraw=False, workers=None):
+        """Download in memory the files that :meth:`downloadsAllDay` would
+           download and return them one at a time, each HDF file with its
+           XML metadata file, to process them without writing them in the
+           destination folder. The files are downloaded in the directory
+           'memoryFolder' while the previous ones are processed, the caller
+           has to close each :class:`MemoryGranule` to release its memory.
+           The files only in memory are not registered in the manifest, in
+           the granule cache or in the file list. The XML files of HDF
+           files already downloaded are saved in the destination folder. With the 'deep' validation only the
+           structure of the files is checked, GDAL opens them when they
+           are processed. It has to be called after :meth:`connect`, the
+           connections are closed at the end of the iteration
+
+           :param bool allDays: download all the days available on the
+                                server
+           :param bool keepraw: True to download the files also in the
+                                destination folder and register them, as
+                                :meth:`downloadsAllDay` does
+           :param int workers: the number of files downloaded in advance,
+                               None to use the workers of the object
+
+           :return: a generator of MemoryGranule objects
+        """
+        workers = workers or self.workers
+        files = self._planFiles(allDays, max(4, workers))
+        names = set(name for day, name in files)
+        folder = tempfile.mkdtemp(prefix='pymodis', dir=self.memoryFolder)
+        # FTP needs a session for each file downloaded in advance
+        if self.urltype == 'ftp' and not self.ftpPool:
+            self.ftpPool = FTPPool(self.url, self.user, self.password,
+                                   workers, self.timeout)
+        pool = None
+        if workers > 1:
+            pool = ThreadPool(workers)
+        pending = []
+        try:
+            for day, name in files:
+                if name.endswith('.xml') and name[:-4] in names:
+                    # downloaded with its data file
+                    continue
+                if name.endswith('.xml'):
+                    self.downloadFile(name, os.path.join(self.writeFilePath,
+                                                         name), day)
+                    continue
+                args = (day, name, folder, keepraw, name + '.xml' in names)
+                if pool:
+                    pending.append(pool.apply_async(self._memoryGranule,
+                                                    args))
+                else:
+                    pending.append(self._memoryGranule(*args))
+                # keep at most 'workers' files in memory in advance
+                while pending and (not pool or len(pending) >= workers):
+                    granule = pending.pop(0)
+                    if pool:
+                        granule = granule.get()
+                    if granule:
+                        yield granule
+            while pending:
+                granule = pending.pop(0)
+                if pool:
+                    granule = granule.get()
+                if granule:
+                    yield granule
+        finally:
+            # the files downloaded in advance and not returned
+            for granule in pending:
+                if pool:
+                    granule = granule.get()
+                if granule:
+                    granule.close()
+            if pool:
+                pool.close()
+                pool.join()
+            try:
+                os.rmdir(folder)
+            except OSError:
+                # some granules are still open
+                pass
+            # without files kept on disk the previous list is left
+            self.closeFilelist(publish=keepraw or self.filelist.tell() > 0)
+            if self.urltype == 'http':
+                self.closeSession()
+            elif self.urltype == 'ftp':
+                self.closeFTP()
+
+    def _memoryGranule(self, day, name, folder, keepraw=False, xml=True):
+        """Download a file and its XML metadata file in memory
+
+           :param str day: the day in format YYYY.MM.DD
+           :param str name: the name of the file
+           :param str folder: the directory in memory
+           :param bool keepraw: True to download the file in the destination
+                                folder and copy it in memory
+           :param bool xml: True to download also the XML metadata file
+
+           :return: a MemoryGranule object, None if the download failed
+        """
+        granule = MemoryGranule(name, day, os.path.join(folder, name))
+        names = [name + '.xml', name] if xml else [name]
+        for filDown in names:
+            path = os.path.join(folder, filDown)
+            if keepraw:
+                # downloaded and registered as by downloadsAllDay
+                dest = os.path.join(self.writeFilePath, filDown)
+                failed = self.downloadFile(filDown, dest, day)
+                if not failed:
+                    self._memoryCopy(dest, path)
+            else:
+                failed = self.downloadFile(filDown, path, day)
+            if filDown == name and (failed or not os.path.isfile(path)):
+                granule.close()
+                return None
+        if keepraw:
+            granule.rawpath = os.path.join(self.writeFilePath, name)
+        return granule
+
+    def _memoryCopy(self, path, dest):
+        """Copy a file downloaded in the destination folder to memory
+
+           :param str path: the path of the file in the destination folder
+           :param str dest: the path of the file in memory
+        """
+        tmp = '{pa}.{pid}.tmp'.format(pa=dest, pid=os.getpid())
+        shutil.copyfile(path, tmp)
+        getattr(os, 'replace', os.rename)(tmp, dest)
+
+    def scheduleDays(self, scheduler, days):
+        """Add the files to download of some days to a scheduler, they are
+           downloaded by :meth:`DownloadScheduler.run` and then
+           :meth:`scheduledDone` has to be called
+
+           :param scheduler: a DownloadScheduler object
+           :param list days: the days in format YYYY.MM.DD
+
+           :return: the number of files added
+        """
+        # the files are downloaded in any order, FTP uses the absolute paths
+        # of the sessions of the pool
+        if self.urltype == 'ftp' and not self.ftpPool:
+            self.ftpPool = FTPPool(self.url, self.user, self.password,
+                                   self.workers, self.timeout)
+        if self.urltype == 'http' and self.prefetch and len(days) > 1:
+            listings = self._prefetchListings(days)
+        else:
+            listings = (self._listDay(day) for day in days)
+        nfiles = 0
+        try:
+            for day in days:
+                listAllFiles = next(listings)
+                listFilesDown = self.checkDataExist(listAllFiles)
+                filesDown = self._planDayFiles(listFilesDown)
+                if self.manifest and filesDown:
+                    self.manifest.setStatus(filesDown,
+                                            DownloadManifest.PENDING, day)
+                # the XML files first, they contain the checksums
+                filesDown.sort(key=lambda name: not name.endswith('.xml'))
+                for name in filesDown:
+                    scheduler.push(day, name, self.remoteSizes.get(name),
+                                   owner=self)
+                nfiles += len(filesDown)
+                self.scheduledDays.append((day, listAllFiles))
+        finally:
+            listings.close()
+        return nfiles
+
+    def _prefetchListings(self, days):
+        """Return the listings of the days in order; while a day is
+           processed the listings of the following 'prefetch' days are
+           downloaded in background, the other days are requested only
+           when the window moves forward
+
+           :param list days: the days in format YYYY.MM.DD
+
+           :return: a generator of the lists of files
+        """
+        pool = ThreadPool(min(self.prefetch, len(days)))
+        pending = []
+        try:
+            for day in days:
+                pending.append(pool.apply_async(self.getFilesList, (day, )))
+                if len(pending) > self.prefetch:
+                    yield pending.pop(0).get()
+            while pending:
+                yield pending.pop(0).get()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _listDay(self, day):
+        """Return the files of a day, for FTP entering its directory
+
+           :param str day: the day in format YYYY.MM.DD
+        """
+        if self.urltype == 'http':
+            return self.getFilesList(day)
+        try:
+            self.setDirectoryIn(day)
+        except Exception:
+            return []
+        try:
+            return self.getFilesList()
+        finally:
+            self.setDirectoryOver()
+
+    def scheduledDone(self, failed):
+        """Record the days added to a scheduler after its download
+
+           :param dict failed: the value returned by
+                               :meth:`DownloadScheduler.run`
+        """
+        for day, listAllFiles in self.scheduledDays:
+            self._dayDownloaded(day, listAllFiles,
+                                failed.get((self, day), 0))
+        self.scheduledDays = []
+
+    def _downloadAllDaysScheduled(self, days):
+        """Downloads all the tiles considered in the order of the scheduler
 
            :param list days: the list of days to download
         """
-        # for each day
-        for day in days:
-            # obtain list of all files
-            listAllFiles = self.getFilesList(day)
+        self.scheduleDays(self.scheduler, days)
+        self.scheduledDone(self.scheduler.run(self.workers))
+        self.finishValidation()
+        if self.urltype == 'http':
+            self.closeFilelist()
+            self.closeSession()
+        elif self.urltype == 'ftp':
+            self.closeFTP()
+        if self.debug:
+            logging.debug("Download terminated")
+        return 0
+
+    def _granulesDays(self, granules):
+        """Return the days requested to :meth:`downloadGranules`
+
+           :param granules: a dictionary or a list of (day, tiles) pairs
+
+           :return: a list of (key, day, tiles) with the day in format
+                    YYYY.MM.DD, None if it is not available on the server
+        """
+        if isinstance(granules, dict):
+            granules = granules.items()
+        available = set(self.dirData)
+        days = []
+        for key, tiles in granules:
+            if isinstance(key, date):
+                day = key.strftime("%Y.%m.%d")
+            else:
+                day = str(key).replace('-', '.')
+            if isinstance(tiles, str):
+                tiles = tiles.split(',')
+            if day not in available:
+                logging.warning("The day {day} is not available on the "
+                                "server".format(day=day))
+                day = None
+            days.append((key, day, tiles))
+        # the most recent days first, as downloadsAllDay
+        days.sort(key=lambda item: item[1] or '', reverse=True)
+        return days
+
+    def _missingTiles(self, tiles, listAllFiles):
+        """Return the requested tiles not found in a listing of the server
+           or whose HDF file is not in the destination folder, because its
+           download failed
+
+           :param list tiles: the requested tiles, None for all tiles
+           :param list listAllFiles: the files of the day on the server
+        """
+        if not tiles:
+            return [] if listAllFiles else None
+        found = set(granule.tile for granule in map(parseGranule,
+                                                    listAllFiles or [])
+                    if granule is not None and
+                    granule.name.endswith('.hdf') and
+                    granule.name in self.localIndex)
+        return [tile for tile in tiles if tile not in found]
+
+    def downloadGranules(self, granules):
+        """Download the files of several days, each one with its own tiles,
+           using the session and the list of days read by :meth:`connect`.
+           With HTTP server the days are downloaded in parallel by 'workers'
+           threads. The file list, the session and the connection are closed
+           at the end, as in :meth:`downloadsAllDay`
+
+           :param granules: a dictionary with the days as keys and the lists
+                            of tiles as values, or a list of (day, tiles)
+                            pairs. A day could be a date object or a string
+                            in format YYYY-MM-DD or YYYY.MM.DD; tiles None
+                            means all the tiles
+
+           :return: a dictionary with the requested days as keys and the
+                    list of the tiles not available on the server or not
+                    downloaded as values, None if all the tiles were
+                    requested and the day is not available
+        """
+        days = self._granulesDays(granules)
+
+        def download(item):
+            """Download the tiles of a day"""
+            key, day, tiles = item
+            if day is None:
+                return key, tiles, None
+            if self.urltype == 'ftp':
+                try:
+                    self.setDirectoryIn(day)
+                except Exception:
+                    return key, tiles, None
+            listAllFiles = self.getFilesList(day, tiles)
             # filter files based on local files in save directory
             listFilesDown = self.checkDataExist(listAllFiles)
-            # download files for a day
-            self.dayDownload(day, listFilesDown)
+            if self.urltype == 'ftp':
+                self.dayDownload(day, listFilesDown)
+                self.setDirectoryOver()
+            else:
+                # the days are already downloaded in parallel
+                self.dayDownload(day, listFilesDown, workers=1)
+            return key, tiles, listAllFiles
+
+        if self.urltype == 'http' and self.workers > 1 and len(days) > 1:
+            pool = ThreadPool(min(self.workers, len(days)))
+            try:
+                results = pool.map(download, days)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [download(item) for item in days]
+        # the files checked in background are registered at the end
+        self.finishValidation()
+        missing = dict((key, self._missingTiles(tiles, listAllFiles))
+                       for key, tiles, listAllFiles in results)
+        if self.urltype == 'http':
+            self.closeFilelist()
+            self.closeSession()
+        elif self.urltype == 'ftp':
+            self.closeFTP()
+        return missing
+
+    def _downloadAllDaysHTTP(self, days):
+        """Downloads all the tiles considered from HTTP server
+
+           :param list days: the list of days to download
+        """
+        # obtain list of all files, the listings of the following days are
+        # downloaded in background while the current day is downloaded
+        if self.prefetch and len(days) > 1:
+            listings = self._prefetchListings(days)
+        else:
+            listings = (self.getFilesList(day) for day in days)
+        try:
+            # for each day
+            for day in days:
+                listAllFiles = next(listings)
+                # filter files based on local files in save directory
+                listFilesDown = self.checkDataExist(listAllFiles)
+                # download files for a day
+                failed = self.dayDownload(day, listFilesDown)
+                self._dayDownloaded(day, listAllFiles, failed)
+        finally:
+            listings.close()
+        self.finishValidation()
         self.closeFilelist()
+        self.closeSession()
         if self.debug:
             logging.debug("Download terminated")
         return 0
@@ -876,14 +4827,19 @@ class downModis:
         # for each day
         for day in days:
             # enter in the directory of day
-            self.setDirectoryIn(day)
+            try:
+                self.setDirectoryIn(day)
+            except Exception:
+                continue
             # obtain list of all files
             listAllFiles = self.getFilesList()
             # filter files based on local files in save directory
             listFilesDown = self.checkDataExist(listAllFiles)
             # download files for a day
-            self.dayDownload(day, listFilesDown)
+            failed = self.dayDownload(day, listFilesDown)
+            self._dayDownloaded(day, listAllFiles, failed)
             self.setDirectoryOver()
+        self.finishValidation()
         self.closeFTP()
         if self.debug:
             logging.debug("Download terminated")
@@ -0,0 +1,775 @@
+#!/usr/bin/env python
+#  class to download modis data using asyncio
+#
+#  (c) Copyright pyModis contributors 2026
+#  Authors: pyModis contributors
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+"""Module to download MODIS HDF files from NASA HTTP repository using a
+single asyncio event loop. It requires Python 3 and the aiohttp library.
+
+Classes:
+
+* :class:`downModisAsync`
+
+"""
+
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    raise ImportError('aiohttp library not found, please install it')
+
+from urllib.parse import urlparse
+
+from .downmodis import downModis
+from .downmodis import BANDWIDTH
+from .downmodis import CONNECTIONS
+from .downmodis import DownloadError
+from .downmodis import DownloadManifest
+from .downmodis import GranuleChecksum
+from .downmodis import ModisListing
+from .downmodis import ModisSession
+from .downmodis import urljoin
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+TRANSIENT = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+             asyncio.TimeoutError)
+
+
+class downModisAsync(downModis):
+    """A class to download MODIS data from NASA HTTP repositories with an
+       asyncio event loop. It has the same public methods of
+       :class:`downModis`, the listings of the days and the files are
+       downloaded concurrently with at most 'concurrency' requests in
+       flight at the same time.
+
+       The coroutines :meth:`connectAsync`, :meth:`getFilesListAsync`,
+       :meth:`downloadFileAsync` and :meth:`downloadsAllDayAsync` can be
+       used inside an already running event loop, they require an open
+       session (see :meth:`openClient`)
+
+       :param str destinationFolder: where the files will be stored
+       :param int concurrency: the maximum number of HTTP requests in flight
+       :param kwargs: all the other parameters of :class:`downModis`
+    """
+
+    def __init__(self, destinationFolder, concurrency=100, **kwargs):
+        """Function to initialize the object"""
+        downModis.__init__(self, destinationFolder, **kwargs)
+        if self.urltype != 'http':
+            raise IOError("downModisAsync supports only HTTP servers")
+        if self.scheduler is not None:
+            raise ValueError("downModisAsync does not support a scheduler, "
+                             "the files are downloaded concurrently")
+        # maximum number of requests in flight
+        self.concurrency = max(1, int(concurrency))
+        # the aiohttp session, opened for each call
+        self.client = None
+        self.semaphore = None
+        self.claims = None
+        # retry also the aiohttp network errors
+        self.retry = self.retry.copy(transient=self.retry.transient +
+                                     TRANSIENT)
+        if self.mirrors:
+            self.mirrors.retry = self.retry
+
+    def _run(self, coro):
+        """Run a coroutine in a new event loop with an open session"""
+        async def runner():
+            await self.openClient()
+            try:
+                return await coro
+            finally:
+                await self.closeClient()
+        return asyncio.run(runner())
+
+    async def openClient(self):
+        """Open the aiohttp session used by the coroutines"""
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=None,
+                                        sock_connect=self.timeout,
+                                        sock_read=self.timeout)
+        self.client = aiohttp.ClientSession(connector=connector,
+                                            timeout=timeout)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        # the files claimed at the same time, each claim keeps a lock file
+        # open and blocks the other processes using the folder
+        self.claims = asyncio.Semaphore(self.concurrency)
+
+    async def closeClient(self):
+        """Close the aiohttp session"""
+        if self.client:
+            await self.client.close()
+        self.client = None
+
+    @asynccontextmanager
+    async def _connection(self, host):
+        """Context holding one of the requests in flight and a connection to
+           the server, see :data:`pymodis.downmodis.CONNECTIONS`
+
+           :param str host: the name of the server
+        """
+        async with self.semaphore:
+            # the limit is shared with threads, it can not block the loop
+            while not CONNECTIONS.acquire(host, blocking=False):
+                await asyncio.sleep(0.05)
+            try:
+                yield
+            finally:
+                CONNECTIONS.release(host)
+
+    async def _mirroredAsync(self, func, url, *args):
+        """Coroutine awaiting func with the url of the best mirror and with
+           the urls of the following mirrors if it fails, as
+           :meth:`MirrorPool.call` does for functions
+
+           :param func: the coroutine function to await, the url of the
+                        mirror is its first argument
+           :param str url: the url of the primary server
+           :param args: the other arguments of the function
+
+           :return: the value returned by func
+        """
+        errors = []
+        for base in self.mirrors.ordered():
+            mirrorurl = self.mirrors.rebase(url, base)
+            try:
+                result = await func(mirrorurl, *args)
+            except Exception as e:
+                if not self.mirrors.failed(mirrorurl, e):
+                    raise
+                errors.append(e)
+                if len(errors) < len(self.mirrors):
+                    logging.warning("Mirror {mi} failed with error '{er}', "
+                                    "trying the next one".format(mi=base,
+                                                                 er=e))
+                continue
+            self.mirrors.report(mirrorurl)
+            return result
+        raise self.mirrors.error(errors)
+
+    async def _get(self, url, headers=None, method='GET'):
+        """Send a GET request following the redirects. The credentials are
+           sent only to the data server and to the NASA Earthdata login
+           server, the cookies are kept by the session
+
+           :param str url: the url to request
+           :param dict headers: additional headers for the request
+           :param str method: the HTTP method of the request, like HEAD
+
+           :return: an aiohttp.ClientResponse object
+        """
+        auth = aiohttp.BasicAuth(self.user, self.password)
+        for i in range(10):
+            host = urlparse(url).hostname
+            if host == ModisSession.AUTH_HOST or host in self.mirrors.hosts:
+                resp = await self.client.request(method, url, auth=auth,
+                                                 headers=headers,
+                                                 allow_redirects=False)
+            else:
+                resp = await self.client.request(method, url,
+                                                 headers=headers,
+                                                 allow_redirects=False)
+            if resp.status not in REDIRECT_CODES:
+                return resp
+            url = str(resp.url.join(URL(resp.headers['Location'])))
+            resp.release()
+        raise aiohttp.TooManyRedirects(resp.request_info, resp.history)
+
+    async def _retryAsync(self, policy, func, *args):
+        """Coroutine awaiting func until it succeeds or the retry policy
+           gives up, as :meth:`RetryPolicy.call` does for functions
+
+           :param policy: the RetryPolicy object to use
+           :param func: the coroutine function to await
+           :param args: the arguments of the function
+
+           :return: the value returned by func
+        """
+        start = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func(*args)
+            except Exception as e:
+                wait = policy.wait(e, attempt, start)
+                logging.warning("Attempt {n} failed with error '{er}', "
+                                "retrying in {s:.1f} "
+                                "seconds".format(n=attempt, er=e, s=wait))
+                await asyncio.sleep(wait)
+
+    async def _getListingAsync(self, url, day=None, tiles=None):
+        """Coroutine returning the parsed listing of a directory of the
+           server, using the listing cache if it is enabled
+
+           :param str url: the url of the directory on the primary server,
+                           it is requested to the mirrors
+           :param str day: the date of the directory in format YYYY.MM.DD,
+                           None for the product directory
+           :param list tiles: the tiles to keep, None to use the tiles of
+                              the object
+
+           :return: a ModisListing object
+        """
+        if self.listingCache:
+            cached = self.listingCache.getCached(url, day)
+            if cached is not None:
+                return self._listingInfo(ModisListing.fromCache(cached))
+        listing = await self._mirroredAsync(self._fetchListingAsync, url,
+                                            tiles)
+        if self.listingCache:
+            self.listingCache.set(url, listing.get_dates() +
+                                  listing.get_all(), day, listing.sizes,
+                                  listing.times)
+        return self._listingInfo(listing)
+
+    async def _fetchListingAsync(self, url, tiles=None):
+        """Coroutine downloading and parsing the listing of a directory
+           from a mirror
+
+           :param str url: the url of the directory on the mirror
+           :param list tiles: the tiles to keep, None to use the tiles of
+                              the object
+
+           :return: a ModisListing object
+        """
+        async with self._connection(self.mirrors.host(url)):
+            start = time.time()
+            resp = await self._get(url)
+            self.mirrors.measure(url, time.time() - start)
+            try:
+                resp.raise_for_status()
+                listing = self._newListing(tiles, resp.charset)
+                async for chunk in resp.content.iter_chunked(65536):
+                    listing.feed(chunk)
+                listing.close()
+            finally:
+                resp.release()
+            self.metrics.observe('listing_seconds', time.time() - start)
+        return listing
+
+    def connect(self, ncon=20):
+        """Connect to the server and fill the dirData variable
+
+           :param int ncon: maximum number of attempts to connect to the HTTP
+                            server before failing
+        """
+        self._run(self.connectAsync(ncon))
+
+    async def connectAsync(self, ncon=20):
+        """Coroutine to connect to the server and fill the dirData variable
+
+           :param int ncon: maximum number of attempts to connect to the HTTP
+                            server before failing. If ncon < 0, connection
+                            attempts are unlimited in number
+        """
+        async def connect():
+            """A single attempt to connect"""
+            self.nconnection += 1
+            url = urljoin(self.url, self.path)
+            http = await self._getListingAsync(url)
+            self.dirData = http.get_dates()
+            self.dirData.reverse()
+
+        try:
+            await self._retryAsync(self._connectPolicy(ncon), connect)
+        except Exception as e:
+            logging.error('Error in connection: {er}'.format(er=e))
+        if len(self.dirData) == 0:
+            raise Exception("There are some troubles with the server. "
+                            "The directory seems to be empty")
+
+    def getFilesList(self, day=None, tiles=None):
+        """Returns a list of files to download. HDF and XML files are
+           downloaded by default. JPG files will be downloaded if
+           self.jpeg == True.
+
+           :param str day: the date of data in format YYYY.MM.DD
+           :param list tiles: the tiles to select, None to use the tiles of
+                              the object
+
+           :return: a list of files to download for the day
+        """
+        return self._run(self.getFilesListAsync(day, tiles))
+
+    async def getFilesListAsync(self, day, tiles=None):
+        """Coroutine returning the list of files to download for a day
+
+           :param str day: the date of data in format YYYY.MM.DD
+           :param list tiles: the tiles to select, None to use the tiles of
+                              the object
+        """
+        url = urljoin(self.url, self.path, day)
+        if self.debug:
+            logging.debug("The url is: {url}".format(url=url))
+        try:
+            http = await self._retryAsync(self.retry, self._getListingAsync,
+                                          url, day, tiles)
+        except Exception as e:
+            logging.error("Error {err} when try to receive list of "
+                          "files".format(err=e))
+            return []
+        return self._selectFiles(http, tiles)
+
+    def _planListings(self, days, workers):
+        """Return the files of the days on the server, the listings are
+           downloaded concurrently
+
+           :param list days: the days in format YYYY.MM.DD
+           :param int workers: not used, the requests are limited by the
+                               concurrency of the object
+        """
+        async def listings():
+            return await asyncio.gather(*[self.getFilesListAsync(day)
+                                          for day in days])
+        return self._run(listings())
+
+    def _planSizes(self, files, workers):
+        """Return the sizes of the remote files, from the listings or
+           requested concurrently with HEAD requests
+
+           :param list files: the (day, name) pairs of the files
+           :param int workers: not used, the requests are limited by the
+                               concurrency of the object
+        """
+        async def size(day, name):
+            """Return the size of one file, None if not known"""
+            if name in self.remoteSizes:
+                return self.remoteSizes[name]
+            url = urljoin(self.url, self.path, day, name)
+            try:
+                value = await self._retryAsync(self.retry,
+                                               self._mirroredAsync,
+                                               self._headSizeAsync, url)
+            except Exception as e:
+                logging.warning("Cannot get the size of {name}: "
+                                "{err}".format(name=name, err=e))
+                return None
+            if value is not None:
+                self.remoteSizes[name] = value
+            return value
+
+        async def sizes():
+            return await asyncio.gather(*[size(day, name)
+                                          for day, name in files])
+        return self._run(sizes())
+
+    async def _headSizeAsync(self, url):
+        """Coroutine requesting the size of a file with a HEAD request to a
+           mirror
+
+           :param str url: the url of the file on the mirror
+
+           :return: the size in bytes, None if the server does not send it
+        """
+        async with self._connection(self.mirrors.host(url)):
+            start = time.time()
+            resp = await self._get(url, method='HEAD')
+            self.mirrors.measure(url, time.time() - start)
+            try:
+                resp.raise_for_status()
+                length = resp.headers.get('Content-Length')
+                return int(length) if length is not None else None
+            finally:
+                resp.release()
+
+    def downloadFile(self, filDown, filHdf, day):
+        """Download a single file
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+           :param str day: the day in format YYYY.MM.DD
+        """
+        return self._run(self.downloadFileAsync(filDown, filHdf, day))
+
+    async def downloadFileAsync(self, filDown, filHdf, day):
+        """Coroutine to download a single file, the failed attempts are
+           retried according to the retry policy. The file is claimed as
+           in :meth:`downModis.downloadFile`, with the granule cache it is
+           taken from it if another process already downloaded it
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+           :param str day: the day in format YYYY.MM.DD
+
+           :return: 0 if the file is downloaded, 1 for error
+        """
+        async with self.claims:
+            taken = []
+            try:
+                locks = self._fileLocks(filDown, filHdf)
+                for n, lock in enumerate(locks):
+                    # the locks are shared with threads and processes,
+                    # they can not block the loop
+                    while True:
+                        claim = self._acquireLock(lock, filDown, cache=n > 0,
+                                                  blocking=False)
+                        if claim is not False:
+                            break
+                        await asyncio.sleep(0.2)
+                    if claim:
+                        taken.append(lock)
+                if self._claimedDone(filDown, filHdf):
+                    return 0
+                if self._useCache(filDown) and await self._inThread(
+                        self._fromCache, filDown, filHdf, day):
+                    self._fileMetrics(time.time(), 0)
+                    return 0
+                return await self._downloadFileAsync(filDown, filHdf, day)
+            except (IOError, OSError) as e:
+                logging.error("Cannot claim {name}, the error was "
+                              "'{err}'".format(name=filDown, err=e))
+                return 1
+            finally:
+                for lock in reversed(taken):
+                    lock.release()
+                self.cacheSkipped.discard(filDown)
+
+    async def _downloadFileAsync(self, filDown, filHdf, day):
+        """Coroutine to download a single file from the server
+
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+           :param str day: the day in format YYYY.MM.DD
+
+           :return: 0 if the file is downloaded, 1 for error
+        """
+        start = time.time()
+        self._fileStarted(filDown, day, filHdf)
+        self.metrics.add('active_downloads', 1)
+        url = urljoin(self.url, self.path, day, filDown)
+        try:
+            result = await self._retryAsync(self.retry, self._mirroredAsync,
+                                            self._transferFileAsync, url,
+                                            filDown, filHdf)
+        except Exception as e:
+            logging.error("Cannot download {name}, the error was "
+                          "'{err}'".format(name=filDown, err=e))
+            self._fileFailed(filDown, day, filHdf)
+            self._fileMetrics(start, 1)
+            return 1
+        finally:
+            self.metrics.add('active_downloads', -1)
+        # the file could be copied in the granule cache
+        await self._inThread(self._fileDownloaded, filDown, filHdf, result,
+                             day)
+        self._fileMetrics(start, 0)
+        return 0
+
+    async def _transferFileAsync(self, url, filDown, filHdf):
+        """Coroutine making a single attempt to download a file. As in
+           :class:`downModis` the data are written to a '.part' file that is
+           resumed by the following attempts and renamed when the download
+           is complete
+
+           :param str url: the url of the file on the mirror
+           :param str filDown: name of the file to download
+           :param str filHdf: name of the file to write to
+
+           :return: the remote size, None if unknown, the local size and
+                    the verified checksum, None if not available
+        """
+        filPart = filHdf + '.part'
+        offset = await self._inThread(self._partOffset, filPart)
+        expected = self._expectedChecksum(filDown, filHdf)
+        checksum = None
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes={st}-'.format(st=offset)
+        orig_size = None
+        transf_size = offset
+        async with self._connection(self.mirrors.host(url)):
+            start = time.time()
+            resp = await self._get(url, headers=headers)
+            self.mirrors.measure(url, time.time() - start)
+            try:
+                if offset and resp.status == 416:
+                    os.remove(filPart)
+                    raise DownloadError("Not valid partial file for {name}, "
+                                        "restart the "
+                                        "download".format(name=filDown))
+                resp.raise_for_status()
+                if offset and resp.status == 206:
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                    transf_size = 0
+                if resp.content_length is not None:
+                    orig_size = transf_size + resp.content_length
+                if expected:
+                    checksum = GranuleChecksum(expected[0])
+                    # the data already downloaded are part of the checksum
+                    if mode == "ab":
+                        await self._inThread(checksum.updateFile, filPart)
+                filSave = await self._inThread(self._openPart, filPart,
+                                               transf_size, orig_size)
+                try:
+                    iterator = resp.content.iter_chunked(self.buffersize)
+                    async for chunk in iterator:
+                        await self._inThread(self._writeChunk, filSave,
+                                             chunk, checksum)
+                        transf_size += len(chunk)
+                        self.metrics.inc('bytes_total', len(chunk))
+                        delay = BANDWIDTH.reserve(len(chunk))
+                        if delay:
+                            await asyncio.sleep(delay)
+                finally:
+                    await self._inThread(self._closePart, filSave)
+            finally:
+                resp.release()
+        # the GDAL check blocks, it runs outside the event loop
+        return await self._inThread(self._finishTransfer, filDown, filHdf,
+                                    orig_size, transf_size, checksum,
+                                    expected)
+
+    @staticmethod
+    def _writeChunk(filSave, chunk, checksum=None):
+        """Write a block of data and add it to the checksum, it runs outside
+           the event loop
+
+           :param filSave: the open '.part' file
+           :param bytes chunk: the block of data
+           :param checksum: the GranuleChecksum object, None if not used
+        """
+        filSave.write(chunk)
+        if checksum:
+            checksum.update(chunk)
+
+    @staticmethod
+    async def _inThread(func, *args):
+        """Coroutine running a function that blocks, like the disk I/O, in
+           the default executor of the loop
+
+           :param func: the function to call
+           :param args: the arguments of the function
+
+           :return: the value returned by the function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def resumeManifest(self):
+        """Download the files left pending or in progress in the manifest by
+           a previous run that was interrupted
+
+           :return: the number of files not downloaded
+        """
+        return self._run(self.resumeManifestAsync())
+
+    async def resumeManifestAsync(self):
+        """Coroutine downloading concurrently the files left pending or in
+           progress in the manifest by a previous run
+
+           :return: the number of files not downloaded
+        """
+        if not self.manifest:
+            return 0
+        unfinished = self.manifest.select(self.product,
+                                          (DownloadManifest.PENDING,
+                                           DownloadManifest.IN_PROGRESS))
+        jobs = []
+        for name, day in unfinished:
+            filHdf = os.path.join(self.writeFilePath, name)
+            if name in self.localIndex:
+                self.manifest.setStatus(name, DownloadManifest.VERIFIED,
+                                        local_size=os.path.getsize(filHdf))
+            elif day is not None:
+                jobs.append(self.downloadFileAsync(name, filHdf, day))
+        results = await asyncio.gather(*jobs)
+        return sum(results)
+
+    def dayDownload(self, day, listFilesDown, workers=None):
+        """Downloads tiles for the selected day
+
+           :param str day: the day in format YYYY.MM.DD
+           :param list listFilesDown: list of the files to download, returned
+                                      by checkDataExist function
+           :param int workers: not used, the files are downloaded
+                               concurrently
+        """
+        return self._run(self.dayDownloadAsync(day, listFilesDown))
+
+    async def dayDownloadAsync(self, day, listFilesDown):
+        """Coroutine downloading concurrently the tiles of a day
+
+           :param str day: the day in format YYYY.MM.DD
+           :param list listFilesDown: list of the files to download, returned
+                                      by checkDataExist function
+
+           :return: the number of files not downloaded
+        """
+        filesDown = self._planDayFiles(listFilesDown)
+        if self.manifest and filesDown:
+            self.manifest.setStatus(filesDown, DownloadManifest.PENDING, day)
+        # the XML files are downloaded first, they contain the checksums
+        # of the other files
+        xmlDown = [fil for fil in filesDown if fil.endswith('.xml')]
+        dataDown = [fil for fil in filesDown if not fil.endswith('.xml')]
+        results = []
+        for files in (xmlDown, dataDown):
+            results += await asyncio.gather(*[
+                self.downloadFileAsync(fileDown,
+                                       os.path.join(self.writeFilePath,
+                                                    fileDown),
+                                       day) for fileDown in files])
+        return sum(results)
+
+    def finishValidation(self):
+        """Wait the end of the background validation and download again
+           the files not valid, only once
+
+           :return: the number of files not downloaded
+        """
+        return self._run(self.finishValidationAsync())
+
+    async def finishValidationAsync(self):
+        """Coroutine waiting the end of the background validation and
+           downloading again the files not valid, only once
+
+           :return: the number of files not downloaded
+        """
+        loop = asyncio.get_running_loop()
+        invalid = await loop.run_in_executor(None, self.waitValidation)
+        for name, day in invalid:
+            logging.warning("Download again {name}, it is not "
+                            "valid".format(name=name))
+        results = await asyncio.gather(*[
+            self.downloadFileAsync(name, os.path.join(self.writeFilePath,
+                                                      name), day)
+            for name, day in invalid])
+        failedDays = [day for (name, day), res in zip(invalid, results) if res]
+        # wait the validation of the files downloaded again
+        invalid = await loop.run_in_executor(None, self.waitValidation)
+        failedDays.extend(day for name, day in invalid)
+        self._validationDone(failedDays)
+        return len(failedDays)
+
+    def downloadGranules(self, granules):
+        """Download the files of several days, each one with its own tiles,
+           see :meth:`downModis.downloadGranules`
+
+           :param granules: a dictionary with the days as keys and the lists
+                            of tiles as values, or a list of (day, tiles)
+                            pairs
+
+           :return: a dictionary with the requested days as keys and the
+                    list of the tiles not available on the server or not
+                    downloaded as values
+        """
+        return self._run(self.downloadGranulesAsync(granules))
+
+    async def downloadGranulesAsync(self, granules):
+        """Coroutine downloading concurrently the files of several days, each
+           one with its own tiles
+
+           :param granules: a dictionary with the days as keys and the lists
+                            of tiles as values, or a list of (day, tiles)
+                            pairs
+
+           :return: a dictionary with the requested days as keys and the
+                    list of the tiles not available on the server or not
+                    downloaded as values
+        """
+        async def download(key, day, tiles):
+            """List and download the tiles of a day"""
+            if day is None:
+                return key, tiles, None
+            listAllFiles = await self.getFilesListAsync(day, tiles)
+            listFilesDown = self.checkDataExist(listAllFiles)
+            await self.dayDownloadAsync(day, listFilesDown)
+            return key, tiles, listAllFiles
+
+        results = await asyncio.gather(*[
+            download(key, day, tiles)
+            for key, day, tiles in self._granulesDays(granules)])
+        await self.finishValidationAsync()
+        self.closeFilelist()
+        self.closeSession()
+        return dict((key, self._missingTiles(tiles, listAllFiles))
+                    for key, tiles, listAllFiles in results)
+
+    def iterGranules(self, allDays=False, keepraw=False, workers=None):
+        """Download in memory the files that :meth:`downloadsAllDay` would
+           download and return them one at a time, see
+           :meth:`pymodis.downmodis.downModis.iterGranules`. Each file is
+           downloaded by its own event loop, so they are not downloaded in
+           advance
+
+           :param bool allDays: download all the days available on the
+                                server
+           :param bool keepraw: True to download the files also in the
+                                destination folder and register them
+           :param int workers: not used
+
+           :return: a generator of MemoryGranule objects
+        """
+        return downModis.iterGranules(self, allDays, keepraw, workers=1)
+
+    def downloadsAllDay(self, clean=False, allDays=False):
+        """Download all requested days
+
+           :param bool clean: if True remove the empty files, they could have
+                              some problems in the previous download
+           :param bool allDays: download all passable days
+        """
+        self._run(self.downloadsAllDayAsync(clean, allDays))
+
+    async def downloadsAllDayAsync(self, clean=False, allDays=False):
+        """Coroutine downloading all requested days, the listings of all the
+           days are requested concurrently and the files of each day are
+           downloaded as soon as its listing is available
+
+           :param bool clean: if True remove the empty files, they could have
+                              some problems in the previous download
+           :param bool allDays: download all passable days
+        """
+        if clean:
+            self.removeEmptyFiles()
+        # get the days to download
+        if allDays:
+            days = self.getAllDays()
+        else:
+            days = self.getListDays()
+        # complete the downloads interrupted in a previous run and skip
+        # the days already downloaded
+        if self.manifest:
+            await self.resumeManifestAsync()
+            days = [day for day in days if not self._skipDay(day)]
+        if self.debug:
+            logging.debug("The number of days to download is: "
+                          "{num}".format(num=len(days)))
+
+        async def download(day):
+            """List and download a single day"""
+            listAllFiles = await self.getFilesListAsync(day)
+            listFilesDown = self.checkDataExist(listAllFiles)
+            failed = await self.dayDownloadAsync(day, listFilesDown)
+            self._dayDownloaded(day, listAllFiles, failed)
+
+        await asyncio.gather(*[download(day) for day in days])
+        await self.finishValidationAsync()
+        self.closeFilelist()
+        self.closeSession()
+        if self.debug:
+            logging.debug("Download terminated")
+        return 0
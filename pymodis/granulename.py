@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#  class to parse the names of the MODIS files
+#
+#  (c) Copyright pyModis contributors 2026
+#  Authors: pyModis contributors
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+"""Module to parse the names of the MODIS files, like
+MOD11A1.A2020001.h18v04.006.2020003000000.hdf, its XML metadata file and
+the BROWSE JPEG preview
+
+Classes:
+
+* :class:`GranuleName`
+
+Functions:
+
+* :func:`parseGranule`
+* :func:`parseGranules`
+
+"""
+
+# python 2 and 3 compatibility
+from __future__ import print_function
+
+import os
+import re
+import threading
+from datetime import date
+from datetime import timedelta
+
+TILE = re.compile(r'^h\d{2}v\d{2}$')
+DATECODE = re.compile(r'^A\d{7}$')
+
+
+class GranuleName(object):
+    """A parsed MODIS file name, the attributes are
+
+    * name: the file name, without directory
+    * product: the product code, like MOD11A1
+    * year: the year as integer
+    * doy: the day of the year as integer
+    * tile: the tile, like h18v04, None for global products
+    * collection: the collection, like 006
+    * production: the production time, like 2020003000000
+    * kind: the last extension: hdf, xml or jpg
+    * browse: True for the BROWSE JPEG preview
+
+    :param str name: the name of the file, the directory is ignored
+
+    It raises ValueError if the name is not a MODIS file name
+    """
+    __slots__ = ('name', 'product', 'year', 'doy', 'tile', 'collection',
+                 'production', 'kind', 'browse')
+
+    def __init__(self, name):
+        self.name = os.path.basename(name)
+        parts = self.name.split('.')
+        self.browse = parts[0] == 'BROWSE'
+        if self.browse:
+            parts = parts[1:]
+        if len(parts) < 4 or not DATECODE.match(parts[1]):
+            raise ValueError("'{na}' is not a MODIS file "
+                             "name".format(na=self.name))
+        self.product = parts[0]
+        self.year = int(parts[1][1:5])
+        self.doy = int(parts[1][5:])
+        if TILE.match(parts[2]):
+            self.tile = parts[2]
+            parts = parts[3:]
+        else:
+            self.tile = None
+            parts = parts[2:]
+        if len(parts) < 2:
+            raise ValueError("'{na}' is not a MODIS file "
+                             "name".format(na=self.name))
+        self.collection = parts[0]
+        self.production = parts[1] if len(parts) > 2 else None
+        self.kind = parts[-1]
+
+    def __repr__(self):
+        return "GranuleName('{na}')".format(na=self.name)
+
+    def __eq__(self, other):
+        return isinstance(other, GranuleName) and self.name == other.name
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.name)
+
+    @property
+    def datecode(self):
+        """Return the date as in the file name, like A2020001"""
+        return 'A{ye:04d}{do:03d}'.format(ye=self.year, do=self.doy)
+
+    @property
+    def date(self):
+        """Return the acquisition date as datetime.date object"""
+        return date(self.year, 1, 1) + timedelta(self.doy - 1)
+
+    @property
+    def day(self):
+        """Return the acquisition date as the directory of the HTTP server,
+        like 2020.01.01"""
+        return self.date.strftime("%Y.%m.%d")
+
+    @property
+    def prefix(self):
+        """Return the name without production time and extensions, the
+        same for all the versions and the files of a granule"""
+        return '.'.join([part for part in (self.product, self.datecode,
+                                           self.tile, self.collection)
+                         if part is not None])
+
+    @property
+    def key(self):
+        """Return a tuple identifying the file of a granule independently
+        from its production time"""
+        return (self.product, self.datecode, self.tile, self.collection,
+                self.kind)
+
+
+_CACHE = {}
+_CACHELOCK = threading.Lock()
+CACHESIZE = 100000
+
+
+def parseGranule(name):
+    """Return the cached GranuleName of a file name, None if the name is
+    not a MODIS file name
+
+    :param str name: the name of the file
+    """
+    try:
+        return _CACHE[name]
+    except KeyError:
+        pass
+    try:
+        granule = GranuleName(name)
+    except ValueError:
+        granule = None
+    with _CACHELOCK:
+        if len(_CACHE) >= CACHESIZE:
+            _CACHE.clear()
+        _CACHE[name] = granule
+    return granule
+
+
+COLUMNS = ('name', 'product', 'year', 'doy', 'tile', 'collection',
+           'production', 'kind', 'browse')
+
+
+def parseGranules(names):
+    """Parse a list of file names into columns, it returns a dictionary with
+    a numpy array for each attribute of GranuleName plus the `valid`
+    boolean column; the columns of the names that are not MODIS file names
+    contain empty strings, zero and False
+
+    :param list names: the names of the files
+    """
+    import numpy
+    granules = [parseGranule(name) for name in names]
+    cols = {}
+    cols['valid'] = numpy.array([gran is not None for gran in granules],
+                                dtype=bool)
+    for col in COLUMNS:
+        if col in ('year', 'doy'):
+            empty, dtype = 0, numpy.int32
+        elif col == 'browse':
+            empty, dtype = False, bool
+        else:
+            empty, dtype = '', str
+        values = []
+        for gran in granules:
+            value = empty if gran is None else getattr(gran, col)
+            values.append(empty if value is None else value)
+        cols[col] = numpy.array(values, dtype=dtype)
+    return cols
@@ -49,6 +49,8 @@ except ImportError:
         raise ImportError('Python GDAL library not found, please install '
                           'python-gdal')
 
+from .convertmodis_gdal import gdalName
+
 
 VALIDTYPES = dict({'13': list(map(str, list(range(1, 10)))), '11': list(map(str, list(range(1, 6))))})
 
@@ -95,13 +97,14 @@ class QualityModis():
     """A Class for the extraction and transformation of MODIS
     quality layers to specific information
 
-    :param str infile: the full path to the hdf file
+    :param str infile: the full path to the hdf file, or the MemoryGranule
+                       downloaded in memory
     :param str outfile: the full path to the parameter file
     """
 
     def __init__(self, infile, outfile, qType=None, qLayer=None, pType=None):
         """Function to initialize the object"""
-        self.infile = infile
+        self.infile = gdalName(infile)
         self.outfile = outfile
         self.qType = qType
         self.qLayer = qLayer
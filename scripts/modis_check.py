@@ -35,6 +35,7 @@ try:
 except:
     WXPYTHON = False
 from pymodis import optparse_required
+from pymodis import granulename
 
 def main():
     """Main function"""
@@ -106,22 +107,23 @@ def main():
     tiles = options.tiles.split(',')
     output = OrderedDict()
     missing_dates = {}
-    for fi in files:
-        if fi.startswith('./'):
-            fi = fi.lstrip('./')
-        if fi.count('.') != 5:
-            print("Error with file {fi}, to many dots, skipping it. Please " \
-                  "to be sure run it for the same folder containing the HDF" \
-                  " file".format(fi=fi))
-            continue
-        fisplit = fi.split('.')
-        dat = fisplit[1]
-        year = int(dat[1:5])
+    # parse all the names at once into columns
+    granules = granulename.parseGranules(files)
+    for fi, valid in zip(files, granules['valid']):
+        if not valid:
+            print("Error with file {fi}, it is not a MODIS file, skipping "
+                  "it".format(fi=fi))
+    valid = granules['valid']
+    for year, doy, tile in zip(granules['year'][valid],
+                               granules['doy'][valid],
+                               granules['tile'][valid]):
+        year = int(year)
+        doy = int(doy)
+        dat = "A{ye}{do}".format(ye=year, do=str(doy).zfill(3))
         if year not in missing_dates.keys():
             if eday == 366 and calendar.isleap(year):
                 eday = 367
             missing_dates[year] = list(range(sday, eday, tres))
-        doy = int(dat[5:8])
         try:
             missing_dates[year].remove(doy)
         except ValueError:
@@ -129,7 +131,7 @@ def main():
         if dat not in output.keys():
             output[dat] = copy.deepcopy(tiles)
         try:
-            output[dat].remove(fisplit[2])
+            output[dat].remove(str(tile))
         except ValueError:
             continue
     for k, v in missing_dates.items():
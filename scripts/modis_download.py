@@ -19,9 +19,11 @@
 #
 ##################################################################
 """Script to download massive MODIS data"""
+from __future__ import print_function
 import sys
 import os
 import getpass
+from datetime import timedelta
 try:
     from pymodis import optparse_gui
     WXPYTHON = True
@@ -99,6 +101,114 @@ def main():
     parser.add_option("-r", dest="empty", action="store_true", default=False,
                       help="remove empty files (size equal to zero) from "
                       "'destination_folder'  [default=%default]")
+    # number of parallel downloads
+    parser.add_option("-w", "--workers", dest="workers", default=1,
+                      help="number of files to download in parallel "
+                      "[default=%default]")
+    # number of day listings to download in advance
+    parser.add_option("-F", "--prefetch", dest="prefetch", default=0,
+                      help="number of listings of the following days to "
+                      "download in parallel, only for HTTP server "
+                      "[default=%default]")
+    # directory to cache the listings of the server
+    parser.add_option("-C", "--cache", dest="cache", default=None,
+                      help="directory where to store the listings of the "
+                      "server to reuse them in the next runs, only for HTTP "
+                      "server [default=%default]")
+    # database with the state of the downloads
+    parser.add_option("-M", "--manifest", dest="manifest", action="store_true",
+                      default=False, help="record the state of the downloads "
+                      "in the 'manifest.sqlite' database inside "
+                      "'destination_folder', to skip the days already "
+                      "downloaded and resume interrupted downloads "
+                      "[default=%default]")
+    # check of the downloaded HDF files
+    parser.add_option("-V", "--validation", dest="validation", default="gdal",
+                      type='choice', choices=['gdal', 'fast', 'deep', 'none'],
+                      help="how to check the downloaded HDF files without "
+                      "checksum: 'gdal' opens them with GDAL, 'fast' checks "
+                      "only the structure of the HDF4 file, 'deep' checks "
+                      "the structure and opens all the subdatasets in "
+                      "background, 'none' disables the check "
+                      "[default=%default]")
+    # bandwidth limit
+    parser.add_option("-B", "--bandwidth", dest="bandwidth", default=None,
+                      help="maximum bandwidth used by the downloads in "
+                      "bytes per second [default=%default] for no limit")
+    # maximum connections to the server
+    parser.add_option("-H", "--maxconn", dest="maxconn", default=None,
+                      help="maximum number of simultaneous requests to the "
+                      "server [default=%default] for no limit")
+    # file where to write the metrics
+    parser.add_option("-m", "--metrics", dest="metrics", default=None,
+                      help="file where to write every minute the metrics of "
+                      "the downloads, in Prometheus text format if it ends "
+                      "with '.prom' otherwise in JSON [default=%default]")
+    # order of the downloads
+    parser.add_option("-S", "--schedule", dest="schedule", default=None,
+                      type='choice',
+                      choices=['newest', 'tiles', 'smallest', 'roundrobin'],
+                      help="list all the days and then download the files "
+                      "in the order of the policy: 'newest' days first, "
+                      "priority 'tiles' first, 'smallest' files first or "
+                      "'roundrobin' [default=%default] to download one day "
+                      "after the other")
+    # tiles to download first
+    parser.add_option("-T", "--priority", dest="priority", default=None,
+                      help="string of tiles separated by comma to download "
+                      "first with the 'tiles' schedule [default=%default]")
+    # mirrors of the http server
+    parser.add_option("-R", "--mirrors", dest="mirrors", default=None,
+                      help="string of urls separated by comma of the "
+                      "mirrors hosting the same data of the http server "
+                      "[default=%default]")
+    # how to use the mirrors
+    parser.add_option("-L", "--mirrorpolicy", dest="mirrorpolicy",
+                      default="failover", type='choice',
+                      choices=['failover', 'balance'],
+                      help="how to use the mirrors: 'failover' uses the next "
+                      "one only when the previous ones fail, 'balance' "
+                      "distributes the downloads by latency "
+                      "[default=%default]")
+    # shared cache of the files
+    parser.add_option("-G", "--granulecache", dest="granulecache",
+                      default=None,
+                      help="directory shared with other destination folders "
+                      "and users where each file is downloaded only once "
+                      "[default=%default]")
+    # how to expose the cached files
+    parser.add_option("-K", "--cachelink", dest="cachelink", default="hard",
+                      type='choice', choices=['hard', 'symbolic', 'copy'],
+                      help="how the files of the granule cache are exposed "
+                      "in the destination folder: 'hard' links, 'symbolic' "
+                      "links or 'copy' [default=%default]")
+    # reserve the disk space of the files
+    parser.add_option("-a", "--preallocate", dest="preallocate",
+                      action="store_true", default=False,
+                      help="reserve the disk space of each file before "
+                      "downloading it, to reduce the fragmentation "
+                      "[default=%default]")
+    # buffer of the written files
+    parser.add_option("-b", "--writebuffer", dest="writebuffer", default=None,
+                      help="size in bytes of the buffer used to write the "
+                      "downloaded files [default=%default] for the system "
+                      "default")
+    # flush of the file list and of the manifest
+    parser.add_option("-N", "--flushevery", dest="flushevery", default=1,
+                      help="number of downloaded files after that the file "
+                      "list and the manifest are written to disk "
+                      "[default=%default]")
+    # only list the files to download
+    parser.add_option("-d", "--dry-run", dest="dryrun", action="store_true",
+                      default=False, help="print the files that would be "
+                      "downloaded with their size, the total size and the "
+                      "estimated time without downloading them "
+                      "[default=%default]")
+    # download rate for the estimate
+    parser.add_option("-E", "--rate", dest="rate", default=None,
+                      help="expected download rate in bytes per second to "
+                      "estimate the time of the dry run [default=%default] "
+                      "to use the bandwidth limit")
     #parser.add_option("-A", dest="alldays", action="store_true", default=True,
                       #help="download all days from the first")
 
@@ -131,22 +241,107 @@ def main():
         user = options.user
         password = options.password
 
+    # limits of the downloads
+    if options.bandwidth:
+        bandwidth = int(options.bandwidth)
+    else:
+        bandwidth = None
+    if options.maxconn:
+        maxconn = int(options.maxconn)
+    else:
+        maxconn = None
+    if options.writebuffer:
+        writebuffer = int(options.writebuffer)
+    else:
+        writebuffer = None
+    # format of the metrics
+    if options.metrics and options.metrics.endswith('.prom'):
+        metricsformat = 'prometheus'
+    else:
+        metricsformat = 'json'
+    # scheduler of the downloads
+    if options.schedule:
+        scheduler = downmodis.DownloadScheduler(options.schedule,
+                                                options.priority)
+    else:
+        scheduler = None
+    # the server and its mirrors
+    if options.mirrors:
+        url = [options.url] + options.mirrors.split(',')
+    else:
+        url = options.url
     # set modis object
-    modisOgg = downmodis.downModis(url=options.url, user=user,
+    modisOgg = downmodis.downModis(url=url, user=user,
                                    password=password,
                                    destinationFolder=args[0],
                                    tiles=options.tiles, path=options.path,
                                    product=options.prod, today=options.today,
                                    enddate=options.enday, jpg=options.jpg,
                                    delta=int(options.delta),
-                                   debug=options.debug)
+                                   debug=options.debug,
+                                   workers=int(options.workers),
+                                   prefetch=int(options.prefetch),
+                                   listingcache=options.cache,
+                                   manifest=options.manifest,
+                                   validation=options.validation,
+                                   bandwidth=bandwidth,
+                                   maxconnections=maxconn,
+                                   metricsfile=options.metrics,
+                                   metricsformat=metricsformat,
+                                   granulecache=options.granulecache,
+                                   cachelink=options.cachelink,
+                                   preallocate=options.preallocate,
+                                   writebuffer=writebuffer,
+                                   flushevery=int(options.flushevery),
+                                   scheduler=scheduler,
+                                   mirrorpolicy=options.mirrorpolicy)
     # connect to ftp
     modisOgg.connect()
-    if modisOgg.nconnection <= 20:
+    if modisOgg.nconnection > 20:
+        parser.error("A problem with the connection occured")
+    elif options.dryrun:
+        # print the plan of the download
+        if options.rate:
+            rate = float(options.rate)
+        else:
+            rate = None
+        plan = modisOgg.plan(allDays=options.alldays, rate=rate)
+        printPlan(plan, int(options.workers))
+        modisOgg.closeFilelist(publish=False)
+        if modisOgg.urltype == 'http':
+            modisOgg.closeSession()
+        else:
+            modisOgg.closeFTP()
+    else:
         # download data
         modisOgg.downloadsAllDay(clean=options.empty, allDays=options.alldays)
-    else:
-        parser.error("A problem with the connection occured")
+
+
+def printPlan(plan, workers):
+    """Print the files of a DownloadPlan and its summary
+
+       :param plan: the DownloadPlan object
+       :param int workers: the number of parallel downloads, the bytes
+                           assigned to each of them are printed
+    """
+    for fil in plan:
+        size = '?' if fil.transfer is None else fil.transfer
+        print("{day} {name} {size}".format(day=fil.day, name=fil.name,
+                                           size=size))
+    print("Files to download: {n}".format(n=len(plan)))
+    print("Bytes to download: {by}".format(by=plan.totalBytes))
+    if plan.unknown:
+        print("Files with unknown size: {n}".format(n=plan.unknown))
+    seconds = plan.estimate()
+    if seconds is not None:
+        print("Estimated time: {ti}".format(
+            ti=timedelta(seconds=int(round(seconds)))))
+    if workers > 1 and len(plan) > 1:
+        for n, group in enumerate(plan.split(workers)):
+            size = sum(fil.transfer for fil in group
+                       if fil.transfer is not None)
+            print("Worker {n}: {nf} files, {by} bytes".format(
+                n=n + 1, nf=len(group), by=size))
 
 #add options
 if __name__ == "__main__":
@@ -21,13 +21,13 @@
 ##################################################################
 """Script to download massive MODIS data from a text file containing a list of
 MODIS file name"""
-from datetime import date
 try:
     from pymodis import optparse_gui
     WXPYTHON = True
 except:
     WXPYTHON = False
 from pymodis import downmodis
+from pymodis import granulename
 from pymodis import optparse_required
 import sys
 import os
@@ -76,11 +76,11 @@ def main():
     parser.add_option("-p", "--product", dest="prod", default="MOD11A1.006",
                       help="product name as on the http/ftp server "
                       "[default=%default]")
-    # path to file with server missing tiles
+    # path to file with the tiles not downloaded
     parser.add_option("-o", "--outputs", dest="outs", default=None,
-                      help="the output where write the missing files in the"
-                      " server [default=%default]. Use 'stdout' to write to "
-                      " STDOUT")
+                      help="the output where write the files not downloaded,"
+                      " missing in the server or failed [default=%default]. "
+                      "Use 'stdout' to write to  STDOUT")
     # use netrc file
     parser.add_option("-n", action="store_true", dest="netrc", default=False,
                       help="use netrc file to read user and password")
@@ -92,6 +92,44 @@ def main():
     parser.add_option("-j", action="store_true", dest="jpg", default=False,
                       help="download also the jpeg overview files "
                       "[default=%default]")
+    # number of parallel downloads
+    parser.add_option("-w", "--workers", dest="workers", default=1,
+                      help="number of days to download in parallel "
+                      "[default=%default]")
+    # check of the downloaded HDF files
+    parser.add_option("-V", "--validation", dest="validation", default="gdal",
+                      type='choice', choices=['gdal', 'fast', 'deep', 'none'],
+                      help="how to check the downloaded HDF files without "
+                      "checksum: 'gdal' opens them with GDAL, 'fast' checks "
+                      "only the structure of the HDF4 file, 'deep' checks "
+                      "the structure and opens all the subdatasets in "
+                      "background, 'none' disables the check "
+                      "[default=%default]")
+    # bandwidth limit
+    parser.add_option("-B", "--bandwidth", dest="bandwidth", default=None,
+                      help="maximum bandwidth used by the downloads in "
+                      "bytes per second [default=%default] for no limit")
+    # maximum connections to the server
+    parser.add_option("-H", "--maxconn", dest="maxconn", default=None,
+                      help="maximum number of simultaneous requests to the "
+                      "server [default=%default] for no limit")
+    # file where to write the metrics
+    parser.add_option("-m", "--metrics", dest="metrics", default=None,
+                      help="file where to write every minute the metrics of "
+                      "the downloads, in Prometheus text format if it ends "
+                      "with '.prom' otherwise in JSON [default=%default]")
+    # shared cache of the files
+    parser.add_option("-G", "--granulecache", dest="granulecache",
+                      default=None,
+                      help="directory shared with other destination folders "
+                      "and users where each file is downloaded only once "
+                      "[default=%default]")
+    # how to expose the cached files
+    parser.add_option("-K", "--cachelink", dest="cachelink", default="hard",
+                      type='choice', choices=['hard', 'symbolic', 'copy'],
+                      help="how the files of the granule cache are exposed "
+                      "in the destination folder: 'hard' links, 'symbolic' "
+                      "links or 'copy' [default=%default]")
     # return options and argument
     (options, args) = parser.parse_args()
     if len(args) == 0 and not WXPYTHON:
@@ -115,19 +153,34 @@ def main():
         user = options.user
         password = options.password
 
+    # limits of the downloads
+    if options.bandwidth:
+        bandwidth = int(options.bandwidth)
+    else:
+        bandwidth = None
+    if options.maxconn:
+        maxconn = int(options.maxconn)
+    else:
+        maxconn = None
+    # format of the metrics
+    if options.metrics and options.metrics.endswith('.prom'):
+        metricsformat = 'prometheus'
+    else:
+        metricsformat = 'json'
+
     f = open(options.file)
 
     lines = [elem for elem in f.readlines()]
 
     vals = {}
     for elem in lines:
-        if elem != '\n':
-            dat = elem.split('.')[1].replace('A', '')
-            fisplit = elem.strip().split('.')
-            if dat not in vals.keys():
-                vals[dat] = [fisplit[2]]
-            else:
-                vals[dat].append(fisplit[2])
+        granule = granulename.parseGranule(elem.strip())
+        if granule is None:
+            continue
+        if granule.date not in vals.keys():
+            vals[granule.date] = [granule.tile]
+        else:
+            vals[granule.date].append(granule.tile)
 
     if not options.outs:
         write = None
@@ -136,46 +189,31 @@ def main():
     else:
         write = open(options.outs, 'w')
 
-    for d, tiles in sorted(vals.items(), reverse=True):
-        year = int(d[0:4])
-        doy = int(d[4:7])
-        fdate = date.fromordinal(date(year, 1, 1).toordinal() + doy - 1).isoformat()
-        modisOgg = downmodis.downModis(url=options.url, user=user,
-                                       password=password,
-                                       destinationFolder=args[0],
-                                       tiles=','.join(sorted(set(tiles))),
-                                       path=options.path, product=options.prod,
-                                       delta=1, today=fdate,
-                                       debug=options.debug, jpg=options.jpg)
-
-        modisOgg.connect()
-        day = modisOgg.getListDays()[0]
-        if modisOgg.urltype == 'http':
-            listAllFiles = modisOgg.getFilesList(day)
-        else:
-            listAllFiles = modisOgg.getFilesList()
-        if not listAllFiles:
-            if write:
-                write_out(write, tiles, options, d)
-            continue
-        listFilesDown = modisOgg.checkDataExist(listAllFiles)
-
-        if listFilesDown:
-            if options.debug:
-                print(listFilesDown)
-            modisOgg.dayDownload(day, listFilesDown)
-            for fi in listFilesDown:
-                if 'xml' not in fi:
-                    try:
-                        tiles.remove(fi.split('.')[2])
-                    except ValueError:
-                        pass
-            if write:
-                write_out(write, tiles, options, d)
-        if modisOgg.urltype == 'http':
-            modisOgg.closeFilelist()
-        else:
-            modisOgg.closeFTP()
+    # all the days are downloaded with a single session
+    granules = {}
+    for fdate, tiles in vals.items():
+        granules[fdate] = sorted(set(tiles))
+    modisOgg = downmodis.downModis(url=options.url, user=user,
+                                   password=password,
+                                   destinationFolder=args[0],
+                                   path=options.path, product=options.prod,
+                                   debug=options.debug, jpg=options.jpg,
+                                   workers=int(options.workers),
+                                   validation=options.validation,
+                                   bandwidth=bandwidth,
+                                   maxconnections=maxconn,
+                                   metricsfile=options.metrics,
+                                   metricsformat=metricsformat,
+                                   granulecache=options.granulecache,
+                                   cachelink=options.cachelink)
+    modisOgg.connect()
+    if modisOgg.nconnection > 20:
+        parser.error("A problem with the connection occured")
+    missing = modisOgg.downloadGranules(granules)
+    if write:
+        for fdate, tiles in sorted(missing.items(), reverse=True):
+            if tiles:
+                write_out(write, tiles, options, fdate.strftime("%Y%j"))
 
 if __name__ == "__main__":
     main()
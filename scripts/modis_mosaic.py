@@ -30,6 +30,7 @@ except:
     WXPYTHON = False
 from pymodis import convertmodis
 from pymodis import convertmodis_gdal
+from pymodis import granulename
 from pymodis import optparse_required
 from optparse import OptionGroup
 try:
@@ -123,7 +124,10 @@ def main():
         with open(args[0]) as f:
             for l in f:
                 name = os.path.splitext(l.strip())[0]
-                day = name.split('.')[1]
+                granule = granulename.parseGranule(l.strip())
+                if granule is None:
+                    continue
+                day = granule.datecode
                 if day not in tiles.keys():
                     tiles[day] = list()
                 if '.hdf' not in name:
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+#  tests of the checksums of the downloaded files
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import hashlib
+import os
+import subprocess
+import tempfile
+import unittest
+
+from pymodis import downmodis
+from pymodis.downmodis import GranuleChecksum
+from tests.test_transfer import DATA, NAME, HTTPTestCase
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<GranuleMetaDataFile>
+  <GranuleURMetaData>
+    <DataFiles>
+      <DataFileContainer>
+        <DistributedFileName>{name}</DistributedFileName>
+        <FileSize>{size}</FileSize>
+        <ChecksumType>{kind}</ChecksumType>
+        <Checksum>{value}</Checksum>
+      </DataFileContainer>
+    </DataFiles>
+  </GranuleURMetaData>
+</GranuleMetaDataFile>
+"""
+
+
+def cksum(data):
+    """Return the checksum of the data computed by the cksum command"""
+    proc = subprocess.Popen(['cksum'], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE)
+    out = proc.communicate(data)[0]
+    return out.split()[0].decode()
+
+
+def hasCksum():
+    """Return True if the cksum command is available"""
+    try:
+        cksum(b'')
+    except OSError:
+        return False
+    return True
+
+
+class TestGranuleChecksum(unittest.TestCase):
+    """Tests of GranuleChecksum"""
+
+    SAMPLES = (b'', b'a', b'123456789', b'\0' * 1000,
+               bytes(bytearray(range(256))) * 300)
+
+    def test_known_value(self):
+        # the value of the POSIX specification example
+        checksum = GranuleChecksum('CKSUM')
+        checksum.update(b'123456789')
+        self.assertEqual(checksum.value(), '930766865')
+
+    @unittest.skipUnless(hasCksum(), "cksum command not available")
+    def test_cksum_command(self):
+        for data in self.SAMPLES:
+            checksum = GranuleChecksum('CKSUM')
+            checksum.update(data)
+            self.assertEqual(checksum.value(), cksum(data))
+
+    def test_chunks(self):
+        data = self.SAMPLES[-1]
+        whole = GranuleChecksum('cksum')
+        whole.update(data)
+        chunked = GranuleChecksum('cksum')
+        for start in range(0, len(data), 1000):
+            chunked.update(data[start:start + 1000])
+        self.assertEqual(chunked.value(), whole.value())
+        self.assertEqual(chunked.length, len(data))
+
+    def test_hashlib(self):
+        data = self.SAMPLES[-1]
+        checksum = GranuleChecksum('MD5')
+        checksum.update(data)
+        digest = hashlib.md5(data).hexdigest()
+        self.assertEqual(checksum.value(), digest)
+        self.assertTrue(checksum.matches(digest.upper()))
+        self.assertTrue(GranuleChecksum.supported('SHA-256'))
+        self.assertFalse(GranuleChecksum.supported('NOTACHECKSUM'))
+
+    def test_update_file(self):
+        data = self.SAMPLES[-1]
+        handle, path = tempfile.mkstemp()
+        try:
+            os.write(handle, data)
+            os.close(handle)
+            checksum = GranuleChecksum()
+            checksum.updateFile(path)
+        finally:
+            os.remove(path)
+        expected = GranuleChecksum()
+        expected.update(data)
+        self.assertEqual(checksum.value(), expected.value())
+
+    def test_get_checksums(self):
+        handle, path = tempfile.mkstemp(suffix='.xml')
+        try:
+            os.write(handle, XML.format(name='file.hdf', size=10,
+                                        kind='cksum',
+                                        value=' 123 ').encode())
+            os.close(handle)
+            self.assertEqual(downmodis.getChecksums(path),
+                             {'file.hdf': ('CKSUM', '123')})
+        finally:
+            os.remove(path)
+
+
+class TestTransferChecksum(HTTPTestCase):
+    """Tests of the checksum verified by downModis._transferFileHTTP"""
+
+    def writeXml(self, value):
+        with open(self.filHdf + '.xml', 'w') as fil:
+            fil.write(XML.format(name=NAME, size=len(DATA), kind='CKSUM',
+                                 value=value))
+
+    def test_checksum(self):
+        checksum = GranuleChecksum()
+        checksum.update(DATA)
+        self.writeXml(checksum.value())
+        result = self.transfer()
+        self.assertEqual(result[2], checksum.value())
+        self.assertTrue(os.path.exists(self.filHdf))
+
+    def test_checksum_resumed(self):
+        checksum = GranuleChecksum()
+        checksum.update(DATA)
+        self.writeXml(checksum.value())
+        with open(self.filHdf + '.part', 'wb') as fil:
+            fil.write(DATA[:3000])
+        result = self.transfer()
+        self.assertEqual(result[2], checksum.value())
+
+    def test_checksum_mismatch(self):
+        self.writeXml('1')
+        self.assertRaises(downmodis.DownloadError, self.transfer)
+        self.assertFalse(os.path.exists(self.filHdf))
+        # the corrupted data are not resumed
+        self.assertFalse(os.path.exists(self.filHdf + '.part'))
+
+
+if __name__ == '__main__':
+    unittest.main()
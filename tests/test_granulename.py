@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#  tests of the parser of the names of the MODIS files
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import unittest
+from datetime import date
+
+from pymodis.downmodis import getNewerVersion
+from pymodis.granulename import GranuleName, parseGranule, parseGranules
+
+HDF = 'MOD11A1.A2020032.h18v04.006.2020034000000.hdf'
+
+
+class TestGranuleName(unittest.TestCase):
+    """Tests of GranuleName and parseGranule"""
+
+    def test_hdf(self):
+        granule = GranuleName('/data/' + HDF)
+        self.assertEqual(granule.name, HDF)
+        self.assertEqual((granule.product, granule.year, granule.doy,
+                          granule.tile, granule.collection,
+                          granule.production, granule.kind),
+                         ('MOD11A1', 2020, 32, 'h18v04', '006',
+                          '2020034000000', 'hdf'))
+        self.assertFalse(granule.browse)
+        self.assertEqual(granule.date, date(2020, 2, 1))
+        self.assertEqual(granule.day, '2020.02.01')
+        self.assertEqual(granule.datecode, 'A2020032')
+        self.assertEqual(granule.prefix, 'MOD11A1.A2020032.h18v04.006')
+
+    def test_xml_and_browse(self):
+        xml = parseGranule(HDF + '.xml')
+        self.assertEqual(xml.kind, 'xml')
+        self.assertEqual(xml.prefix, parseGranule(HDF).prefix)
+        self.assertNotEqual(xml.key, parseGranule(HDF).key)
+        browse = parseGranule('BROWSE.MOD11A1.A2020032.h18v04.006.'
+                              '2020034000000.1.jpg')
+        self.assertTrue(browse.browse)
+        self.assertEqual((browse.product, browse.tile, browse.kind),
+                         ('MOD11A1', 'h18v04', 'jpg'))
+
+    def test_global_product(self):
+        granule = parseGranule('MOD13C1.A2020033.006.2020050000000.hdf')
+        self.assertIsNone(granule.tile)
+        self.assertEqual(granule.prefix, 'MOD13C1.A2020033.006')
+
+    def test_no_production(self):
+        granule = parseGranule('MOD11A1.A2020032.h18v04.006.hdf')
+        self.assertIsNone(granule.production)
+        self.assertEqual(granule.kind, 'hdf')
+
+    def test_not_modis(self):
+        for name in ('README', 'listfileMOD11A1.006.txt', '2020.01.01',
+                     'MOD11A1.2020032.h18v04.006.hdf', 'MOD11A1.A2020032'):
+            self.assertIsNone(parseGranule(name), name)
+        self.assertRaises(ValueError, GranuleName, 'README')
+
+    def test_cache(self):
+        self.assertIs(parseGranule(HDF), parseGranule(HDF))
+        self.assertEqual(parseGranule(HDF), GranuleName(HDF))
+
+    def test_newer_version(self):
+        newer = HDF.replace('2020034000000', '2020040000000')
+        self.assertEqual(getNewerVersion(HDF, newer), newer)
+        self.assertEqual(getNewerVersion(newer, HDF), newer)
+        # a name without production time is the older one
+        old = 'MOD11A1.A2020032.h18v04.006.hdf'
+        self.assertEqual(getNewerVersion(old, HDF), HDF)
+        self.assertEqual(getNewerVersion(HDF, old), HDF)
+
+
+class TestParseGranules(unittest.TestCase):
+    """Tests of parseGranules"""
+
+    def test_columns(self):
+        cols = parseGranules([HDF, 'README', HDF + '.xml'])
+        self.assertEqual(list(cols['valid']), [True, False, True])
+        self.assertEqual(list(cols['tile']), ['h18v04', '', 'h18v04'])
+        self.assertEqual(list(cols['doy']), [32, 0, 32])
+        self.assertEqual(list(cols['kind']), ['hdf', '', 'xml'])
+        self.assertEqual(list(cols['name'])[1], '')
+
+    def test_filter(self):
+        names = [HDF, HDF.replace('h18v04', 'h19v04'),
+                 HDF.replace('MOD11A1', 'MYD11A1')]
+        cols = parseGranules(names)
+        selected = (cols['product'] == 'MOD11A1') & (cols['tile'] == 'h19v04')
+        self.assertEqual(list(cols['name'][selected]), [names[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#  tests of the parser of the listings of the server
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import unittest
+
+from pymodis.downmodis import ModisListing
+
+FILES = ('MOD11A1.A2020001.h18v03.006.2020003000000.hdf',
+         'MOD11A1.A2020001.h18v03.006.2020003000000.hdf.xml',
+         'MOD11A1.A2020001.h18v04.006.2020003000000.hdf',
+         'MOD11A1.A2020001.h18v04.006.2020003000000.hdf.xml',
+         'BROWSE.MOD11A1.A2020001.h18v04.006.2020003000000.1.jpg')
+
+ROW = ('<tr><td><a href="{na}">{na}</a></td>'
+       '<td align="right">2020-01-03 10:{mi:02d}  </td>'
+       '<td align="right">{si}</td></tr>\n')
+
+
+def listing(newlines=True):
+    """Return an Apache listing of a day of the server, with a parent
+       link, a sort link and the files"""
+    rows = ['<html><body><table>\n',
+            '<tr><th><a href="?C=N;O=D">Name</a></th></tr>\n',
+            '<tr><td><a href="/MOLT/MOD11A1.006/">Parent Directory</a>'
+            '</td></tr>\n']
+    for n, name in enumerate(FILES):
+        size = '1.5M' if name.endswith('.hdf') else str(1000 + n)
+        rows.append(ROW.format(na=name, mi=n, si=size))
+    rows.append('</table></body></html>\n')
+    text = ''.join(rows)
+    if not newlines:
+        text = text.replace('\n', ' ')
+    return text.encode('utf-8')
+
+
+def feedChunks(parser, data, size):
+    """Feed the data to the parser in chunks of the given size"""
+    for start in range(0, len(data), size):
+        parser.feed(data[start:start + size])
+    return parser.close()
+
+
+class TestModisListing(unittest.TestCase):
+    """Tests of ModisListing"""
+
+    def test_files(self):
+        parser = feedChunks(ModisListing(), listing(), 100000)
+        self.assertEqual(parser.get_all(), list(FILES[:4]))
+        self.assertEqual(parser.sizes[FILES[1]], 1001)
+        self.assertEqual(parser.sizes[FILES[0]], int(1.5 * 1024 ** 2))
+        self.assertEqual(parser.times[FILES[2]], '2020-01-03 10:02:00')
+
+    def test_chunks(self):
+        whole = feedChunks(ModisListing(), listing(), 100000)
+        for size in (1, 7, 64, 333):
+            parser = feedChunks(ModisListing(), listing(), size)
+            self.assertEqual(parser.get_all(), whole.get_all())
+            self.assertEqual(parser.sizes, whole.sizes)
+            self.assertEqual(parser.times, whole.times)
+
+    def test_chunks_without_newlines(self):
+        whole = feedChunks(ModisListing(), listing(False), 100000)
+        parser = feedChunks(ModisListing(), listing(False), 13)
+        self.assertEqual(parser.get_all(), list(FILES[:4]))
+        self.assertEqual(parser.get_all(), whole.get_all())
+
+    def test_multibyte_chunks(self):
+        # a character split between two chunks
+        data = listing().replace(b'<html>', u'<html>è'.encode('utf-8'))
+        parser = feedChunks(ModisListing(), data, 1)
+        self.assertEqual(parser.get_all(), list(FILES[:4]))
+
+    def test_filters(self):
+        parser = feedChunks(ModisListing(tiles='h18v04', jpeg=True),
+                            listing(), 50)
+        self.assertEqual(parser.get_all(), list(FILES[2:]))
+        parser = feedChunks(ModisListing(products='MYD11A1'), listing(), 50)
+        self.assertEqual(parser.get_all(), [])
+        parser = feedChunks(ModisListing(), listing(), 50)
+        self.assertEqual(parser.get_tiles('MOD11A1', ['h18v03']),
+                         list(FILES[:2]))
+
+    def test_dates(self):
+        data = (u'<a href="2020.01.02/">2020.01.02/</a>\n'
+                u'<a href="2020.01.01/">2020.01.01/</a>\n'
+                u'<a href="README">README</a>\n').encode('utf-8')
+        parser = feedChunks(ModisListing(), data, 5)
+        self.assertEqual(parser.get_dates(), ['2020.01.01', '2020.01.02'])
+        self.assertEqual(parser.get_all(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#  tests of the manifest of the downloads
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from pymodis.downmodis import DownloadManifest
+
+DAY = '2020.02.01'
+HDF = 'MOD11A1.A2020032.h18v04.006.2020034000000.hdf'
+HDF61 = 'MOD11A1.A2020032.h18v04.061.2020034000000.hdf'
+JPG = 'BROWSE.MOD11A1.A2020032.h18v04.006.2020034000000.1.jpg'
+UNFINISHED = (DownloadManifest.PENDING, DownloadManifest.IN_PROGRESS)
+
+
+class TestDownloadManifest(unittest.TestCase):
+    """Tests of DownloadManifest"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'manifest.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_product(self):
+        manifest = DownloadManifest(self.path, batch=10)
+        manifest.setStatus([HDF, HDF + '.xml', HDF61, JPG],
+                           DownloadManifest.PENDING, day=DAY)
+        manifest.setStatus(HDF + '.xml', DownloadManifest.VERIFIED)
+        self.assertEqual(manifest.get(JPG)['product'], 'MOD11A1.006')
+        self.assertEqual(manifest.get(HDF61)['product'], 'MOD11A1.061')
+        self.assertEqual(sorted(manifest.select('MOD11A1.006', UNFINISHED)),
+                         [(JPG, DAY), (HDF, DAY)])
+        self.assertEqual(manifest.select('MOD11A1.061', UNFINISHED),
+                         [(HDF61, DAY)])
+        self.assertEqual(manifest.select('MOD11A1', UNFINISHED), [])
+        manifest.close()
+
+    def test_old_manifest(self):
+        # the older manifests stored the product without collection
+        manifest = DownloadManifest(self.path)
+        manifest.setStatus([HDF, JPG], DownloadManifest.PENDING, day=DAY)
+        manifest.close()
+        conn = sqlite3.connect(self.path)
+        conn.execute("UPDATE granules SET product = ?", ('MOD11A1',))
+        conn.commit()
+        conn.close()
+        manifest = DownloadManifest(self.path)
+        self.assertEqual(sorted(manifest.select('MOD11A1.006', UNFINISHED)),
+                         [(JPG, DAY), (HDF, DAY)])
+        manifest.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
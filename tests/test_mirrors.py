@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#  tests of the mirrors of the HTTP server
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import errno
+import socket
+import unittest
+
+from pymodis.downmodis import DownloadError, MirrorPool, RetryPolicy
+from tests.test_retry import httpError
+
+PRIMARY = 'http://primary.example.org/MOLT'
+MIRROR = 'http://mirror.example.org/MOLT'
+URL = PRIMARY + '/MOD11A1.006/2020.01.01/file.hdf'
+
+
+class TestMirrorPool(unittest.TestCase):
+    """Tests of MirrorPool.call"""
+
+    def setUp(self):
+        self.pool = MirrorPool([PRIMARY, MIRROR], cooldown=60,
+                               retry=RetryPolicy())
+        self.calls = []
+
+    def failing(self, errors):
+        """Return a function raising an error for each mirror, or
+           returning the url if the error is None"""
+        def func(url):
+            self.calls.append(url)
+            error = errors[len(self.calls) - 1]
+            if error is not None:
+                raise error
+            return url
+        return func
+
+    def down(self):
+        """Return the mirrors that are marked as failing"""
+        return [mirror['url'] for mirror in self.pool.mirrors
+                if mirror['down'] or mirror['failures']]
+
+    def test_network_error(self):
+        result = self.pool.call(self.failing([socket.timeout(), None]), URL)
+        self.assertEqual(result, MIRROR + '/MOD11A1.006/2020.01.01/file.hdf')
+        self.assertEqual(self.down(), [PRIMARY])
+        # the failing mirror is tried last
+        self.assertEqual(self.pool.ordered(), [MIRROR, PRIMARY])
+
+    def test_transient_status(self):
+        self.pool.call(self.failing([httpError(503), None]), URL)
+        self.assertEqual(self.down(), [PRIMARY])
+
+    def test_missing_file(self):
+        # a file missing on all the mirrors does not mark them as failing
+        self.assertRaises(Exception, self.pool.call,
+                          self.failing([httpError(404), httpError(404)]),
+                          URL)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.down(), [])
+        self.assertEqual([mirror['errors'] for mirror in self.pool.mirrors],
+                         [0, 0])
+
+    def test_missing_on_one_mirror(self):
+        result = self.pool.call(self.failing([httpError(404), None]), URL)
+        self.assertTrue(result.startswith(MIRROR))
+        self.assertEqual(self.down(), [])
+
+    def test_data_error(self):
+        self.assertRaises(DownloadError, self.pool.call,
+                          self.failing([DownloadError('checksum'), None]),
+                          URL)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.down(), [])
+
+    def test_local_error(self):
+        self.assertRaises(IOError, self.pool.call,
+                          self.failing([IOError(errno.ENOSPC, 'full'),
+                                        None]), URL)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.down(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
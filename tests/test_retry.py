@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#  tests of the retry policy of the downloads
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import errno
+import ftplib
+import socket
+import unittest
+
+import requests
+
+from pymodis.downmodis import DownloadError, RetryError, RetryPolicy
+
+
+def httpError(status):
+    """Return a requests HTTPError with a response of the given status"""
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Tests of RetryPolicy"""
+
+    def setUp(self):
+        self.policy = RetryPolicy(attempts=3, backoff=1, factor=2,
+                                  maxdelay=5, jitter=0)
+
+    def test_transient(self):
+        for error in (socket.timeout(), EOFError(), DownloadError('size'),
+                      ftplib.error_temp('421 busy'),
+                      requests.exceptions.ConnectionError(),
+                      socket.error(errno.ECONNRESET, 'reset'),
+                      OSError(errno.EHOSTUNREACH, 'unreachable'),
+                      httpError(503), httpError(429)):
+            self.assertTrue(self.policy.isTransient(error), repr(error))
+
+    def test_not_transient(self):
+        for error in (ValueError(), ftplib.error_perm('550 not found'),
+                      httpError(404), httpError(401),
+                      IOError(errno.ENOSPC, 'no space left'),
+                      OSError(errno.EACCES, 'permission denied'),
+                      OSError(errno.EROFS, 'read-only file system')):
+            self.assertFalse(self.policy.isTransient(error), repr(error))
+
+    def test_delay(self):
+        self.assertEqual([self.policy.delay(n) for n in range(1, 6)],
+                         [1, 2, 4, 5, 5])
+
+    def test_jitter(self):
+        policy = self.policy.copy(jitter=0.5)
+        for attempt in range(1, 6):
+            delay = policy.delay(attempt)
+            base = self.policy.delay(attempt)
+            self.assertTrue(base * 0.5 <= delay <= base * 1.5)
+
+    def test_call(self):
+        calls = []
+
+        def func(fail):
+            calls.append(fail)
+            if len(calls) < fail:
+                raise socket.timeout()
+            return len(calls)
+
+        policy = self.policy.copy(backoff=0)
+        self.assertEqual(policy.call(func, 3), 3)
+        del calls[:]
+        self.assertRaises(RetryError, policy.call, func, 4)
+        self.assertEqual(len(calls), 3)
+
+    def test_call_not_transient(self):
+        calls = []
+
+        def func():
+            calls.append(1)
+            raise IOError(errno.ENOSPC, 'no space left')
+
+        self.assertRaises(IOError, self.policy.copy(backoff=0).call, func)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+#  tests of the scheduler of the downloads
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import threading
+import time
+import unittest
+
+from pymodis.downmodis import DownloadScheduler
+
+
+def name(day, tile, product='MOD11A1', kind='hdf'):
+    """Return the name of a file of a granule"""
+    doy = int(day.split('.')[2])
+    return '{pr}.A2020{do:03d}.{ti}.006.2020100000000.{ki}'.format(
+        pr=product, do=doy, ti=tile, ki=kind)
+
+
+class FakeOwner(object):
+    """A downModis object recording the files it downloads"""
+
+    def __init__(self, product='MOD11A1.006', failed=()):
+        self.product = product
+        self.writeFilePath = '/nonexistent'
+        self.failed = failed
+        self.log = []
+        self.lock = threading.Lock()
+
+    def downloadFile(self, filDown, filHdf, day):
+        with self.lock:
+            self.log.append(('start', filDown))
+        # the XML files are slower, the data files would overtake them
+        time.sleep(0.2 if filDown.endswith('.xml') else 0.01)
+        with self.lock:
+            self.log.append(('end', filDown))
+        return 1 if filDown in self.failed else 0
+
+
+def popAll(scheduler):
+    """Return the names of the files in the order of the scheduler"""
+    names = []
+    while True:
+        entry = scheduler.pop()
+        if entry is None:
+            return names
+        names.append(entry.name)
+        scheduler.done(entry)
+
+
+class TestDownloadScheduler(unittest.TestCase):
+    """Tests of DownloadScheduler"""
+
+    def push(self, scheduler, files):
+        for day, fname, size in files:
+            scheduler.push(day, fname, size)
+
+    def test_newest(self):
+        scheduler = DownloadScheduler()
+        self.push(scheduler, [('2020.01.01', name('2020.01.01', 'h18v04'), 5),
+                              ('2020.01.03', name('2020.01.03', 'h18v04'), 5),
+                              ('2020.01.02', name('2020.01.02', 'h18v04'), 5)])
+        self.assertEqual(popAll(scheduler),
+                         [name(day, 'h18v04') for day in
+                          ('2020.01.03', '2020.01.02', '2020.01.01')])
+
+    def test_tiles(self):
+        scheduler = DownloadScheduler('tiles', priority='h19v04,h18v03')
+        day = '2020.01.01'
+        self.push(scheduler, [(day, name(day, tile), 5)
+                              for tile in ('h18v03', 'h18v04', 'h19v04')])
+        self.assertEqual(popAll(scheduler),
+                         [name(day, tile) for tile in
+                          ('h19v04', 'h18v03', 'h18v04')])
+
+    def test_smallest(self):
+        scheduler = DownloadScheduler('smallest')
+        day = '2020.01.01'
+        self.push(scheduler, [(day, name(day, 'h18v03'), None),
+                              (day, name(day, 'h18v04'), 30),
+                              (day, name(day, 'h19v04'), 10)])
+        self.assertEqual(popAll(scheduler),
+                         [name(day, tile) for tile in
+                          ('h19v04', 'h18v04', 'h18v03')])
+
+    def test_roundrobin(self):
+        scheduler = DownloadScheduler('roundrobin')
+        day = '2020.01.01'
+        files = [(day, name(day, tile, product), 5)
+                 for product in ('MOD11A1', 'MYD11A1')
+                 for tile in ('h18v03', 'h18v04')]
+        self.push(scheduler, files)
+        self.assertEqual([fname.split('.')[0] for fname in
+                          popAll(scheduler)],
+                         ['MOD11A1', 'MYD11A1', 'MOD11A1', 'MYD11A1'])
+
+    def test_custom_policy(self):
+        scheduler = DownloadScheduler(lambda sched, entry: entry.name)
+        day = '2020.01.01'
+        self.push(scheduler, [(day, name(day, 'h19v04'), 5),
+                              (day, name(day, 'h18v03'), 5)])
+        self.assertEqual(popAll(scheduler),
+                         [name(day, 'h18v03'), name(day, 'h19v04')])
+        self.assertRaises(ValueError, DownloadScheduler, 'unknown')
+
+    def test_xml_first(self):
+        # the data file is smaller but it waits for its XML file
+        scheduler = DownloadScheduler('smallest')
+        day = '2020.01.01'
+        hdf = name(day, 'h18v04')
+        self.push(scheduler, [(day, hdf, 10), (day, hdf + '.xml', 1000)])
+        entry = scheduler.pop()
+        self.assertEqual(entry.name, hdf + '.xml')
+        self.assertIsNone(scheduler.pop())
+        self.assertEqual(len(scheduler), 1)
+        scheduler.done(entry)
+        self.assertEqual(scheduler.pop().name, hdf)
+
+    def test_run(self):
+        owner = FakeOwner(failed=[name('2020.01.02', 'h18v03')])
+        scheduler = DownloadScheduler('smallest')
+        for day in ('2020.01.01', '2020.01.02'):
+            for tile in ('h18v03', 'h18v04', 'h19v04'):
+                hdf = name(day, tile)
+                scheduler.push(day, hdf, 10, owner)
+                scheduler.push(day, hdf + '.xml', 1000, owner)
+        failed = scheduler.run(workers=4)
+        self.assertEqual(failed, {(owner, '2020.01.01'): 0,
+                                  (owner, '2020.01.02'): 1})
+        self.assertEqual(len(owner.log), 24)
+        self.assertEqual(len(scheduler), 0)
+        # every data file starts after the end of its XML file
+        for event, fname in owner.log:
+            if event == 'start' and not fname.endswith('.xml'):
+                self.assertLess(owner.log.index(('end', fname + '.xml')),
+                                owner.log.index(('start', fname)))
+
+
+if __name__ == '__main__':
+    unittest.main()
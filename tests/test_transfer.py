@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+#  tests of the HTTP transfer of downModis against a local server
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from pymodis import downmodis
+
+NAME = 'MOD11A1.A2020001.h18v04.006.2020003000000.hdf'
+DATA = bytes(bytearray(range(256))) * 40
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serve the files of the server, with the Range requests"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        data = self.server.files.get(self.path.split('/')[-1])
+        if data is None:
+            self.send_error(404)
+            return
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].split('-')[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {st}-{en}/{si}'.format(
+                st=start, en=len(data) - 1, si=len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+
+class HTTPTestCase(unittest.TestCase):
+    """A local HTTP server and a downModis object downloading from it"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), RangeHandler)
+        cls.server.files = {NAME: DATA}
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{po}'.format(po=cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.server.requests[:] = []
+        self.modis = downmodis.downModis(
+            self.folder, url=self.url, user='user', password='password',
+            checkgdal=False, validation='none',
+            retry=downmodis.RetryPolicy(attempts=1, backoff=0))
+        self.filHdf = os.path.join(self.folder, NAME)
+        self.fileUrl = '{url}/MOLT/MOD11A1.006/2020.01.01/{na}'.format(
+            url=self.url, na=NAME)
+
+    def tearDown(self):
+        self.modis.closeFilelist(publish=False)
+        self.modis.closeSession()
+        shutil.rmtree(self.folder)
+
+    def transfer(self):
+        return self.modis._transferFileHTTP(self.fileUrl, NAME, self.filHdf)
+
+
+class TestTransferHTTP(HTTPTestCase):
+    """Tests of downModis._transferFileHTTP"""
+
+    def test_download(self):
+        result = self.transfer()
+        self.assertEqual(result[:2], (len(DATA), len(DATA)))
+        with open(self.filHdf, 'rb') as fil:
+            self.assertEqual(fil.read(), DATA)
+        self.assertFalse(os.path.exists(self.filHdf + '.part'))
+
+    def test_resume(self):
+        with open(self.filHdf + '.part', 'wb') as fil:
+            fil.write(DATA[:1000])
+        self.transfer()
+        self.assertEqual(self.server.requests[-1].get('Range'),
+                         'bytes=1000-')
+        with open(self.filHdf, 'rb') as fil:
+            self.assertEqual(fil.read(), DATA)
+
+    def test_resume_preallocated(self):
+        # a preallocated file left by a killed process
+        with open(self.filHdf + '.part', 'wb') as fil:
+            fil.write(DATA[:1000] + b'\0' * (len(DATA) - 1000))
+        open(self.filHdf + '.part.alloc', 'wb').close()
+        self.transfer()
+        self.assertEqual(self.server.requests[-1].get('Range'),
+                         'bytes=1000-')
+        with open(self.filHdf, 'rb') as fil:
+            self.assertEqual(fil.read(), DATA)
+        self.assertFalse(os.path.exists(self.filHdf + '.part.alloc'))
+
+    def test_resume_not_valid(self):
+        # a partial file bigger than the remote file
+        with open(self.filHdf + '.part', 'wb') as fil:
+            fil.write(DATA + DATA)
+        self.assertRaises(downmodis.DownloadError, self.transfer)
+        self.assertFalse(os.path.exists(self.filHdf + '.part'))
+        self.transfer()
+        with open(self.filHdf, 'rb') as fil:
+            self.assertEqual(fil.read(), DATA)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#  tests of the check of the structure of the HDF4 files
+#
+##################################################################
+#
+#  This MODIS Python class is licensed under the terms of GNU GPL 2.
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#  See the GNU General Public License for more details.
+#
+##################################################################
+
+from __future__ import print_function
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from pymodis.downmodis import HDF4_MAGIC, HDF4_NULL, checkHdf4
+
+
+def hdf4(elements, blocks=2):
+    """Return the content of a minimal HDF4 file: the magic number, a
+       chain of data descriptor blocks and the data elements
+
+       :param list elements: the data of the elements, as bytes
+       :param int blocks: the number of data descriptor blocks
+    """
+    ndds = len(elements) // blocks + 1
+    headers = 4 + blocks * (6 + 12 * ndds)
+    offset = headers
+    dds = []
+    for n, data in enumerate(elements):
+        dds.append(struct.pack('>HHII', 720, n + 1, offset, len(data)))
+        offset += len(data)
+    content = bytearray(HDF4_MAGIC)
+    for block in range(blocks):
+        start = 4 + block * (6 + 12 * ndds)
+        following = start + 6 + 12 * ndds if block < blocks - 1 else 0
+        content += struct.pack('>HI', ndds, following)
+        descriptors = dds[block * ndds:(block + 1) * ndds]
+        # the unused descriptors are empty
+        descriptors += [struct.pack('>HHII', HDF4_NULL, 0, 0, 0)] * \
+            (ndds - len(descriptors))
+        content += b''.join(descriptors)
+    for data in elements:
+        content += data
+    return bytes(content)
+
+
+class TestCheckHdf4(unittest.TestCase):
+    """Tests of checkHdf4"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.elements = [b'a' * 100, b'b' * 50, b'c' * 300]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, content):
+        path = os.path.join(self.folder, 'file.hdf')
+        with open(path, 'wb') as fil:
+            fil.write(content)
+        return path
+
+    def test_valid(self):
+        for blocks in (1, 2, 3):
+            checkHdf4(self.write(hdf4(self.elements, blocks)))
+
+    def test_truncated(self):
+        content = hdf4(self.elements)
+        for size in (len(content) - 1, len(content) - 300, 30, 8):
+            self.assertRaises(ValueError, checkHdf4,
+                              self.write(content[:size]))
+
+    def test_not_hdf4(self):
+        self.assertRaises(ValueError, checkHdf4,
+                          self.write(b'<html>Not found</html>'))
+        self.assertRaises(ValueError, checkHdf4, self.write(b''))
+
+    def test_loop(self):
+        # a block of data descriptors pointing to itself
+        content = bytearray(hdf4(self.elements, 1))
+        content[6:10] = struct.pack('>I', 4)
+        self.assertRaises(ValueError, checkHdf4, self.write(bytes(content)))
+
+
+if __name__ == '__main__':
+    unittest.main()